@@ -2,10 +2,14 @@
 # Measure and plot the CA distance between helices of tunnels.
 
 
+import numpy as np
 import pandas as pd
 import pytraj as pt
 from matplotlib import pyplot as plt
 import os
+import warnings
+
+from libs.box_stats import box_stats, draw_boxes, load_box_stats, save_box_stats
 
 sim_dir = [
     '1A_opc_1', '1A_opc_2', '1A_opc_3', '1A_opc_4', '1A_opc_5', '1A_tip3p_1',
@@ -40,30 +44,36 @@ def collect_distance(results_dir, residues_to_load, atom_mask_to_measure):
 
 # Plot openings
 def plot(tunnel):
-    import seaborn as sns
-    distance_from_csv = pd.read_csv(f'/data/aravindramt/dean/md/{tunnel}_openings.csv', index_col='Unnamed: 0')
-    distance_from_csv = distance_from_csv.reindex(columns=sim_dir)
+    openings_csv = f'/data/aravindramt/dean/md/{tunnel}_openings.csv'
     rows, cols = 5, 3
+    x_label = ["Mean", 1, 2, 3, 4, 5]
+    # boxplot statistics of every panel (mean of the 5 replicas + the replicas), computed once per csv file
+    stats_file = openings_csv.replace(".csv", "_box_stats.json")
+    stats = load_box_stats(stats_file, source=openings_csv)
+    if stats is None:
+        distance_from_csv = pd.read_csv(openings_csv, index_col='Unnamed: 0')
+        distance_from_csv = distance_from_csv.reindex(columns=sim_dir)
+        distances = distance_from_csv.to_numpy(dtype=np.float32).reshape(len(distance_from_csv), rows * cols, 5)
+        stats = []
+        for panel in range(rows * cols):
+            with warnings.catch_warnings():
+                # frames without any replica give a NaN mean, like the pandas mean
+                warnings.simplefilter("ignore", category=RuntimeWarning)
+                mean = np.nanmean(distances[:, panel], axis=1)
+            data = np.column_stack([mean, distances[:, panel]])
+            stats.extend(box_stats(data, x_label))
+        save_box_stats(stats, stats_file, source=openings_csv)
+
     fig, ax = plt.subplots(5, 3, figsize=(8.27, 11.7), sharex="col", sharey="row", dpi=300)
     plt.suptitle(f"{tunnel}".upper() + " Helix - Helix Distance (Å)", fontsize=15, fontweight='bold')
-    i = 0
-    j = 5
-    x_label = ["Mean", 1, 2, 3, 4, 5]
+    colors = ['grey'] + [f"C{i}" for i in range(1, 6)]
     for row in range(rows):
         for col in range(cols):
-            data = distance_from_csv.iloc[:, i:j]
-            mean = {"Mean": data.mean(axis=1).values}
-            mean_df = pd.DataFrame(data=mean)
-            data = pd.concat([mean_df, data], axis=1)
-            _plt = sns.boxplot(ax=ax[row, col], data=data, fliersize=0.2, width=0.6,
-                               linewidth=0.5)
-            _plt.artists[0].set_facecolor('grey')
-            _plt.set_ylim(6, 16)
-            # _plt.set_ylim(1, 19)
-            # _plt.set_ylim(5, 10)
-            ax[row, col].set_xticklabels(x_label)
-            i += 5
-            j += 5
+            panel = row * cols + col
+            draw_boxes(ax[row, col], stats[panel * 6:(panel + 1) * 6], colors, fliersize=0.2)
+            ax[row, col].set_ylim(6, 16)
+            # ax[row, col].set_ylim(1, 19)
+            # ax[row, col].set_ylim(5, 10)
     plt.tight_layout(pad=2.5, w_pad=0.5, h_pad=0.5)
     ax[0, 0].set_title("OPC", fontsize=15, fontweight='bold')
     ax[0, 1].set_title("TIP3P", fontsize=15, fontweight='bold')
@@ -89,32 +89,14 @@ def plot_results_per_tunnel(tt_results: str, groups_definitions: dict, model: st
     fig, ax = plt.subplots(nrows=5, ncols=5, figsize=(11.69, 8.27), dpi=300, sharex='col')
     plt.suptitle(f"{model}".upper() + " Events", fontsize=15, fontweight='bold')
     rows, cols = (5, 4)
-    i, j = (0, 5)
     x_label = [1, 2, 3, 4, 5]
     y_limits = [300,250,3700,12000,20000]
-    comparative_analysis_results = os.path.join(tt_results, 'statistics/comparative_analysis')
-    groups_scs = tt_events.get_scids_of_groups(comparative_analysis_results,
-                                               groups_definitions)  # get corresponding SC per group
-    tunnel_id = list(groups_definitions.keys()) + ["others"]
-    opc_contents = list(groups_scs.keys())[0:5]
-    tip3p_contents = list(groups_scs.keys())[5:10]
-    tip4pew_contents = list(groups_scs.keys())[10:15]
+    # entry/release events per replica of every group and tunnel of the model
+    event_counts = tt_events.event_count_matrix(tt_results, groups_definitions)
     for row in range(rows):
         for col in range(cols):
-            if model == "opc":
-                group_name = opc_contents[row]
-                sc_ids = groups_scs[group_name][0][tunnel_id[col]]
-            if model == "tip3p":
-                group_name = tip3p_contents[row]
-                sc_ids = groups_scs[group_name][0][tunnel_id[col]]
-            if model == "tip4pew":
-                group_name = tip4pew_contents[row]
-                sc_ids = groups_scs[group_name][0][tunnel_id[col]]
-            entry_df, release_df = tt_events.get_entry_release_events(sc_ids, tt_results, model)
-            data = entry_df[i:j]  # To plot entry per tunnel
-            release_data = release_df[i:j]
-            _combined_df = pd.concat([data, release_data], axis=1)
-            _combined_df.reset_index(inplace=True, drop=True)
+            _combined_df = pd.DataFrame(event_counts.of_group(model, row)[:, col, :],
+                                        columns=['Entry_events', 'Release_events'])
             _combined_df["Total"] = _combined_df.sum(axis=1)
 
             # using seaborn to plot
@@ -129,9 +111,6 @@ def plot_results_per_tunnel(tt_results: str, groups_definitions: dict, model: st
             ax[row, col].set_xticks([0, 1, 2, 3, 4])
             ax[row, col].set_xticklabels(x_label, rotation=0)
 
-        i += 5
-        j += 5
-
     # Giving explicit index related to Haloalkane Dehalogenase, modify for other proteins.
     if model == 'opc':
         index = 0
@@ -377,15 +356,15 @@ def histogram_matching_frames(tt_results:str,sim_results:str,gd:dict):
                 color = overall_color[1]
             else:
                 color = overall_color[2]
-            counts = np.bincount(data)
+            # data holds (start_frame, end_frame) intervals, count the events per frame without expanding them
+            counts = tt_events.frame_coverage(data, n_frames=20000)
             avg_count = np.mean(counts)
             std_count = np.std(counts)
             # bar plot
             # sns.barplot(x=[''],y=[avg_count],yerr=[std_count],ax=ax[r,c],color=color)
-            # hist plot
-            plot = sns.histplot(data=data, ax=ax[r, c], stat="count", binwidth=1,binrange=(0, 20000), color=color,
-                         edgecolor='black')
-            ylabel = ax[r,c].get_ylabel()
+            # hist plot (bin width of 1 frame)
+            plot = ax[r, c].stairs(counts, np.arange(len(counts) + 1), fill=True, color=color)
+            ylabel = "Count"
             ax[r,c].set_ylabel("")
             grp_num += 1
     ax[3, 1].set_xlabel("Frame Number")
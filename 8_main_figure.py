@@ -18,7 +18,9 @@ def get_average_bottleneck(tunnels_def: list, simulation_results: str, tt_result
     original_ids_dict = s4.get_orig_caver_id(req_sc_ids=tunnels_def, initial_sc_details_txt=sc_details_loc,
                                              simulation_results_dir=simulation_results)
     bottlenecks = s4.get_bottleneck_radii(scid_orig_caver_ID=original_ids_dict,
-                                          sim_results_location=simulation_results)
+                                          sim_results_location=simulation_results,
+                                          cache_file=os.path.join(save_loc, "bottleneck_per_sim.npz"),
+                                          csv_file=os.path.join(save_loc, "bottleneck_per_sim.csv"))
     avg_df = s4.process_bottleneck(bottlenecks)
     # print average and std of each group
     to_print_average = avg_df.mean(axis=0)
@@ -136,15 +138,14 @@ def plot_waters_per_frame(tt_results: str, sim_results: str, tunnels_definition:
     """
     from libs import transport_events_analysis as t_events
     import numpy as np
-    from collections import Counter
-    saved_object = os.path.join(save_loc, "plot_waters_per_frames_fetched_frames.obj")
+    # (start_frame, end_frame) intervals of the events per simulation
+    saved_object = os.path.join(save_loc, "plot_waters_per_frames_fetched_intervals.obj")
     if not os.path.isfile(saved_object):
         fetched_frames = t_events.get_transit_time(tt_results=tt_results, simulation_results=sim_results,
                                                    groups_definitions=tunnels_definition,
                                                    frame_numbers=True)
         # Save the fetched_frames for easy future plotting
-        save_file_name = os.path.join(save_loc, "plot_waters_per_frames_fetched_frames.obj")
-        save_to_obj(fetched_frames, save_file_name)
+        save_to_obj(fetched_frames, saved_object)
 
     fetched_frames = load_from_obj(saved_object)
     overall_color = sns.color_palette('deep', 3)
@@ -172,8 +173,8 @@ def plot_waters_per_frame(tt_results: str, sim_results: str, tunnels_definition:
                 # Get the average frames per simulation for every group
                 plot_data = []  # This will have average number of frames per simulation
                 for sim in data:
-                    frames = Counter(sim)
-                    average_water_per_frame = np.average(list(frames.values()))
+                    waters_per_frame = t_events.frame_coverage(sim)
+                    average_water_per_frame = np.average(waters_per_frame[waters_per_frame > 0])
                     plot_data.append(average_water_per_frame)
 
                 # set color
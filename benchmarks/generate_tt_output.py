@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+# Writes synthetic TransportTools and CAVER output trees to benchmark the parsers of libs/
+# Usage (from the repository root): python -m benchmarks.generate_tt_output --sims 300 --output /tmp/tt_300
+__author__ = 'Aravind Selvaram Thirunavukarasu'
+__email__ = 'arathi@amu.edu.pl, aravind1233@gmail.com'
+
+import argparse
+import os
+
+import numpy as np
+
+MODELS = ("opc", "tip3p", "tip4pew")
+GROUPS = ("1", "1.4", "1.8", "2.4", "3")
+SEPARATOR = "-" * 120
+EVENTS_HEADER = "{}: (from Simulation: AQUA-DUCT ID, (Resname:Residue), start_frame->end_frame; ... )\n"
+PROFILE_HEADER = "Snapshot, Tunnel cluster, Tunnel, Throughput, Cost, Bottleneck radius, Bottleneck R error bound, " \
+                 "Length, Curvature\n"
+
+
+def simulation_names(n_sims: int):
+    """
+    Simulation IDs named like the ones of the study ({group}A_{model}_{replica}), sorted by model, group and replica.
+    The number of replicas is n_sims / 15 rounded up.
+    """
+    replicas = -(-n_sims // (len(MODELS) * len(GROUPS)))
+    return [f"{group}A_{model}_{replica}" for model in MODELS for group in GROUPS
+            for replica in range(1, replicas + 1)]
+
+
+def _events_line(rng, sim: str, n_events: int, n_frames: int):
+    """'from SIM: aq_id, (WAT:resid), start->end; ...' line of n_events events"""
+    aq_ids = rng.integers(1, 5000, n_events)
+    resids = rng.integers(300, 9000, n_events)
+    starts = rng.integers(1, n_frames, n_events)
+    ends = np.minimum(starts + rng.geometric(1 / 40, n_events), n_frames)
+    waters = "".join(f"{a}, (WAT:{r}), {s}->{e}; " for a, r, s, e in zip(aq_ids, resids, starts, ends))
+    return f"from {sim}: {waters.rstrip()}\n"
+
+
+def _write_details(rng, details_dir: str, sims: list, n_superclusters: int, tunnel_fraction: float,
+                   events_per_sim: float, n_frames: int, n_caver_clusters: int):
+    """
+    Writes initial_super_cluster_details.txt and filtered_super_cluster_details2.txt.
+    :returns (n_superclusters, n_sims) bool array of the simulations having a tunnel cluster in every SC
+    """
+    # SCs with low IDs are the frequent ones, like the TransportTools numbering
+    frequency = np.clip(tunnel_fraction * 2 / (1 + np.arange(n_superclusters) / 10), 0.02, 1)
+    has_tunnel = rng.random((n_superclusters, len(sims))) < frequency[:, None]
+    with open(os.path.join(details_dir, "initial_super_cluster_details.txt"), 'w') as initial, \
+            open(os.path.join(details_dir, "filtered_super_cluster_details2.txt"), 'w') as filtered:
+        for out in (initial, filtered):
+            out.write("Details of superclusters\n\n")
+        for sc in range(n_superclusters):
+            tunnel_sims = [sims[i] for i in np.flatnonzero(has_tunnel[sc])]
+            header = f"Supercluster ID {sc + 1}\n\nDetails on tunnel network:\n" \
+                     f"Number of MD simulations = {len(tunnel_sims)}\n" \
+                     f"Number of tunnel clusters = {len(tunnel_sims)}\nTunnel clusters:\n"
+            clusters = "".join(f"from {sim}: {', '.join(map(str, rng.integers(1, n_caver_clusters + 1, 2)))}\n"
+                               for sim in tunnel_sims)
+            for out in (initial, filtered):
+                out.write(header + clusters + "\n")
+            filtered.write("Details on transport events:\n")
+            for event_type in ("entry", "release"):
+                filtered.write(EVENTS_HEADER.format(event_type))
+                # events also come from a few simulations without tunnel cluster in the SC, they are skipped
+                others = np.flatnonzero(~has_tunnel[sc])
+                event_sims = tunnel_sims + [sims[i] for i in rng.choice(others, min(2, len(others)), replace=False)]
+                for sim in event_sims:
+                    n_events = rng.poisson(events_per_sim * frequency[sc])
+                    if n_events:
+                        filtered.write(_events_line(rng, sim, n_events, n_frames))
+            for out in (initial, filtered):
+                out.write(SEPARATOR + "\n")
+    return has_tunnel
+
+
+def _write_outliers(rng, details_dir: str, sims: list, events_per_sim: float, n_frames: int):
+    """Writes outlier_transport_events_details.txt"""
+    with open(os.path.join(details_dir, "outlier_transport_events_details.txt"), 'w') as outliers:
+        outliers.write("Details of outlier transport events\n\n"
+                       "Outlier transport events not assigned to any supercluster:\n\n")
+        for event_type in ("entry", "release"):
+            outliers.write(EVENTS_HEADER.format(event_type))
+            for sim in sims:
+                n_events = rng.poisson(events_per_sim)
+                if n_events:
+                    outliers.write(_events_line(rng, sim, n_events, n_frames))
+
+
+def _write_comparative_statistics(rng, comparative_dir: str, sims: list, has_tunnel):
+    """
+    Writes statistics/comparative_analysis/{model}_{group}/4-filtered_events_statistics.txt, a SC is listed in
+    a folder if any simulation of the folder has a tunnel cluster in it.
+    """
+    for model in MODELS:
+        for group in GROUPS:
+            members = np.array([sim.split("_")[0] == f"{group}A" and sim.split("_")[1] == model for sim in sims])
+            n_sims = has_tunnel[:, members].sum(axis=1)
+            folder = os.path.join(comparative_dir, f"{model}_{group}")
+            os.makedirs(folder, exist_ok=True)
+            with open(os.path.join(folder, "4-filtered_events_statistics.txt"), 'w') as stats:
+                for i in range(20):
+                    stats.write(f"# synthetic TransportTools statistics, header line {i + 1}\n")
+                stats.write("SC_ID, No_Sims, Total_No_Frames, Avg_No_Frames, Avg_BR, StDev_BR, Max_BR, Avg_Len, "
+                            "StDev_Len, Avg_Cur, StDev_Cur, Avg_throug, StDev_through, Priority, Num_Events, "
+                            "Num_entries, Num_releases\n")
+                stats.write(SEPARATOR + "\n")
+                for sc in np.flatnonzero(n_sims):
+                    frames = int(rng.integers(100, 20000))
+                    entries, releases = rng.integers(0, 500, 2)
+                    br = rng.normal(1.4, 0.2)
+                    stats.write(f"{sc + 1}, {n_sims[sc]}, {frames}, {frames / n_sims[sc]:.1f}, {br:.3f}, "
+                                f"{abs(rng.normal(0.2, 0.05)):.3f}, {br + 0.8:.3f}, {rng.normal(15, 3):.3f}, "
+                                f"{abs(rng.normal(2, 0.5)):.3f}, {rng.normal(1.2, 0.1):.3f}, "
+                                f"{abs(rng.normal(0.1, 0.02)):.3f}, {rng.random():.5f}, {rng.random() / 10:.5f}, "
+                                f"{rng.random() * 10:.5f}, {entries + releases}, {entries}, {releases}\n")
+                stats.write(SEPARATOR + "\n")
+                entries, releases = rng.integers(0, 200, 2)
+                stats.write(f"Number of unassigned transport events: {entries + releases}, {entries}, {releases}\n")
+
+
+def _write_profiles(rng, simulations_dir: str, sims: list, profile_frames: int, n_caver_clusters: int):
+    """
+    Writes the CAVER caver_analyses/final_clustering/analysis/tunnel_characteristics.csv of every simulation, every
+    tunnel cluster is found in ~60% of the frames.
+    """
+    for sim in sims:
+        analysis = os.path.join(simulations_dir, sim, "caver_analyses", "final_clustering", "analysis")
+        os.makedirs(analysis, exist_ok=True)
+        frames, clusters = np.nonzero(rng.random((profile_frames, n_caver_clusters)) < 0.6)
+        n = len(frames)
+        radius = np.clip(rng.normal(1.2 + 0.3 / (1 + clusters), 0.25), 0.9, None)
+        length = rng.normal(15, 3, n)
+        table = np.column_stack([frames + 1, clusters + 1, np.ones(n), rng.random(n), -np.log(rng.random(n)),
+                                 radius, np.zeros(n), length, 1 + rng.random(n) / 2])
+        with open(os.path.join(analysis, "tunnel_characteristics.csv"), 'w') as csv:
+            csv.write(PROFILE_HEADER)
+            np.savetxt(csv, table, fmt=["%d", "%d", "%d", "%.5f", "%.5f", "%.3f", "%.3f", "%.3f", "%.3f"],
+                       delimiter=", ")
+
+
+def generate_tt_tree(output: str, n_sims: int = 75, n_superclusters: int = 60, tunnel_fraction: float = 0.3,
+                     events_per_sim: float = 8, n_frames: int = 20000, profile_frames: int = 1000,
+                     n_caver_clusters: int = 8, seed: int = 0):
+    """
+    Writes a synthetic TransportTools results tree (<output>/tt_results) and simulation results tree
+    (<output>/simulations) in the layout read by libs/.
+    :param output: Directory to write to
+    :param n_sims: Number of simulations, rounded up to a multiple of 15 (3 models x 5 groups)
+    :param n_superclusters: Number of superclusters
+    :param tunnel_fraction: Fraction of simulations with a tunnel cluster in the most frequent SCs
+    :param events_per_sim: Mean number of entry (and of release) events per simulation in the most frequent SCs
+    :param n_frames: Number of frames of the simulations
+    :param profile_frames: Number of frames of the CAVER profiles (tunnel_characteristics.csv), 0 to skip them
+    :param n_caver_clusters: Number of CAVER tunnel clusters per simulation
+    :param seed: Seed of the random generator
+    :returns (tt_results, simulation_results) locations
+    """
+    rng = np.random.default_rng(seed)
+    sims = simulation_names(n_sims)
+    tt_results = os.path.join(output, "tt_results")
+    simulation_results = os.path.join(output, "simulations")
+    details_dir = os.path.join(tt_results, "data", "super_clusters", "details")
+    os.makedirs(details_dir, exist_ok=True)
+    has_tunnel = _write_details(rng, details_dir, sims, n_superclusters, tunnel_fraction, events_per_sim, n_frames,
+                                n_caver_clusters)
+    _write_outliers(rng, details_dir, sims, events_per_sim / 4, n_frames)
+    _write_comparative_statistics(rng, os.path.join(tt_results, "statistics", "comparative_analysis"), sims,
+                                  has_tunnel)
+    for sim in sims:
+        os.makedirs(os.path.join(simulation_results, sim), exist_ok=True)
+    if profile_frames:
+        _write_profiles(rng, simulation_results, sims, profile_frames, n_caver_clusters)
+    return tt_results, simulation_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Writes synthetic TransportTools output for benchmarking")
+    parser.add_argument("--output", required=True, help="Directory to write to")
+    parser.add_argument("--sims", type=int, default=75, help="Number of simulations")
+    parser.add_argument("--superclusters", type=int, default=60, help="Number of superclusters")
+    parser.add_argument("--events", type=float, default=8, help="Mean events per simulation in frequent SCs")
+    parser.add_argument("--frames", type=int, default=20000, help="Number of frames of the simulations")
+    parser.add_argument("--profile-frames", type=int, default=1000,
+                        help="Number of frames of the CAVER profiles, 0 to skip them")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    tt_results, simulation_results = generate_tt_tree(args.output, n_sims=args.sims,
+                                                      n_superclusters=args.superclusters,
+                                                      events_per_sim=args.events, n_frames=args.frames,
+                                                      profile_frames=args.profile_frames, seed=args.seed)
+    print(f"TransportTools results -> {tt_results}\nSimulation results -> {simulation_results}")
+
+
+if __name__ == '__main__':
+    main()
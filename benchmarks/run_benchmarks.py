@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# Times and memory-profiles the TransportTools parsers and aggregations of libs/ on synthetic output trees
+# Usage (from the repository root): python -m benchmarks.run_benchmarks --sims 75 300 1000 --csv benchmarks.csv
+__author__ = 'Aravind Selvaram Thirunavukarasu'
+__email__ = 'arathi@amu.edu.pl, aravind1233@gmail.com'
+
+import argparse
+import contextlib
+import gc
+import glob
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.generate_tt_output import generate_tt_tree
+from libs import time_evolution_bottleneck as bottleneck
+from libs import transport_events_analysis as tt_events
+
+GROUPS_DEFINITION = {"P1": [1, 2, 5, 7, 12, 30, 31], "P2": [3, 4, 6, 8, 11, 16, 25, 27, 41, 43, 44, 50, 58],
+                     "P3": [10]}
+# on-disk caches and indexes written next to the parsed files
+CACHE_FILES = ("*.store.pkl", "*.idx.json", "*.caver_map.npz", "bottleneck_per_sim.npz", "*.residues.npz",
+               "*box_stats.json")
+
+
+def _clear_caches(*folders: str):
+    """Forget the in-memory stores and remove the on-disk caches and indexes under folders, so the next call parses"""
+    tt_events._EVENT_STORES.clear()
+    tt_events._TUNNEL_LOOKUPS.clear()
+    bottleneck._CAVER_MAPS.clear()
+    for folder in folders:
+        for pattern in CACHE_FILES:
+            for cache in glob.glob(os.path.join(folder, "**", pattern), recursive=True):
+                os.remove(cache)
+
+
+def _measure(function, *args, **kwargs):
+    """
+    Runs function once with its output suppressed.
+    :returns (wall time in s, peak of traced Python memory in MiB)
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        function(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 2 ** 20
+
+
+def benchmark_tree(tt_results: str, simulation_results: str):
+    """
+    Benchmarks the parsers and aggregations on one TransportTools results tree. The parsers are measured on a cold
+    start (no caches) and the aggregations on the loaded event store, like in the figure scripts.
+    Memory of the process pool workers of _find_sc_per_group and get_bottleneck_radii is not traced, the serial read
+    of _find_sc_per_group is measured as well. The bottleneck targets need the CAVER profiles of the tree.
+    :returns list of dict(target, seconds, peak_mib)
+    """
+    comparative = os.path.join(tt_results, "statistics", "comparative_analysis")
+    details = os.path.join(tt_results, "data", "super_clusters", "details")
+    p1 = {"P1": GROUPS_DEFINITION["P1"]}
+    initial_details = os.path.join(details, "initial_super_cluster_details.txt")
+    with contextlib.redirect_stdout(io.StringIO()):
+        caver_ids = bottleneck.get_orig_caver_id(GROUPS_DEFINITION["P1"], initial_details, simulation_results)
+    radii_cache = os.path.join(tt_results, "bottleneck_per_sim.npz")
+    targets = [
+        ("_parse_sc_details", tt_events._parse_sc_details,
+         (os.path.join(details, "filtered_super_cluster_details2.txt"),), {}),
+        ("_load_event_store (cold)", tt_events._load_event_store, (tt_results,), {}),
+        ("_load_event_store (disk cache)", tt_events._load_event_store, (tt_results,), {}),
+        ("_load_event_store (unassigned)", tt_events._load_event_store, (tt_results,), {"unassigned": True}),
+        ("_find_sc_per_group (pool)", tt_events._find_sc_per_group, (comparative,), {}),
+        ("_find_sc_per_group (serial)", tt_events._find_sc_per_group, (comparative,), {"workers": 1}),
+        ("get_scids_of_groups", tt_events.get_scids_of_groups, (comparative, GROUPS_DEFINITION), {}),
+        ("get_orig_caver_id", bottleneck.get_orig_caver_id,
+         (GROUPS_DEFINITION["P1"], initial_details, simulation_results), {}),
+        ("get_bottleneck_radii (cold)", bottleneck.get_bottleneck_radii, (caver_ids, simulation_results),
+         {"cache_file": radii_cache}),
+        ("get_bottleneck_radii (disk cache)", bottleneck.get_bottleneck_radii, (caver_ids, simulation_results),
+         {"cache_file": radii_cache}),
+        ("get_transit_time", tt_events.get_transit_time, (tt_results, simulation_results, p1), {}),
+        ("get_transit_time (frame_numbers)", tt_events.get_transit_time, (tt_results, simulation_results, p1),
+         {"frame_numbers": True}),
+        ("event_count_matrix", tt_events.event_count_matrix, (tt_results, GROUPS_DEFINITION), {}),
+        ("consolidate_results", tt_events.consolidate_results, (tt_results, GROUPS_DEFINITION), {}),
+    ]
+    if not glob.glob(os.path.join(simulation_results, "*", bottleneck.PROFILE_CSV)):
+        targets = [t for t in targets if not t[0].startswith("get_bottleneck_radii")]
+    _clear_caches(tt_results, simulation_results)
+    results = []
+    for target, function, args, kwargs in targets:
+        if target == "_load_event_store (disk cache)":
+            tt_events._EVENT_STORES.clear()  # new session, the store is only on disk
+        seconds, peak = _measure(function, *args, **kwargs)
+        results.append({"target": target, "seconds": seconds, "peak_mib": peak})
+
+    # occupancy of the P1 events of every simulation
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, _, release = tt_events.get_transit_time(tt_results, simulation_results, p1, frame_numbers=True)
+    lengths = {sim: 20000 for sim in release}
+    seconds, peak = _measure(tt_events.event_occupancy, release, lengths)
+    results.append({"target": "event_occupancy", "seconds": seconds, "peak_mib": peak})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the TransportTools parsers of libs/")
+    parser.add_argument("--sims", type=int, nargs="+", default=[75, 300, 1000], help="Numbers of simulations")
+    parser.add_argument("--superclusters", type=int, default=60, help="Number of superclusters")
+    parser.add_argument("--profile-frames", type=int, default=200, help="Number of frames of the CAVER profiles")
+    parser.add_argument("--workdir", default=None, help="Parent directory of the temporary trees, default is the system temporary directory")
+    parser.add_argument("--csv", default=None, help="Save the results to this CSV file")
+    args = parser.parse_args()
+
+    all_results = []
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        for n_sims in args.sims:
+            start = time.perf_counter()
+            tt_results, simulation_results = generate_tt_tree(os.path.join(workdir, f"sims_{n_sims}"),
+                                                              n_sims=n_sims, n_superclusters=args.superclusters,
+                                                              profile_frames=args.profile_frames)
+            print(f"Generated {n_sims} simulations in {time.perf_counter() - start:.1f} s")
+            for result in benchmark_tree(tt_results, simulation_results):
+                all_results.append({"sims": n_sims, **result})
+    results_df = pd.DataFrame(all_results)
+    summary = results_df.pivot(index="target", columns="sims", values=["seconds", "peak_mib"])
+    summary = summary.reindex(results_df["target"].drop_duplicates())
+    with pd.option_context("display.width", 200, "display.float_format", "{:.3f}".format):
+        print(summary)
+    if args.csv is not None:
+        results_df.to_csv(args.csv, index=False)
+
+
+if __name__ == '__main__':
+    main()
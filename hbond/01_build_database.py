@@ -5,25 +5,27 @@
 #  
 
 import os
-import pickle
-import argparse
+import warnings
 import numpy as np
-from sys import argv
-import configparser as cfp
 from collections import defaultdict
-from dataclasses import dataclass, field
 
-@dataclass(order=True)
-class TEvent:
-    tid: int = field(compare=True, hash=True)
-    watid: int = 0
-    frame: int = -1
-    radius: float = 999.999
-    dist2lig: float = 999.999
-    fraction: float = -1.0
-    event_type: str = ""
-    supercluster: int = -1
-    caver_cluster: int = -1
+from events import TEvent, write_event_table
+
+def _read_tevent(tevent_file, frac_threshold, min_fraction):
+    # header of an exact matching file, and its data rows only if the fraction is worth reading
+    with open(tevent_file, "r") as inf:
+        line = inf.readline()
+        event_type = "entry" if "entry" in line else "release"
+        _watid = int(line.strip().split("'")[6][4:])
+        _sc = int(line.strip().split()[-1])
+        _fraction = float(inf.readline().strip().split()[-1])
+        if (_fraction < frac_threshold) or (_fraction <= min_fraction):
+            return event_type, _watid, _sc, _fraction, None
+        [inf.readline() for j in range(4)]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)  # files without rows
+            rows = np.loadtxt(inf, delimiter=",", ndmin=2)
+    return event_type, _watid, _sc, _fraction, rows
 
 def _analyze_tevents(infiles, dist_threshold, frac_threshold):
     events = {}
@@ -34,28 +36,22 @@ def _analyze_tevents(infiles, dist_threshold, frac_threshold):
             events[_id] = event
         else:
             event = events[_id]
-        with open(f, "r") as inf:
-            line = inf.readline()
-            if "entry" in line:
-                event.event_type = "entry"
-            else:
-                event.event_type = "release"
-            _watid = int(line.strip().split("'")[6][4:])
-            _sc = int(line.strip().split()[-1])
-            line = inf.readline()
-            _fraction = float(line.strip().split()[-1])
-            if (_fraction >= frac_threshold) and (_fraction > event.fraction):
-                [inf.readline() for j in range(4)]
-                for line in inf:
-                    chunks = [float(c) for c in line.strip().split(",")]
-                    if chunks[4] <= dist_threshold and chunks[-2] < event.radius:
-                        event.watid = _watid
-                        event.supercluster = _sc
-                        event.fraction = _fraction
-                        event.frame = int(chunks[0])
-                        event.radius = chunks[-2]
-                        event.dist2lig = chunks[4]
-                        event.caver_cluster = int(chunks[5])
+        event_type, _watid, _sc, _fraction, rows = _read_tevent(f, frac_threshold, event.fraction)
+        event.event_type = event_type
+        if rows is None or rows.shape[0] == 0:
+            continue
+        # row with the smallest radius (first one on ties) within the distance threshold
+        radii = np.where(rows[:, 4] <= dist_threshold, rows[:, -2], np.inf)
+        best = np.argmin(radii)
+        if radii[best] < event.radius:
+            chunks = rows[best]
+            event.watid = _watid
+            event.supercluster = _sc
+            event.fraction = _fraction
+            event.frame = int(chunks[0])
+            event.radius = chunks[-2]
+            event.dist2lig = chunks[4]
+            event.caver_cluster = int(chunks[5])
     return events
 
 def parse_events(infolder, dist_threshold=0.0, frac_threshold=0.0):
@@ -68,45 +64,39 @@ def parse_events(infolder, dist_threshold=0.0, frac_threshold=0.0):
     return entries, releases
 
 
-_sim_list_1_4_opc = ['1.4A_opc_1', '1.4A_opc_2', '1.4A_opc_3', '1.4A_opc_4', '1.4A_opc_5']
-_sim_list_1_4_tip3p =[ '1.4A_tip3p_1', '1.4A_tip3p_2','1.4A_tip3p_3', '1.4A_tip3p_4', '1.4A_tip3p_5']
-_sim_list_1_4_tip4pew=['1.4A_tip4pew_1', '1.4A_tip4pew_2', '1.4A_tip4pew_3','1.4A_tip4pew_4', '1.4A_tip4pew_5']
-
-_sim_list_1_opc=['1A_opc_1', '1A_opc_2', '1A_opc_3','1A_opc_4', '1A_opc_5']
-_sim_list_1_tip3p=[ '1A_tip3p_1', '1A_tip3p_2', '1A_tip3p_3', '1A_tip3p_4', '1A_tip3p_5']
-_sim_list_1_tip4pew= [ '1A_tip4pew_1','1A_tip4pew_2', '1A_tip4pew_3', '1A_tip4pew_4', '1A_tip4pew_5']
-
-_sim_list1_8=['1.8A_opc_1', '1.8A_opc_2', '1.8A_opc_3', '1.8A_opc_4', '1.8A_opc_5']
-_sim_list1_8_tip3p=['1.8A_tip3p_1', '1.8A_tip3p_2', '1.8A_tip3p_3', '1.8A_tip3p_4', '1.8A_tip3p_5']
-_sim_list1_8_tip4pew=[ '1.8A_tip4pew_1','1.8A_tip4pew_2', '1.8A_tip4pew_3', '1.8A_tip4pew_4', '1.8A_tip4pew_5']
+# Epoch tags of the databases (database_{epoch}_{model}) and their simulation names ({group}A_{model}_{n})
+EPOCHS = {"1": "1", "1_4": "1.4", "1_8": "1.8", "2_4": "2.4", "3": "3"}
+MODELS = {"O": "opc", "T3": "tip3p", "T4": "tip4pew"}
+REPLICAS = 5
 
-others = [  '2.4A_opc_1', '2.4A_opc_2', '2.4A_opc_3',
-            '2.4A_opc_4', '2.4A_opc_5', '2.4A_tip3p_1', '2.4A_tip3p_2', '2.4A_tip3p_3', '2.4A_tip3p_4', '2.4A_tip3p_5',
-            '2.4A_tip4pew_1', '2.4A_tip4pew_2', '2.4A_tip4pew_3', '2.4A_tip4pew_4', '2.4A_tip4pew_5', '3A_opc_1',
-            '3A_opc_2', '3A_opc_3', '3A_opc_4', '3A_opc_5', '3A_tip3p_1', '3A_tip3p_2', '3A_tip3p_3', '3A_tip3p_4',
-            '3A_tip3p_5', '3A_tip4pew_1', '3A_tip4pew_2', '3A_tip4pew_3', '3A_tip4pew_4', '3A_tip4pew_5']
+def _md_events(md_folder, dist_threshold, frac_threshold):
+    entries, releases = parse_events(md_folder, dist_threshold, frac_threshold)
+    return [e for e in entries.values() if e.frame > -1] + [e for e in releases.values() if e.frame > -1]
 
-def make_event_database():
-    # ttconfig = cfp.ConfigParser()
-    # ttconfig.read(args.tt_config_ini)
-    # tt_path = os.path.dirname(args.tt_config_ini)
-    tt_path = '/data/aravindramt/dean/tt/'
+def make_event_database(tt_path='/data/aravindramt/dean/tt/', outfolder=".", epochs=None, models=None, workers=None):
+    # One database_{epoch}_{model} event table per epoch and model, the MDs of all of them are parsed in one process pool
+    from concurrent.futures import ProcessPoolExecutor
     em_path = os.path.join(tt_path, 'tt_0_9_5', "data", "exact_matching_analysis")
-    # mds = [f for f in os.listdir(em_path)]
-    mds=_sim_list_1_opc
-    mds.sort()
-    frames_bymd = defaultdict(list)
-    for md in mds:
-        entries, releases = parse_events(os.path.join(em_path, md), 0.0, 0.7)
-        for entry in entries.values():
-            if entry.frame > -1:
-                frames_bymd[md].append(entry)
-        for release in releases.values():
-            if release.frame > -1:
-                frames_bymd[md].append(release)
-    with open('database_1_O.dat', "wb") as fout:
-        pickle.dump(frames_bymd, fout)
-    return frames_bymd
+    epochs = list(EPOCHS) if epochs is None else epochs
+    models = list(MODELS) if models is None else models
+    mds_of = {(epoch, model): ["{}A_{}_{}".format(EPOCHS[epoch], MODELS[model], r) for r in range(1, REPLICAS + 1)]
+              for epoch in epochs for model in models}
+    mds = sorted({md for _mds in mds_of.values() for md in _mds if os.path.isdir(os.path.join(em_path, md))})
+    folders = [os.path.join(em_path, md) for md in mds]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        events_bymd = dict(zip(mds, executor.map(_md_events, folders, [0.0] * len(mds), [0.7] * len(mds))))
+    databases = {}
+    for (epoch, model), _mds in mds_of.items():
+        frames_bymd = defaultdict(list)
+        for md in sorted(_mds):
+            if events_bymd.get(md):
+                frames_bymd[md].extend(events_bymd[md])
+        write_event_table(os.path.join(outfolder, "database_{}_{}".format(epoch, model)), frames_bymd)
+        databases[(epoch, model)] = frames_bymd
+        print("database_{}_{}: {} events of {} mds".format(epoch, model,
+                                                               sum(len(e) for e in frames_bymd.values()),
+                                                               len(frames_bymd)))
+    return databases
 
 if __name__ == "__main__":
     # parser = argparse.ArgumentParser(description="Build database of transport events")
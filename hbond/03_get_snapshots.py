@@ -5,25 +5,14 @@
 #  
 
 import os
-import pickle
 import tempfile
 import subprocess
 import numpy as np
 from sys import argv
-from collections import defaultdict
-from dataclasses import dataclass, field
 
-@dataclass(order=True)
-class TEvent:
-    tid: int = field(compare=True, hash=True)
-    watid: int = 0
-    frame: int = -1
-    radius: float = 999.999
-    dist2lig: float = 999.999
-    fraction: float = -1.0
-    event_type: str = ""
-    supercluster: int = -1
-    caver_cluster: int = -1
+from events import database_tag, load_events
+from frame_store import write_frame_store
+from runner import database_units, run_units
 
 def _write_frames(mdtag, events, trajfolder, outfolder):
     frames = set()
@@ -47,7 +36,7 @@ trajin {}/merged.nc
             cppin += "trajout {} onlyframes {}\n".format(pdbout, f)
             to_run = True
         cppin += "go\nquit\n"
-        ef_cppin = "extract_frames_{}_{}.cppin".format(mdtag, i)
+        ef_cppin = "extract_frames_{}_{}_{}.cppin".format(os.path.basename(outfolder), mdtag, i)
         with open(ef_cppin, "w") as t:
             t.write(cppin)
         if to_run:
@@ -72,7 +61,7 @@ trajin {}/merged.nc
         cppin += "trajout {} onlyframes {}\n".format(pdbout, f)
         to_run = True
     cppin += "go\nquit\n"
-    ef_cppin = "extract_frames_{}_{}.cppin".format(mdtag, i)
+    ef_cppin = "extract_frames_{}_{}_{}.cppin".format(os.path.basename(outfolder), mdtag, i)
     with open(ef_cppin, "w") as t:
         t.write(cppin)
     if to_run:
@@ -88,8 +77,7 @@ trajin {}/merged.nc
     print("Extracted frames for md:", mdtag)
 
 def get_pdb_frames(datafile, trajfolder, outfolder):
-    with open(datafile, "rb") as fin:
-        data = pickle.load(fin)
+    data = load_events(datafile)
     mds = list(data.keys())
     mds.sort()
     os.makedirs(outfolder, exist_ok=True)
@@ -97,6 +85,28 @@ def get_pdb_frames(datafile, trajfolder, outfolder):
         os.makedirs(os.path.join(outfolder, md), exist_ok=True)
         _write_frames(md, data[md], trajfolder, outfolder)
 
+def get_frame_stores(datafile, trajfolder, outfolder, radius=None):
+    # One {md}.npz store of all event frames per MD instead of one PDB file per frame, radius (A) keeps only the
+    # residues around the event waters
+    data = load_events(datafile)
+    mds = list(data.keys())
+    mds.sort()
+    os.makedirs(outfolder, exist_ok=True)
+    for md in mds:
+        store = write_frame_store(os.path.join(trajfolder, md), data[md], os.path.join(outfolder, "{}.npz".format(md)),
+                                  radius=radius)
+        print("Extracted {} frames for md: {}".format(len(store.frames), md))
+
+def _pdb_frames_unit(md, events, trajfolder, outfolder):
+    os.makedirs(os.path.join(outfolder, md), exist_ok=True)
+    _write_frames(md, events, trajfolder, outfolder)
+
+def _frame_store_unit(md, events, trajfolder, outfolder, radius):
+    os.makedirs(outfolder, exist_ok=True)
+    store = write_frame_store(os.path.join(trajfolder, md), events, os.path.join(outfolder, "{}.npz".format(md)),
+                              radius=radius)
+    print("Extracted {} frames for md: {}".format(len(store.frames), md))
+
 if __name__ == "__main__":
     # python3 get_snapshots.py dhaa/events_data.dat dhaa/data dhaa/frames
     # if len(argv) == 4:
@@ -108,9 +118,23 @@ if __name__ == "__main__":
     # epochs = ["1_4", "1_8"]
     epochs =["1"]
     models = ["O", "T3", "T4"]
-    for epoch in epochs:
-        for model in models:
-            database_name = f"../databases/database_{epoch}_{model}.dat"
-            frame_folder_name = f"../frames/frames_{epoch}_{model}"
-            simulation_folder = "../../../md/simulations"
-            get_pdb_frames(database_name,simulation_folder,frame_folder_name)
\ No newline at end of file
+    simulation_folder = "../../../md/simulations"
+    radius = 10.0
+    # the {md}.npz frame stores are read by the interactions engine of 04_ncontacts_hbonds.py, PDB files per frame
+    # (write_pdbs = True) only by its cpptraj engine
+    write_pdbs = False
+    databases = [f"../databases/database_{epoch}_{model}" for epoch in epochs for model in models]
+
+    def unit_args(database, md, events):
+        tag = database_tag(database)
+        if write_pdbs:
+            return md, events, simulation_folder, f"../frames/frames_{tag}"
+        return md, events, simulation_folder, f"../frames/frames_{tag}", radius
+
+    # (database, MD) units in a process pool, finished ones are skipped through the manifest
+    units = database_units(databases, simulation_folder, unit_args, params={"radius": radius, "pdb": write_pdbs},
+                           input_files=["merged.nc", "structure_HMR.parm7"])
+    if write_pdbs:
+        run_units(_pdb_frames_unit, units, "../frames/manifest_pdb.jsonl", workers=8)
+    else:
+        run_units(_frame_store_unit, units, "../frames/manifest.jsonl", workers=8)
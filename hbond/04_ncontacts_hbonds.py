@@ -5,90 +5,140 @@
 #  
 
 import os
-import pickle
 import tempfile
 import subprocess
 import numpy as np
 from sys import argv
 import matplotlib.pyplot as plt
-from collections import defaultdict
-from dataclasses import dataclass, field
-
-@dataclass(order=True)
-class TEvent:
-    tid: int = field(compare=True, hash=True)
-    watid: int = 0
-    frame: int = -1
-    radius: float = 999.999
-    dist2lig: float = 999.999
-    fraction: float = -1.0
-    event_type: str = ""
-    supercluster: int = -1
-    caver_cluster: int = -1
-
-def _ncontacts(mdtag, events, trajfolder, outfolder, prot_size):
+
+from events import database_tag, load_events
+from frame_store import load_frame_store
+from interactions import add_interaction_columns, collect_interactions, md_interactions, save_md_interactions
+from runner import database_units, run_units
+
+def _run_cpptraj(cppin, prefix, args=()):
+    fd, cppin_file = tempfile.mkstemp(prefix=prefix, suffix=".cppin", dir=".")
+    try:
+        with os.fdopen(fd, "w") as t:
+            t.write(cppin)
+        comm = ["cpptraj", *args, "-i", cppin_file]
+        output = subprocess.run(comm, stdout=subprocess.PIPE, universal_newlines=True)
+    finally:
+        os.remove(cppin_file)
+    return output.stdout
+
+def _ncontacts_command(event, mdtag, outfolder, prot_size, name):
+    return "nativecontacts {} :{} :1-{} writecontacts {}/{}/f{:0>5}_e{:0>4}.txt includesolvent\n".format(name,
+            event.watid+1, prot_size, outfolder, mdtag, event.frame+1, event.tid)
+
+def _hbonds_command(event, mdtag, outfolder, name):
+    return "hbond {} out {}/{}/f{:0>5}_e{:0>4}.txt solventdonor :{} solventacceptor :{}@O dist 3.5 solvout {}/{}/f{:0>5}_e{:0>4}_solv.txt\n".format(name,
+            outfolder, mdtag, event.frame+1, event.tid, event.watid+1, event.watid+1, outfolder, mdtag, event.frame+1, event.tid)
+
+def _batched_cppin(mdtag, events, trajfolder, commands):
+    # One cpptraj session per MD: the topology is read once from the first frame (all frames of a MD are written
+    # from the same parm7 by 03_get_snapshots.py), then every event reads its own frame and writes its own files.
+    # The actions, data sets and data files of an event are cleared after its run so they are not written again.
+    cppin = "noexitonerror\nparm {}/{}/f{:0>5}.pdb\n".format(trajfolder, mdtag, events[0].frame+1)
+    for event, command in zip(events, commands):
+        cppin += "trajin {}/{}/f{:0>5}.pdb\n".format(trajfolder, mdtag, event.frame+1)
+        cppin += command
+        cppin += "run\nclear trajin\nclear actions\nclear datafile\nclear dataset\n"
+    cppin += "quit\n"
+    return cppin
+
+def _ncontacts(mdtag, events, trajfolder, outfolder, prot_size, batched=True):
+    pending = []
     for event in events:
-        ncout = "{}/{}/f{:0>5}_e{:0>4}.txt".format(trajfolder, mdtag, event.frame+1, event.tid)
+        ncout = "{}/{}/f{:0>5}_e{:0>4}.txt".format(outfolder, mdtag, event.frame+1, event.tid)
         if os.path.isfile(ncout):
             continue
-        cppin = """nativecontacts :{} :1-{} writecontacts {}/{}/f{:0>5}_e{:0>4}.txt includesolvent
-go
-quit
-""".format(event.watid+1, prot_size, outfolder, mdtag, event.frame+1, event.tid)
-        contacts_cppin = "contacts_{}.cppin".format(next(tempfile._get_candidate_names()))
-        with open(contacts_cppin, "w") as t:
-            t.write(cppin)
-        comm = "cpptraj -p {}/{}/f{:0>5}.pdb -y {}/{}/f{:0>5}.pdb -i {}".format(trajfolder,
-                mdtag, event.frame+1, trajfolder, mdtag, event.frame+1, contacts_cppin)
-        output = subprocess.run(comm.split(), stdout=subprocess.PIPE, universal_newlines=True)
-        if os.path.isfile(contacts_cppin):
-            os.remove(contacts_cppin)
+        pending.append(event)
+    if batched and pending:
+        commands = [_ncontacts_command(e, mdtag, outfolder, prot_size, "nc_f{:0>5}_e{:0>4}".format(e.frame+1, e.tid))
+                    for e in pending]
+        _run_cpptraj(_batched_cppin(mdtag, pending, trajfolder, commands), "contacts_{}_".format(mdtag))
+    elif pending:
+        for event in pending:
+            cppin = _ncontacts_command(event, mdtag, outfolder, prot_size, "") + "go\nquit\n"
+            frame_pdb = "{}/{}/f{:0>5}.pdb".format(trajfolder, mdtag, event.frame+1)
+            _run_cpptraj(cppin, "contacts_", ("-p", frame_pdb, "-y", frame_pdb))
     print("Finished ncontacts of md:", mdtag)
 
-def get_native_contacts(datafile, trajfolder, outfolder, prot_size):
-    with open(datafile, "rb") as fin:
-        data = pickle.load(fin)
+def get_native_contacts(datafile, trajfolder, outfolder, prot_size, batched=True):
+    data = load_events(datafile)
     mds = list(data.keys())
     mds.sort()
     os.makedirs(outfolder, exist_ok=True)
     for md in mds:
         os.makedirs(os.path.join(outfolder, md), exist_ok=True)
-        _ncontacts(md, data[md], trajfolder, outfolder, prot_size)
+        _ncontacts(md, data[md], trajfolder, outfolder, prot_size, batched=batched)
 
-def _hbonds(mdtag, events, trajfolder, outfolder):
+def _hbonds(mdtag, events, trajfolder, outfolder, batched=True):
+    pending = []
     for event in events:
         hbout = "{}/{}/f{:0>5}_e{:0>4}.txt".format(outfolder, mdtag, event.frame+1, event.tid)
         svout = "{}/{}/f{:0>5}_e{:0>4}_solv.txt".format(outfolder, mdtag, event.frame+1, event.tid)
         if os.path.isfile(hbout) and os.path.isfile(svout):
             continue
-        cppin = """hbond event_H out {}/{}/f{:0>5}_e{:0>4}.txt solventdonor :{} solventacceptor :{}@O dist 3.5 solvout {}/{}/f{:0>5}_e{:0>4}_solv.txt
-go
-""".format(outfolder, mdtag, event.frame+1, event.tid, event.watid+1, event.watid+1, outfolder, mdtag, event.frame+1, event.tid)
-        hbonds_cppin = "hbonds_{}.cppin".format(next(tempfile._get_candidate_names()))
-        with open(hbonds_cppin, "w") as t:
-            t.write(cppin)
-        comm = "cpptraj -p {}/{}/f{:0>5}.pdb -y {}/{}/f{:0>5}.pdb -i {}".format(trajfolder,
-                mdtag, event.frame+1, trajfolder, mdtag, event.frame+1, hbonds_cppin)
-        output = subprocess.run(comm.split(), stdout=subprocess.PIPE, universal_newlines=True)
-        if os.path.isfile(os.path.join(outfolder, "hbonds.log")):
-            with open(os.path.join(outfolder, "hbonds.log"), "a") as log:
-                log.write(output.stdout)
-        else:
-            with open(os.path.join(outfolder, "hbonds.log"), "w") as log:
-                log.write(output.stdout)
-        if os.path.isfile(hbonds_cppin):
-            os.remove(hbonds_cppin)
+        pending.append(event)
+    outputs = []
+    if batched and pending:
+        commands = [_hbonds_command(e, mdtag, outfolder, "hb_f{:0>5}_e{:0>4}".format(e.frame+1, e.tid))
+                    for e in pending]
+        outputs.append(_run_cpptraj(_batched_cppin(mdtag, pending, trajfolder, commands), "hbonds_{}_".format(mdtag)))
+    elif pending:
+        for event in pending:
+            cppin = _hbonds_command(event, mdtag, outfolder, "event_H") + "go\n"
+            frame_pdb = "{}/{}/f{:0>5}.pdb".format(trajfolder, mdtag, event.frame+1)
+            outputs.append(_run_cpptraj(cppin, "hbonds_", ("-p", frame_pdb, "-y", frame_pdb)))
+    if outputs:
+        with open(os.path.join(outfolder, "hbonds.log"), "a") as log:
+            log.write("".join(outputs))
     print("Finished hbonds of md:", mdtag)
 
-def get_hbonds(datafile, trajfolder, outfolder):
-    with open(datafile, "rb") as fin:
-        data = pickle.load(fin)
+def get_hbonds(datafile, trajfolder, outfolder, batched=True):
+    data = load_events(datafile)
     mds = list(data.keys())
     mds.sort()
     os.makedirs(outfolder, exist_ok=True)
     for md in mds:
         os.makedirs(os.path.join(outfolder, md), exist_ok=True)
-        _hbonds(md, data[md], trajfolder, outfolder)
+        _hbonds(md, data[md], trajfolder, outfolder, batched=batched)
+
+def _hbonds_unit(md, events, trajfolder, outfolder):
+    # cpptraj runs with noexitonerror and its return code is not checked, so the unit fails on missing outputs
+    # (not recorded as done in the manifest, the events are run again)
+    os.makedirs(os.path.join(outfolder, md), exist_ok=True)
+    _hbonds(md, events, trajfolder, outfolder)
+    missing = []
+    for event in events:
+        hbout = "{}/{}/f{:0>5}_e{:0>4}.txt".format(outfolder, md, event.frame+1, event.tid)
+        svout = "{}/{}/f{:0>5}_e{:0>4}_solv.txt".format(outfolder, md, event.frame+1, event.tid)
+        if not (os.path.isfile(hbout) and os.path.isfile(svout)):
+            missing.append(event.tid)
+    if missing:
+        raise RuntimeError("No hbond outputs for {} of {} events of md {} (event IDs {}...), see {}".format(
+            len(missing), len(events), md, missing[:5], os.path.join(outfolder, "hbonds.log")))
+
+def _interactions_unit(md, events, md_folder, outfolder, prot_size, store_file=None):
+    # H-bonds and contacts computed in process by interactions.py, without PDB frames or cpptraj runs, the frames are
+    # read from the {md}.npz frame store of 03_get_snapshots.py when there is one, else from merged.nc
+    os.makedirs(outfolder, exist_ok=True)
+    store = load_frame_store(store_file) if store_file is not None and os.path.isfile(store_file) else None
+    table = md_interactions(md_folder, events, prot_size, frame_store=store)
+    save_md_interactions(os.path.join(outfolder, "{}.npz".format(md)), table)
+    print("Finished interactions of md:", md)
+
+def add_interactions(databases, outfolders):
+    # hbonds, hbonds_protein and bridges columns of every database from the {md}.npz files of _interactions_unit
+    for database, outfolder in zip(databases, outfolders):
+        try:
+            table = collect_interactions(database, outfolder, outfolder.rstrip("/") + "_interactions.npz")
+        except FileNotFoundError as error:
+            print("Interactions of {} not added: {}".format(database, error))
+            continue
+        add_interaction_columns(database, table)
 
 if __name__ == "__main__":
     # python3 04_native_contacts.py dhaa/events_data.dat dhaa/frames dhaa 293
@@ -103,10 +153,37 @@ if __name__ == "__main__":
     #     quit(1)
     epochs = ["1_4", "1_8"]
     models = ["O", "T3", "T4"]
-    for epoch in epochs:
-        for model in models:
-            database_name = f"../databases/database_{epoch}_{model}.dat"
-            frame_folder_name = f"../frames/frames_{epoch}_{model}"
-            simulation_folder = "../../../md/simulations"
-            hbonds_folder = f"../hbonds/hb_{epoch}_{model}"
-            get_hbonds(database_name,frame_folder_name,hbonds_folder)
\ No newline at end of file
+    databases = [f"../databases/database_{epoch}_{model}" for epoch in epochs for model in models]
+    simulation_folder = "../../../md/simulations"
+    prot_size = 293
+    # "interactions": in-process H-bonds and contacts (interactions.py) of the frame stores of 03_get_snapshots.py
+    # saved as hb_{tag}/{md}.npz, read by event_outputs like the cpptraj outputs, "cpptraj": hbond runs on the PDB
+    # frames of 03_get_snapshots.py (write_pdbs = True)
+    engine = "interactions"
+
+    if engine == "interactions":
+        def unit_store(database, md):
+            return os.path.abspath(f"../frames/frames_{database_tag(database)}/{md}.npz")
+
+        def unit_args(database, md, events):
+            return (md, events, os.path.join(simulation_folder, md),
+                    os.path.abspath(f"../hbonds/hb_{database_tag(database)}"), prot_size, unit_store(database, md))
+
+        units = database_units(databases, simulation_folder, unit_args, params={"prot_size": prot_size},
+                               input_files=["merged.nc", "structure_HMR.parm7"],
+                               unit_files=lambda database, md, events: [unit_store(database, md)])
+        run_units(_interactions_unit, units, "../hbonds/manifest_interactions.jsonl", workers=8)
+        add_interactions(databases, [f"../hbonds/hb_{database_tag(database)}" for database in databases])
+    else:
+        def unit_args(database, md, events):
+            # PDB frames written by 03_get_snapshots.py with write_pdbs = True
+            tag = database_tag(database)
+            return md, events, f"../frames/frames_{tag}", os.path.abspath(f"../hbonds/hb_{tag}")
+
+        def unit_frames(database, md, events):
+            return sorted({"../frames/frames_{}/{}/f{:0>5}.pdb".format(database_tag(database), md, e.frame+1)
+                           for e in events})
+
+        # (database, MD) units in a process pool, finished ones are skipped through the manifest
+        units = database_units(databases, "../frames", unit_args, unit_files=unit_frames)
+        run_units(_hbonds_unit, units, "../hbonds/manifest.jsonl", workers=8)
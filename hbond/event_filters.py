@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Event selections of the hbond analyses as boolean masks over the rows of an events database: the number of MDs
+# (replicas) with buried events of every supercluster is computed once per database and fraction threshold, and an
+# EventFilter (fraction, replicas, radius, H-bonds) compiles to a mask instead of scanning the events in Python.
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from event_outputs import iter_events
+
+
+@dataclass
+class EventFilter:
+    """
+    frac_thr -> fraction threshold of the buried events, used to count the MDs of every supercluster,
+    min_replicas -> keep events of superclusters with buried events in at least this many MDs,
+    buried_only -> keep only events with fraction >= frac_thr,
+    radius_range -> (min, max) radius kept, both included, None keeps all,
+    hbonds_range -> (min, max) H-bonds kept, both included, of the hbonds given to EventIndex.mask
+    """
+    frac_thr: float = 0.7
+    min_replicas: int = 0
+    buried_only: bool = True
+    radius_range: tuple = None
+    hbonds_range: tuple = None
+
+
+@dataclass
+class EventIndex:
+    """
+    Columns of the events of a database in row order (MDs sorted, events in their order): md -> index of the MD of
+    every event in mds. table -> the EventTable of the database, the replica counts are stored in it if given.
+    """
+    mds: list
+    md: np.ndarray
+    fraction: np.ndarray
+    supercluster: np.ndarray
+    radius: np.ndarray
+    table: object = None
+    _replicas: dict = field(default_factory=dict, repr=False)
+
+    def __len__(self):
+        return len(self.md)
+
+    def replica_counts(self, frac_thr):
+        """Number of MDs with events of fraction >= frac_thr of the supercluster of every event"""
+        if frac_thr in self._replicas:
+            return self._replicas[frac_thr]
+        column = "sc_replicas_{:g}".format(frac_thr)
+        counts = None
+        if self.table is not None and column in self.table.columns:
+            try:
+                # ValueError for a column without one row per event
+                counts = np.asarray(self.table.column(column))
+            except (OSError, ValueError) as error:
+                print("Could not read {} of {}, computing it again: {}".format(column, self.table.folder, error))
+        if counts is None:
+            # distinct (supercluster, MD) pairs of the buried events, counted per supercluster
+            buried = self.fraction >= frac_thr
+            pairs = np.unique(np.stack([self.supercluster[buried], self.md[buried]]), axis=1)
+            scs, sc_counts = np.unique(pairs[0], return_counts=True)
+            position = np.searchsorted(scs, self.supercluster)
+            found = position < len(scs)
+            found[found] = scs[position[found]] == self.supercluster[found]
+            counts = np.zeros(len(self), dtype=np.int32)
+            counts[found] = sc_counts[position[found]]
+            if self.table is not None:
+                try:
+                    self.table.add_column(column, counts, overwrite=True)
+                except OSError as error:
+                    print("Could not save {} in {}: {}".format(column, self.table.folder, error))
+        self._replicas[frac_thr] = counts
+        return counts
+
+    def sc_replicas(self, frac_thr):
+        """dict(supercluster: number of MDs with events of fraction >= frac_thr)"""
+        counts = self.replica_counts(frac_thr)
+        scs, first = np.unique(self.supercluster, return_index=True)
+        return {int(sc): int(counts[i]) for sc, i in zip(scs, first) if counts[i] > 0}
+
+    def mask(self, event_filter, hbonds=None):
+        """Boolean mask of the events kept by an EventFilter, hbonds -> H-bonds of every event for hbonds_range"""
+        selected = np.ones(len(self), dtype=bool)
+        if event_filter.buried_only:
+            selected &= self.fraction >= event_filter.frac_thr
+        if event_filter.min_replicas > 0:
+            selected &= self.replica_counts(event_filter.frac_thr) >= event_filter.min_replicas
+        if event_filter.radius_range is not None:
+            selected &= (self.radius >= event_filter.radius_range[0]) & (self.radius <= event_filter.radius_range[1])
+        if event_filter.hbonds_range is not None:
+            if hbonds is None:
+                raise ValueError("The filter has an hbonds_range but no hbonds were given")
+            hbonds = np.asarray(hbonds)
+            selected &= (hbonds >= event_filter.hbonds_range[0]) & (hbonds <= event_filter.hbonds_range[1])
+        return selected
+
+
+def _matches_table(table, mds, counts):
+    # same MDs, same number of events per MD at the rows of the MD, and index columns of the table with one row per
+    # event
+    if mds != table.mds or len(table) != sum(counts):
+        return False
+    if any(table.rows(md).stop - table.rows(md).start != count for md, count in zip(mds, counts)):
+        return False
+    try:
+        for name in ("fraction", "supercluster", "radius"):
+            table.column(name)
+    except ValueError:
+        return False
+    return True
+
+
+def event_index(data):
+    """
+    EventIndex of a database, dict(md: list of TEvents). The index of a database read with events.load_events is
+    built from the columns of its event table once and kept with the database, if the events of every MD are still
+    the rows of that MD in the table (else from the events).
+    """
+    index = getattr(data, "index", None)
+    if index is not None:
+        return index
+    mds = sorted(data.keys())
+    table = getattr(data, "table", None)
+    counts = [len(data[md]) for md in mds]
+    if table is not None and not _matches_table(table, mds, counts):
+        print("The events of {} differ from its table, building the event index from the events".format(table.folder))
+        table = None
+    if table is not None:
+        index = EventIndex(mds, np.repeat(np.arange(len(mds)), counts), np.asarray(table.column("fraction")),
+                           np.asarray(table.column("supercluster")), np.asarray(table.column("radius")), table)
+    else:
+        events = list(iter_events(data))
+        index = EventIndex(mds, np.repeat(np.arange(len(mds)), counts),
+                           np.array([e.fraction for e in events], dtype=np.float64),
+                           np.array([e.supercluster for e in events], dtype=np.int64),
+                           np.array([e.radius for e in events], dtype=np.float64))
+    if hasattr(data, "index"):
+        data.index = index
+    return index
+
+
+def grouped(values, keys, selected):
+    """dict(key: values of the selected rows with that key), keys sorted"""
+    values, keys = np.asarray(values)[selected], np.asarray(keys)[selected]
+    return {int(key): values[keys == key] for key in np.unique(keys)}
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Parses the per event cpptraj outputs of 04_ncontacts_hbonds.py (f{frame}_e{tid}.txt, f{frame}_e{tid}_solv.txt and
+# the nativecontacts files), or the {md}.npz tables of its in-process interactions engine, once per database, in a
+# process pool, into a table cached next to the outputs. The rows follow the events of the database (MDs sorted,
+# events in their order), partner lists are stored as CSR arrays.
+
+import hashlib
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+HBOND_TABLE = "hbond_table.npz"
+CONTACT_TABLE = "contact_table.npz"
+# columns of the hbond out files: #Frame, solute-solute, solute-solvent and bridging H-bonds
+HBOND_COLUMNS = ("hbonds_uu", "hbonds_uv", "hbonds_bridge")
+# tables already loaded in this process, by cache file
+_LOADED = {}
+
+
+def iter_events(data):
+    """Events of a database, dict(md: list of TEvents), in the row order of the tables"""
+    for md in sorted(data.keys()):
+        yield from data[md]
+
+
+def _events_key(data, folder):
+    # the events and the {md}.npz tables of the interactions engine (rewritten by every run)
+    digest = hashlib.sha1()
+    digest.update(pickle.dumps([(md, [(e.tid, e.frame) for e in data[md]]) for md in sorted(data.keys())]))
+    for md in sorted(data.keys()):
+        md_table = _md_table_file(folder, md)
+        if os.path.isfile(md_table):
+            digest.update("{}:{}:{}".format(md, os.stat(md_table).st_size, os.stat(md_table).st_mtime_ns).encode())
+    return digest.hexdigest()
+
+
+def _md_table_file(folder, md):
+    return os.path.join(folder, "{}.npz".format(md))
+
+
+def _read_md_table(folder, md, keys):
+    # {md}.npz of the interactions engine, None if missing or not of these events
+    md_table = _md_table_file(folder, md)
+    if not os.path.isfile(md_table):
+        return None
+    with np.load(md_table) as saved:
+        table = {name: saved[name] for name in saved.files}
+    if [(int(f), int(t)) for f, t in zip(table["frame"], table["tid"])] != [(f, t) for f, t in keys]:
+        print("The interactions in {} are not of the events of the database, not read".format(md_table))
+        return None
+    return table
+
+
+def _read_hbonds(hbondfile):
+    # last data line of the hbond out file
+    counts = [0, 0, 0]
+    with open(hbondfile, "r") as hfile:
+        for line in hfile:
+            if line.startswith("#"):
+                continue
+            counts = [int(c) for c in line.strip().split()[1:4]]
+    return counts
+
+
+def _read_solvent_hbonds(solvfile):
+    # protein partners (residue, residue number, atom) of the water in the solvout file
+    residues, resids, atoms = [], [], []
+    with open(solvfile, "r") as hfile:
+        [hfile.readline() for r in range(2)]
+        for line in hfile:
+            if line.startswith("#"):
+                break
+            chunks = line.strip().split()
+            if "Solvent" in chunks[0]:
+                res, atom = chunks[1].split("@")
+            else:
+                res, atom = chunks[0].split("@")
+            resid = res.split("_")[-1]
+            residues.append(res.split("_")[0])
+            resids.append(int(resid) if resid.isdigit() else -1)
+            atoms.append(atom)
+    return residues, resids, atoms
+
+
+def _read_contacts(contactfile):
+    resids, atoms, distances = [], [], []
+    with open(contactfile, "r") as fin:
+        [fin.readline() for i in range(3)]
+        for line in fin:
+            chunks = line.strip().split()
+            _res = chunks[1][1:].split(":")[-1]
+            _res, _atom = _res.split("@")
+            resids.append(int(_res))
+            atoms.append(_atom)
+            distances.append(float(chunks[4]))
+    return resids, atoms, distances
+
+
+def _md_hbonds(folder, md, keys):
+    table = _read_md_table(folder, md, keys)
+    if table is not None:
+        # the engine does not count the solute-solute H-bonds (-1)
+        counts = [[-1, int(uv), int(bridge)] for uv, bridge in zip(table["hbonds"], table["bridges"])]
+        offsets = table["hbond_offsets"]
+        return (counts, table["hbond_residues"].tolist(), table["hbond_resids"].tolist(),
+                table["hbond_names"].tolist(), np.diff(offsets).tolist(), 0)
+    counts, residues, resids, atoms, sizes, missing = [], [], [], [], [], 0
+    for frame, tid in keys:
+        hbondfile = "{}/{}/f{:0>5}_e{:0>4}.txt".format(folder, md, frame + 1, tid)
+        solvfile = "{}/{}/f{:0>5}_e{:0>4}_solv.txt".format(folder, md, frame + 1, tid)
+        if not (os.path.isfile(hbondfile) and os.path.isfile(solvfile)):
+            counts.append([-1, -1, -1])
+            sizes.append(0)
+            missing += 1
+            continue
+        counts.append(_read_hbonds(hbondfile))
+        _residues, _resids, _atoms = _read_solvent_hbonds(solvfile)
+        residues.extend(_residues)
+        resids.extend(_resids)
+        atoms.extend(_atoms)
+        sizes.append(len(_atoms))
+    return counts, residues, resids, atoms, sizes, missing
+
+
+def _md_contacts(folder, md, keys):
+    table = _read_md_table(folder, md, keys)
+    if table is not None:
+        return (table["contact_resids"].tolist(), table["contact_names"].tolist(),
+                table["contact_distances"].astype(np.float64).tolist(), np.diff(table["contact_offsets"]).tolist(), 0)
+    resids, atoms, distances, sizes, missing = [], [], [], [], 0
+    for frame, tid in keys:
+        contactfile = "{}/{}/f{:0>5}_e{:0>4}.txt".format(folder, md, frame + 1, tid)
+        if not os.path.isfile(contactfile):
+            sizes.append(0)
+            missing += 1
+            continue
+        _resids, _atoms, _distances = _read_contacts(contactfile)
+        resids.extend(_resids)
+        atoms.extend(_atoms)
+        distances.extend(_distances)
+        sizes.append(len(_atoms))
+    return resids, atoms, distances, sizes, missing
+
+
+def _parse_mds(worker, data, folder, workers):
+    mds = sorted(data.keys())
+    keys = [[(e.frame, e.tid) for e in data[md]] for md in mds]
+    if workers == 1:
+        return [worker(folder, md, k) for md, k in zip(mds, keys)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(worker, [folder] * len(mds), mds, keys))
+
+
+def _cached(cache_file, key, refresh):
+    if not refresh:
+        if cache_file in _LOADED and _LOADED[cache_file]["key"] == key:
+            return _LOADED[cache_file]
+        if os.path.isfile(cache_file):
+            with np.load(cache_file) as cache:
+                table = {name: cache[name] for name in cache.files}
+            table["key"] = str(table["key"])
+            if table["key"] == key:
+                _LOADED[cache_file] = table
+                return table
+    return None
+
+
+def _save(cache_file, table):
+    tmp_file = cache_file + ".tmp.npz"
+    np.savez(tmp_file, **table)
+    os.replace(tmp_file, cache_file)
+    _LOADED[cache_file] = table
+
+
+def _offsets(sizes):
+    return np.append(0, np.cumsum(sizes)).astype(np.int64)
+
+
+def hbond_table(data, hbond_folder, workers=None, refresh=False):
+    """
+    H-bond counts and solvent H-bond partners of every event, parsed once from the outputs of
+    04_ncontacts_hbonds.get_hbonds (or from the hbond_folder/{md}.npz tables of its interactions engine) and cached in
+    hbond_folder/hbond_table.npz (rebuilt if the events change). Tables with missing outputs are not cached.
+    hbonds_uu, hbonds_uv, hbonds_bridge -> counts of the last frame of the hbond out file (-1 if the files are missing,
+    hbonds_uu is -1 for the interactions engine),
+    solv_offsets -> partners of event i are solv_residues/solv_resids/solv_atoms[solv_offsets[i]:solv_offsets[i + 1]]
+    :param data: Events database, dict(md: list of TEvents)
+    :param workers: Number of processes, default is the number of CPUs, 1 parses in this process
+    :param refresh: Parse the files again even if the cache is valid
+    :returns dict of columns
+    """
+    key = _events_key(data, hbond_folder)
+    cache_file = os.path.join(hbond_folder, HBOND_TABLE)
+    table = _cached(cache_file, key, refresh)
+    if table is not None:
+        return table
+    parsed = _parse_mds(_md_hbonds, data, hbond_folder, workers)
+    counts = np.array([c for p in parsed for c in p[0]], dtype=np.int32).reshape(-1, 3)
+    table = {name: counts[:, i] for i, name in enumerate(HBOND_COLUMNS)}
+    table["solv_offsets"] = _offsets([s for p in parsed for s in p[4]])
+    table["solv_residues"] = np.array([r for p in parsed for r in p[1]], dtype="<U4")
+    table["solv_resids"] = np.array([r for p in parsed for r in p[2]], dtype=np.int32)
+    table["solv_atoms"] = np.array([a for p in parsed for a in p[3]], dtype="<U4")
+    table["key"] = key
+    missing = sum(p[5] for p in parsed)
+    if missing:
+        # not cached, so the outputs written later are read
+        print("Missing hbond outputs of {} events in {}, the table is not cached".format(missing, hbond_folder))
+    else:
+        _save(cache_file, table)
+    return table
+
+
+def contact_table(data, ncontacts_folder, workers=None, refresh=False):
+    """
+    Native contacts of the water of every event, parsed once from the outputs of
+    04_ncontacts_hbonds.get_native_contacts (or from the ncontacts_folder/{md}.npz tables of its interactions engine)
+    and cached in ncontacts_folder/contact_table.npz (not if outputs are missing).
+    contact_offsets -> contacts of event i are contact_resids/contact_atoms/contact_distances
+    [contact_offsets[i]:contact_offsets[i + 1]], contact_resids are the 1-based protein residues
+    :returns dict of columns
+    """
+    key = _events_key(data, ncontacts_folder)
+    cache_file = os.path.join(ncontacts_folder, CONTACT_TABLE)
+    table = _cached(cache_file, key, refresh)
+    if table is not None:
+        return table
+    parsed = _parse_mds(_md_contacts, data, ncontacts_folder, workers)
+    table = {"contact_offsets": _offsets([s for p in parsed for s in p[3]]),
+             "contact_resids": np.array([r for p in parsed for r in p[0]], dtype=np.int32),
+             "contact_atoms": np.array([a for p in parsed for a in p[1]], dtype="<U4"),
+             "contact_distances": np.array([d for p in parsed for d in p[2]], dtype=np.float64),
+             "key": key}
+    missing = sum(p[4] for p in parsed)
+    if missing:
+        print("Missing ncontacts outputs of {} events in {}, the table is not cached".format(missing,
+                                                                                             ncontacts_folder))
+    else:
+        _save(cache_file, table)
+    return table
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Transport event schema of the hbond pipeline and its columnar on-disk database: one folder per database with a .npy
+# file per column and a header.json with the columns and the rows of every MD. Columns are loaded memory-mapped, one
+# MD is read without touching the others and new columns (hbonds, contacts, restype...) are added as new files.
+
+import json
+import os
+import pickle
+import tempfile
+from collections import defaultdict
+from dataclasses import dataclass, field, fields
+
+import numpy as np
+
+@dataclass(order=True)
+class TEvent:
+    tid: int = field(compare=True, hash=True)
+    watid: int = 0
+    frame: int = -1
+    radius: float = 999.999
+    dist2lig: float = 999.999
+    fraction: float = -1.0
+    event_type: str = ""
+    supercluster: int = -1
+    caver_cluster: int = -1
+
+FORMAT_VERSION = 1
+# dtype of the TEvent columns on disk
+EVENT_DTYPES = {"tid": "<i4", "watid": "<i4", "frame": "<i4", "radius": "<f8", "dist2lig": "<f8", "fraction": "<f8",
+                "event_type": "<U7", "supercluster": "<i4", "caver_cluster": "<i4"}
+HEADER = "header.json"
+
+
+class _LegacyUnpickler(pickle.Unpickler):
+    # the old databases were pickled by the scripts themselves, with the TEvent of __main__ (or of another script)
+    def find_class(self, module, name):
+        if name == "TEvent":
+            return TEvent
+        return super().find_class(module, name)
+
+
+def read_legacy_database(dat_file):
+    """Pickled database of the old pipeline, dict(md: list of TEvents), whatever script pickled the TEvents"""
+    with open(dat_file, "rb") as fin:
+        return _LegacyUnpickler(fin).load()
+
+
+class EventData(defaultdict):
+    """dict(md: list of TEvents) read from an EventTable, table -> that table, index -> its event_filters.EventIndex"""
+    def __init__(self, table=None):
+        super().__init__(list)
+        self.table = table
+        self.index = None
+
+    def __reduce__(self):
+        # copies are plain databases, not linked to the table
+        return defaultdict, (list,), None, None, iter(self.items())
+
+
+@dataclass
+class EventTable:
+    """
+    Columnar event database. folder -> database folder, header -> contents of its header.json:
+    'columns' (name: dtype), 'mds' (md: [first row, last row + 1]) and 'n_events'.
+    The events of every MD are contiguous rows, MDs sorted.
+    """
+    folder: str
+    header: dict
+
+    @property
+    def mds(self):
+        return sorted(self.header["mds"])
+
+    @property
+    def columns(self):
+        return list(self.header["columns"])
+
+    def __len__(self):
+        return self.header["n_events"]
+
+    def rows(self, md):
+        """Slice of the rows of an MD"""
+        start, stop = self.header["mds"][md]
+        return slice(start, stop)
+
+    def column(self, name, md=None):
+        """Memory-mapped column, only the rows of md if given"""
+        if name not in self.header["columns"]:
+            raise KeyError("Column {} is not in {}".format(name, self.folder))
+        values = np.load(os.path.join(self.folder, name + ".npy"), mmap_mode="r")
+        if values.shape[0] != len(self):
+            raise ValueError("Column {} of {} has {} rows, the database has {}".format(name, self.folder,
+                                                                                      values.shape[0], len(self)))
+        return values if md is None else values[self.rows(md)]
+
+    def md_column(self):
+        """Name of the MD of every row"""
+        names = np.empty(len(self), dtype="<U{}".format(max((len(md) for md in self.mds), default=1)))
+        for md in self.mds:
+            names[self.rows(md)] = md
+        return names
+
+    def events(self, md):
+        """
+        TEvents of an MD, the columns that are not TEvent fields are set as attributes (skipped if they do not have
+        one row per event)
+        """
+        event_fields = {f.name for f in fields(TEvent)}
+        values = {}
+        for name in self.columns:
+            try:
+                values[name] = self.column(name, md)
+            except ValueError as error:
+                if name in event_fields:
+                    raise
+                print("Column {} skipped: {}".format(name, error))
+        events = []
+        for i in range(self.rows(md).stop - self.rows(md).start):
+            event = TEvent(**{name: values[name][i].item() for name in values if name in event_fields})
+            for name in values:
+                if name not in event_fields:
+                    setattr(event, name, values[name][i].item())
+            events.append(event)
+        return events
+
+    def to_dict(self, mds=None):
+        """dict(md: list of TEvents) like the old pickled databases, as EventData"""
+        data = EventData(self)
+        for md in (self.mds if mds is None else mds):
+            data[md] = self.events(md)
+        return data
+
+    def add_column(self, name, values, overwrite=False):
+        """Saves a new column (one value per row, in the row order) without rewriting the others"""
+        values = np.asarray(values)
+        if values.shape[0] != len(self):
+            raise ValueError("Column {} has {} rows, the database has {}".format(name, values.shape[0], len(self)))
+        if name in self.header["columns"] and not overwrite:
+            raise ValueError("Column {} is already in {}".format(name, self.folder))
+        _save_npy(os.path.join(self.folder, name + ".npy"), values)
+        self.header["columns"][name] = values.dtype.str
+        _write_header(self.folder, self.header)
+
+
+def _replace_file(target, write, mode):
+    # writes a temporary file of its own next to target and moves it over target, so concurrent writers (workers
+    # adding the same cached column) never write the same file and readers never see a partial one
+    fd, tmp_file = tempfile.mkstemp(prefix=os.path.basename(target) + ".", suffix=".tmp",
+                                    dir=os.path.dirname(target) or ".")
+    try:
+        with os.fdopen(fd, mode) as fout:
+            write(fout)
+        os.replace(tmp_file, target)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+
+def _save_npy(npy_file, values):
+    _replace_file(npy_file, lambda fout: np.save(fout, values), "wb")
+
+
+def _write_header(folder, header):
+    _replace_file(os.path.join(folder, HEADER), lambda fout: json.dump(header, fout, indent=1), "w")
+
+
+def write_event_table(folder, data):
+    """
+    Saves a database, dict(md: list of TEvents), as a columnar event table.
+    :returns EventTable
+    """
+    os.makedirs(folder, exist_ok=True)
+    mds = sorted(md for md in data if len(data[md]))
+    events = [event for md in mds for event in data[md]]
+    counts = np.cumsum([0] + [len(data[md]) for md in mds])
+    header = {"version": FORMAT_VERSION, "columns": {}, "n_events": len(events),
+              "mds": {md: [int(counts[i]), int(counts[i + 1])] for i, md in enumerate(mds)}}
+    for name, dtype in EVENT_DTYPES.items():
+        _save_npy(os.path.join(folder, name + ".npy"), np.array([getattr(e, name) for e in events], dtype=dtype))
+        header["columns"][name] = dtype
+    _write_header(folder, header)
+    return EventTable(folder, header)
+
+
+def load_event_table(database):
+    """
+    Event table of a database folder. A legacy pickled database (database_*.dat) is converted once to the folder of
+    the same name without extension.
+    """
+    folder = os.path.splitext(database)[0] if database.endswith(".dat") else database
+    if not os.path.isfile(os.path.join(folder, HEADER)):
+        if not os.path.isfile(database):
+            raise FileNotFoundError("No event database at {}".format(database))
+        print("Converting legacy database {} to {}".format(database, folder))
+        return write_event_table(folder, read_legacy_database(database))
+    with open(os.path.join(folder, HEADER), "r") as fin:
+        header = json.load(fin)
+    if header["version"] > FORMAT_VERSION:
+        raise ValueError("Event database {} has version {}, this code reads up to version {}".format(
+            folder, header["version"], FORMAT_VERSION))
+    return EventTable(folder, header)
+
+
+def load_events(database, mds=None):
+    """dict(md: list of TEvents) of a database folder (or legacy pickle), only the given MDs if mds is set"""
+    return load_event_table(database).to_dict(mds)
+
+
+def database_tag(database):
+    """'1_4_O' of ../databases/database_1_4_O (or database_1_4_O.dat)"""
+    name = os.path.basename(os.path.normpath(database))
+    return os.path.splitext(name)[0][len("database_"):]
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# One binary store of the event frames per MD, read by random access from merged.nc (replaces the PDB file per frame
+# written by cpptraj in 03_get_snapshots.py), read by the interactions engine of 04_ncontacts_hbonds.py
+
+import os
+from dataclasses import dataclass
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from interactions import FRAME_CHUNK, read_frames, read_parm7
+
+
+@dataclass
+class FrameStore:
+    """
+    Frames of one MD. frames -> 1-based frame numbers (like the f{:0>5}.pdb files), sorted,
+    offsets -> rows of every frame in atoms/coords (coords[offsets[i]:offsets[i + 1]]),
+    atoms -> 0-based atom indices of the stored rows (all atoms of the topology if the store was not cut),
+    boxes -> box lengths per frame (NaN without box),
+    water_offsets/waters -> event waters (0-based residues) of every frame the atoms were cut around,
+    radius -> radius (A) the atoms were cut with, None if all atoms are stored
+    """
+    frames: np.ndarray
+    offsets: np.ndarray
+    atoms: np.ndarray
+    coords: np.ndarray
+    boxes: np.ndarray
+    water_offsets: np.ndarray
+    waters: np.ndarray
+    radius: float = None
+
+    def index(self, frame):
+        """Position of a 1-based frame number in frames"""
+        i = np.searchsorted(self.frames, frame)
+        if i == len(self.frames) or self.frames[i] != frame:
+            raise KeyError("Frame {} is not in the store".format(frame))
+        return i
+
+    def frame(self, frame):
+        """(atom indices, coordinates) of a 1-based frame number"""
+        i = self.index(frame)
+        rows = slice(self.offsets[i], self.offsets[i + 1])
+        return self.atoms[rows], self.coords[rows]
+
+    def frame_waters(self, i):
+        return self.waters[self.water_offsets[i]:self.water_offsets[i + 1]]
+
+
+STORE_ARRAYS = ("frames", "offsets", "atoms", "coords", "boxes", "water_offsets", "waters")
+
+
+def load_frame_store(store_file):
+    """FrameStore of an npz store, the radius of stores saved without it is NaN (unknown)"""
+    with np.load(store_file) as store:
+        radius = float(store["radius"]) if "radius" in store.files else np.nan
+        return FrameStore(*(store[name] for name in STORE_ARRAYS), radius=None if radius == -1 else radius)
+
+
+def _atoms_near(topology, coords, box, waters, radius):
+    # whole residues with any atom within radius of the oxygen of an event water
+    if box is not None:
+        coords = coords - np.floor(coords / box) * box
+        coords[coords >= box] = 0
+    tree = cKDTree(coords, boxsize=box)
+    near = tree.query_ball_point(coords[topology.water_oxygens(waters)], radius)
+    residues = np.unique(topology.atom_residue[np.concatenate(near).astype(np.int64)])
+    starts, ends = topology.residue_start[residues], topology.residue_start[residues + 1]
+    return np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+
+
+def write_frame_store(md_folder, events, store_file, radius=None):
+    """
+    Reads the frames of the events (frame + 1, sorted and deduplicated) from md_folder/merged.nc and saves them in
+    one npz store. Frames already in an existing store are not read again, unless they were cut around other waters
+    or the store was written with another radius (then every frame is read again).
+    :param radius: Keep only the residues within radius (A) of the event waters of every frame, None keeps all atoms
+    :returns FrameStore
+    """
+    event_frames = np.array([e.frame + 1 for e in events], dtype=np.int64)
+    event_waters = np.array([e.watid for e in events], dtype=np.int64)
+    frames = np.unique(event_frames)
+    waters_of = {frame: np.unique(event_waters[event_frames == frame]) for frame in frames} if radius is not None \
+        else {frame: np.zeros(0, dtype=np.int64) for frame in frames}
+    old = load_frame_store(store_file) if os.path.isfile(store_file) else None
+    if old is not None and old.radius != radius:
+        print("Frame store {} was cut with radius {}, reading all frames with radius {}".format(store_file,
+                                                                                                old.radius, radius))
+        old = None
+    missing = frames
+    if old is not None:
+        # a frame cut around other waters is read again
+        stored = {frame: old.frame_waters(i) for i, frame in enumerate(old.frames)}
+        missing = np.array([frame for frame in frames if frame not in stored or
+                            not np.isin(waters_of[frame], stored[frame]).all()], dtype=np.int64)
+        if len(missing) == 0:
+            return old
+        keep = ~np.isin(old.frames, missing)
+    topology = read_parm7(os.path.join(md_folder, "structure_HMR.parm7")) if radius is not None else None
+    atoms, coords, boxes, waters = [], [], [], []
+    for start in range(0, len(missing), FRAME_CHUNK):
+        chunk = missing[start:start + FRAME_CHUNK]
+        chunk_coords, chunk_boxes, orthorhombic = read_frames(os.path.join(md_folder, "merged.nc"), chunk - 1)
+        if chunk_boxes is not None and not orthorhombic:
+            # only the box lengths are stored, and the cut uses the orthorhombic periodic KD-tree
+            raise ValueError("{} has non-orthorhombic boxes, only orthorhombic boxes are supported".format(
+                os.path.join(md_folder, "merged.nc")))
+        for i, frame in enumerate(chunk):
+            box = chunk_boxes[i] if chunk_boxes is not None else np.full(3, np.nan)
+            if radius is None:
+                kept = np.arange(chunk_coords.shape[1])
+            else:
+                kept = _atoms_near(topology, chunk_coords[i], None if chunk_boxes is None else box,
+                                   waters_of[frame], radius)
+            atoms.append(kept.astype(np.int32))
+            coords.append(chunk_coords[i][kept])
+            boxes.append(box)
+            waters.append(waters_of[frame])
+    all_frames = missing
+    if old is not None:
+        for i in np.flatnonzero(keep):
+            rows = slice(old.offsets[i], old.offsets[i + 1])
+            atoms.append(old.atoms[rows])
+            coords.append(old.coords[rows])
+            boxes.append(old.boxes[i])
+            waters.append(old.frame_waters(i))
+        all_frames = np.concatenate([missing, old.frames[keep]])
+    order = np.argsort(all_frames)
+    counts = np.array([len(atoms[i]) for i in order], dtype=np.int64)
+    water_counts = np.array([len(waters[i]) for i in order], dtype=np.int64)
+    store = FrameStore(all_frames[order].astype(np.int32), np.append(0, np.cumsum(counts)),
+                       np.concatenate([atoms[i] for i in order]).astype(np.int32),
+                       np.concatenate([coords[i] for i in order]).astype(np.float32),
+                       np.array([boxes[i] for i in order], dtype=np.float64).reshape(-1, 3),
+                       np.append(0, np.cumsum(water_counts)),
+                       np.concatenate([waters[i] for i in order]).astype(np.int32), radius)
+    tmp_file = store_file + ".tmp.npz"
+    # -1 is a full store (radius None)
+    np.savez(tmp_file, radius=np.float64(-1 if radius is None else radius),
+             **{name: getattr(store, name) for name in STORE_ARRAYS})
+    os.replace(tmp_file, store_file)
+    return store
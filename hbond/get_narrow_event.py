@@ -1,64 +1,32 @@
 # Python script to get the exact matching text file name for events having radii of 1A or lesser
 
 import os
-import pickle
 import numpy as np
 from sys import argv
 import matplotlib.pyplot as plt
 from collections import defaultdict
-from dataclasses import dataclass, field
 
-@dataclass(order=True)
-class TEvent:
-    tid: int = field(compare=True, hash=True)
-    watid: int = 0
-    frame: int = -1
-    radius: float = 999.999
-    dist2lig: float = 999.999
-    fraction: float = -1.0
-    event_type: str = ""
-    supercluster: int = -1
-    caver_cluster: int = -1
+from event_outputs import hbond_table, iter_events
+from event_filters import EventFilter, event_index
+from events import load_events
 
 def get_narrow_tunnel_radii(data,hbond_outfolder, outfolder, tag="", frac_thr=0.7):
-    def _get_hbonds(hbondfile):
-        hbonds = 0
-        with open(hbondfile, "r") as hfile:
-            for line in hfile:
-                if line.startswith("#"):
-                    continue
-                hbonds = int(line.strip().split()[2])
-        return hbonds
-
-    mds = list(data.keys())
-    mds.sort()
-    for md in mds:
-        for event in data[md]:
-            # hbondfile = "{}/hbonds/{}/f{:0>5}_e{:0>4}.txt".format(outfolder, md, event.frame+1, event.tid)
-            hbondfile = "{}/{}/f{:0>5}_e{:0>4}.txt".format(hbond_outfolder, md, event.frame + 1, event.tid)
-            event.hbonds = _get_hbonds(hbondfile)
-
-    sc_mds = defaultdict(int)
-    for md in mds:
-        _scs = set()
-        for event in data[md]:
-            if event.fraction >= frac_thr:
-                _scs.add(event.supercluster)
-        for s in _scs:
-            sc_mds[s] += 1
-
+    hbonds = hbond_table(data, hbond_outfolder)["hbonds_uv"]
+    index = event_index(data)
+    # buried events with radius of 1 A or lesser and at least one H-bond
+    selected = index.mask(EventFilter(frac_thr=frac_thr, min_replicas=1, radius_range=(-np.inf, 1),
+                                      hbonds_range=(1, np.inf)), hbonds=hbonds)
+    events = list(iter_events(data))
 
     file_names =defaultdict(list)
-    for md in mds:
-        for event in data[md]:
-            if (event.fraction >= frac_thr) and (sc_mds[event.supercluster] >= 1) and (event.radius <= 1)\
-                    and (event.hbonds >=1):
-                hbondfile = "{}/{}/f{:0>5}_e{:0>4}.txt".format(hbond_outfolder, md, event.frame + 1, event.tid)
-                exact_matching_file_name = f"{event.tid}_{event.event_type}_sc{event.supercluster}.txt"
-                if md not in file_names:
-                    file_names[md]=[[event.watid,hbondfile,exact_matching_file_name]]
-                else:
-                    file_names[md].append([event.watid,hbondfile,exact_matching_file_name])
+    for i in np.flatnonzero(selected):
+        md, event = index.mds[index.md[i]], events[i]
+        hbondfile = "{}/{}/f{:0>5}_e{:0>4}.txt".format(hbond_outfolder, md, event.frame + 1, event.tid)
+        exact_matching_file_name = f"{event.tid}_{event.event_type}_sc{event.supercluster}.txt"
+        if md not in file_names:
+            file_names[md]=[[event.watid,hbondfile,exact_matching_file_name]]
+        else:
+            file_names[md].append([event.watid,hbondfile,exact_matching_file_name])
     for key,value in file_names.items():
         if len(value) ==1:
             print(key, "-->", *value,"\n")
@@ -68,9 +36,8 @@ def get_narrow_tunnel_radii(data,hbond_outfolder, outfolder, tag="", frac_thr=0.
 
 
 if __name__ == '__main__':
-    dat_file = "/data/aravindramt/dean/tt/hbond/databases/database_1_T3.dat"
-    with open(dat_file, "rb") as fin:
-        database = pickle.load(fin)
+    dat_file = "/data/aravindramt/dean/tt/hbond/databases/database_1_T3"
+    database = load_events(dat_file)
     hbond_outfolder = "/data/aravindramt/dean/tt/hbond/hbonds/hb_1_T3"
     plot_folder = "/data/aravindramt/dean/tt/hbond/plots/1_TIP3P"
 
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# In-process H-bond and contact analysis of transport event waters, read straight from merged.nc and
+# structure_HMR.parm7 (replaces the PDB snapshots of 03_get_snapshots.py and the cpptraj runs of
+# 04_ncontacts_hbonds.py)
+
+import os
+from dataclasses import dataclass
+
+import numpy as np
+from scipy.io import netcdf_file
+from scipy.spatial import cKDTree
+
+from events import load_event_table
+
+# Same criteria as the cpptraj runs of 04_ncontacts_hbonds.py: hbond 'dist 3.5' (donor heavy atom - acceptor) with the
+# default angle cutoff of 135 degrees (donor - H ... acceptor), nativecontacts default distance of 7 A
+HB_DISTANCE = 3.5
+HB_ANGLE = 135.0
+CONTACT_DISTANCE = 7.0
+POLAR_ELEMENTS = (7, 8, 9)
+# Solvent residues, never H-bond partners (cpptraj 'solventdonor/solventacceptor' only reports solute-solvent H-bonds)
+SOLVENT_RESIDUES = ("WAT", "HOH", "TIP3", "TP3", "T3P", "TIP4", "TP4", "T4E", "OPC", "SPC", "SPCE")
+# Frames read from the trajectory at once
+FRAME_CHUNK = 256
+
+
+@dataclass
+class Topology:
+    """
+    Atoms and residues of an AMBER parm7 file, atom and residue indices are 0-based.
+    atom_residue -> residue of every atom, residue_start -> first atom of every residue (+ number of atoms at the end),
+    h_offsets/h_atoms -> hydrogens bonded to every atom as CSR (h_atoms[h_offsets[i]:h_offsets[i + 1]])
+    """
+    atom_names: np.ndarray
+    atomic_numbers: np.ndarray
+    residue_names: np.ndarray
+    residue_start: np.ndarray
+    atom_residue: np.ndarray
+    h_offsets: np.ndarray
+    h_atoms: np.ndarray
+
+    @property
+    def n_atoms(self):
+        return len(self.atom_names)
+
+    def residue_atoms(self, residue):
+        return np.arange(self.residue_start[residue], self.residue_start[residue + 1])
+
+    def solute_atoms(self, waters=()):
+        """Mask of the atoms not in solvent residues (SOLVENT_RESIDUES or residues named like the given waters)"""
+        solvent_names = list(SOLVENT_RESIDUES) + list(self.residue_names[np.asarray(waters, dtype=np.int64)])
+        return ~np.isin(self.residue_names, solvent_names)[self.atom_residue]
+
+    def water_oxygens(self, residues):
+        """Oxygen atom of every water residue"""
+        oxygens = np.full(len(residues), -1, dtype=np.int64)
+        for i, residue in enumerate(residues):
+            atoms = self.residue_atoms(residue)
+            oxygens[i] = atoms[self.atomic_numbers[atoms] == 8][0]
+        return oxygens
+
+
+def _parm7_sections(parm7_file):
+    sections = {}
+    with open(parm7_file, "r") as fin:
+        flag, fmt, lines = None, None, []
+        for line in fin:
+            if line.startswith("%FLAG"):
+                if flag is not None:
+                    sections[flag] = (fmt, lines)
+                flag, fmt, lines = line.split()[1], None, []
+            elif line.startswith("%FORMAT"):
+                fmt = line[line.index("(") + 1:line.index(")")]
+            elif flag is not None and not line.startswith("%"):
+                lines.append(line.rstrip("\n"))
+        if flag is not None:
+            sections[flag] = (fmt, lines)
+    return sections
+
+
+def _parm7_values(sections, flag, dtype):
+    fmt, lines = sections[flag]
+    if "a" in fmt:
+        width = int(fmt.split("a")[1])
+        text = "".join(line.ljust(len(line) + (-len(line)) % width) for line in lines)
+        return np.array([text[i:i + width].strip() for i in range(0, len(text), width)])
+    return np.array(" ".join(lines).split(), dtype=dtype)
+
+
+def read_parm7(parm7_file):
+    sections = _parm7_sections(parm7_file)
+    pointers = _parm7_values(sections, "POINTERS", np.int64)
+    n_atoms, n_residues = pointers[0], pointers[11]
+    atom_names = _parm7_values(sections, "ATOM_NAME", str)[:n_atoms]
+    residue_names = _parm7_values(sections, "RESIDUE_LABEL", str)[:n_residues]
+    residue_start = np.append(_parm7_values(sections, "RESIDUE_POINTER", np.int64) - 1, n_atoms)
+    atom_residue = np.repeat(np.arange(n_residues), np.diff(residue_start))
+    if "ATOMIC_NUMBER" in sections:
+        atomic_numbers = _parm7_values(sections, "ATOMIC_NUMBER", np.int64)
+    else:
+        # old parm7 files, the masses are repartitioned (HMR) so the element is guessed from the name
+        by_letter = {"H": 1, "C": 6, "N": 7, "O": 8, "F": 9, "S": 16, "P": 15}
+        atomic_numbers = np.array([by_letter.get(name[0], 0) if not name.startswith("EP") else 0
+                                   for name in atom_names])
+    # bonds with hydrogens are (3 * i, 3 * j, type) triplets
+    bonds = _parm7_values(sections, "BONDS_INC_HYDROGEN", np.int64).reshape(-1, 3)[:, :2] // 3
+    bonds = np.concatenate([bonds, bonds[:, ::-1]])
+    heavy_h = bonds[(atomic_numbers[bonds[:, 0]] > 1) & (atomic_numbers[bonds[:, 1]] == 1)]
+    heavy_h = heavy_h[np.argsort(heavy_h[:, 0], kind="stable")]
+    h_offsets = np.zeros(n_atoms + 1, dtype=np.int64)
+    np.cumsum(np.bincount(heavy_h[:, 0], minlength=n_atoms), out=h_offsets[1:])
+    return Topology(atom_names, atomic_numbers, residue_names, residue_start, atom_residue, h_offsets,
+                    heavy_h[:, 1].copy())
+
+
+def read_frames(nc_file, frames):
+    """
+    Coordinates and box lengths of the frames (0-based) of an AMBER NetCDF trajectory.
+    :returns (frames, atoms, 3) float32 coordinates, (frames, 3) box lengths or None, True if the box is orthorhombic
+    """
+    with netcdf_file(nc_file, "r", mmap=True) as nc:
+        coords = np.array(nc.variables["coordinates"][frames], dtype=np.float32)
+        box, orthorhombic = None, False
+        if "cell_lengths" in nc.variables:
+            box = np.array(nc.variables["cell_lengths"][frames], dtype=np.float64)
+            orthorhombic = bool(np.allclose(nc.variables["cell_angles"][frames], 90.0))
+    return coords, box, orthorhombic
+
+
+def _expand_hydrogens(topology, donors):
+    # every (pair, hydrogen of the donor of the pair)
+    counts = topology.h_offsets[donors + 1] - topology.h_offsets[donors]
+    pairs = np.repeat(np.arange(len(donors)), counts)
+    starts = np.repeat(topology.h_offsets[donors], counts)
+    positions = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return pairs, topology.h_atoms[starts + positions]
+
+
+def _vectors(coords, origin, target, box):
+    vectors = coords[target] - coords[origin]
+    if box is not None:
+        vectors -= box * np.round(vectors / box)
+    return vectors
+
+
+def _hbond_triplets(topology, coords, box, donors, hydrogens, acceptors, min_angle):
+    # D - H ... A angle at the hydrogen
+    h_d = _vectors(coords, hydrogens, donors, box)
+    h_a = _vectors(coords, hydrogens, acceptors, box)
+    cosine = (h_d * h_a).sum(axis=1) / np.linalg.norm(h_d, axis=1) / np.linalg.norm(h_a, axis=1)
+    return cosine <= np.cos(np.radians(min_angle))
+
+
+def frame_interactions(topology, coords, box, waters, protein_atoms, polar_atoms, hb_distance=HB_DISTANCE,
+                       hb_angle=HB_ANGLE, contact_distance=CONTACT_DISTANCE):
+    """
+    H-bonds and protein contacts of the event waters of one frame, all waters at once with one KD-tree per atom set.
+    The event water is both donor (its hydrogens) and acceptor (its oxygen), partners are the N, O and F atoms of the
+    solute (like the solute-solvent H-bonds of cpptraj), H-bonds with other waters are not counted.
+    :param waters: Residue indices of the event waters
+    :param polar_atoms: N, O and F atoms of the solute, see Topology.solute_atoms
+    :returns per water lists of (H-bond partner atoms), (contact atoms, contact distances)
+    """
+    if box is not None:
+        # wrap into [0, box) as required by the periodic KD-tree
+        coords = coords - np.floor(coords / box) * box
+        coords[coords >= box] = 0
+    oxygens = topology.water_oxygens(waters)
+    polar_tree = cKDTree(coords[polar_atoms], boxsize=box)
+    partners = polar_tree.query_ball_point(coords[oxygens], hb_distance)
+    counts = np.array([len(p) for p in partners], dtype=np.int64)
+    event_of_pair = np.repeat(np.arange(len(waters)), counts)
+    partner_atoms = polar_atoms[np.concatenate(partners).astype(np.int64)] if counts.sum() else \
+        np.zeros(0, dtype=np.int64)
+    own = topology.atom_residue[partner_atoms] == waters[event_of_pair]
+    event_of_pair, partner_atoms = event_of_pair[~own], partner_atoms[~own]
+    water_o = oxygens[event_of_pair]
+
+    # event water donating to the partner, then partner donating to the event water
+    pair, hydrogens = _expand_hydrogens(topology, water_o)
+    donating = _hbond_triplets(topology, coords, box, water_o[pair], hydrogens, partner_atoms[pair], hb_angle)
+    hbond_pairs = [pair[donating]]
+    pair, hydrogens = _expand_hydrogens(topology, partner_atoms)
+    accepting = _hbond_triplets(topology, coords, box, partner_atoms[pair], hydrogens, water_o[pair], hb_angle)
+    hbond_pairs.append(pair[accepting])
+    hbond_pairs = np.sort(np.concatenate(hbond_pairs), kind="stable")
+    hbonds = np.split(partner_atoms[hbond_pairs], np.searchsorted(event_of_pair[hbond_pairs],
+                                                                  np.arange(1, len(waters))))
+
+    protein_tree = cKDTree(coords[protein_atoms], boxsize=box)
+    near = protein_tree.query_ball_point(coords[oxygens], contact_distance)
+    contacts = []
+    for i, atoms in enumerate(near):
+        atoms = protein_atoms[np.sort(np.array(atoms, dtype=np.int64))]
+        distances = np.linalg.norm(_vectors(coords, np.full(len(atoms), oxygens[i]), atoms, box), axis=1)
+        contacts.append((atoms, distances.astype(np.float32)))
+    return hbonds, contacts
+
+
+def _store_frames(frame_store, frames, waters_of, n_atoms, min_radius):
+    # (coordinates of all atoms, box, stored atoms mask) of the frames of a frame_store.FrameStore, the atoms that are
+    # not in the store are at the origin and left out of the partners
+    if frame_store.radius is not None and not frame_store.radius >= min_radius:
+        raise ValueError("The frame store was cut with radius {}, the interactions need at least {} A".format(
+            frame_store.radius, min_radius))
+    for frame in frames:
+        i = frame_store.index(frame + 1)
+        if frame_store.radius is not None and not np.isin(waters_of[frame], frame_store.frame_waters(i)).all():
+            raise ValueError("Frame {} of the store was not cut around all event waters".format(frame + 1))
+        atoms, xyz = frame_store.frame(frame + 1)
+        coords = np.zeros((n_atoms, 3), dtype=np.float32)
+        coords[atoms] = xyz
+        stored = np.zeros(n_atoms, dtype=bool)
+        stored[atoms] = True
+        box = frame_store.boxes[i]
+        yield coords, None if np.isnan(box).any() else box, stored
+
+
+def _trajectory_frames(nc_file, frames):
+    # (coordinates, box, None) of the frames of merged.nc, read in chunks
+    for start in range(0, len(frames), FRAME_CHUNK):
+        chunk = frames[start:start + FRAME_CHUNK]
+        coords, boxes, orthorhombic = read_frames(nc_file, chunk)
+        if boxes is not None and not orthorhombic:
+            # the periodic KD-tree and the minimum image of _vectors are only valid for orthorhombic boxes
+            raise ValueError("{} has non-orthorhombic boxes (e.g. a truncated octahedron), only orthorhombic boxes "
+                             "are supported".format(nc_file))
+        for i in range(len(chunk)):
+            yield coords[i], boxes[i] if boxes is not None else None, None
+
+
+def md_interactions(md_folder, events, prot_size, topology=None, hb_distance=HB_DISTANCE, hb_angle=HB_ANGLE,
+                    contact_distance=CONTACT_DISTANCE, frame_store=None):
+    """
+    H-bonds and contacts of all events of one MD, reading the frames of the events from merged.nc in chunks, or from
+    a frame store of 03_get_snapshots.py.
+    :param md_folder: Simulation folder with structure_HMR.parm7 and merged.nc
+    :param events: TEvents of the MD (frame is 0-based, watid is the 0-based water residue)
+    :param prot_size: Number of protein residues (contacts are counted with residues 1-prot_size)
+    :param frame_store: frame_store.FrameStore with the frames of the events, cut with a radius of at least
+    contact_distance (or not cut), merged.nc is not read
+    :returns dict of per event columns (in the order of events) and CSR lists of partner atoms, with the residue name,
+    residue number (1-based) and atom name of every partner
+    """
+    if topology is None:
+        topology = read_parm7(os.path.join(md_folder, "structure_HMR.parm7"))
+    protein_atoms = np.flatnonzero((topology.atom_residue < prot_size) & (topology.atomic_numbers > 1))
+    frames = np.array([e.frame for e in events], dtype=np.int64)
+    waters = np.array([e.watid for e in events], dtype=np.int64)
+    polar_atoms = np.flatnonzero(np.isin(topology.atomic_numbers, POLAR_ELEMENTS) & topology.solute_atoms(waters))
+    order = np.argsort(frames, kind="stable")
+    unique_frames = np.unique(frames)
+    hbond_lists = [None] * len(events)
+    contact_lists = [None] * len(events)
+    events_of = {frame: order[np.searchsorted(frames[order], frame, side="left"):
+                              np.searchsorted(frames[order], frame, side="right")] for frame in unique_frames}
+    if frame_store is None:
+        frame_coords = _trajectory_frames(os.path.join(md_folder, "merged.nc"), unique_frames)
+    else:
+        frame_coords = _store_frames(frame_store, unique_frames, {f: waters[e] for f, e in events_of.items()},
+                                     topology.n_atoms, max(contact_distance, hb_distance))
+    for frame, (coords, box, stored) in zip(unique_frames, frame_coords):
+        selected = events_of[frame]
+        frame_protein, frame_polar = protein_atoms, polar_atoms
+        if stored is not None:
+            frame_protein, frame_polar = protein_atoms[stored[protein_atoms]], polar_atoms[stored[polar_atoms]]
+        hbonds, contacts = frame_interactions(topology, coords, box, waters[selected], frame_protein, frame_polar,
+                                              hb_distance, hb_angle, contact_distance)
+        for j, event in enumerate(selected):
+            hbond_lists[event] = hbonds[j]
+            contact_lists[event] = contacts[j]
+
+    hbond_counts = np.array([len(h) for h in hbond_lists], dtype=np.int32)
+    hbond_atoms = np.concatenate(hbond_lists).astype(np.int32) if len(events) else np.zeros(0, dtype=np.int32)
+    # the event water bridges two protein residues
+    bridges = np.array([len(np.unique(topology.atom_residue[h][topology.atom_residue[h] < prot_size])) >= 2
+                        for h in hbond_lists], dtype=np.int32)
+    contact_counts = np.array([len(c[0]) for c in contact_lists], dtype=np.int32)
+    contact_atoms = np.concatenate([c[0] for c in contact_lists]).astype(np.int32) if len(events) \
+        else np.zeros(0, dtype=np.int32)
+    return {"tid": np.array([e.tid for e in events], dtype=np.int32), "frame": frames.astype(np.int32),
+            "watid": waters.astype(np.int32), "event_type": np.array([e.event_type for e in events], dtype="U7"),
+            "hbonds": hbond_counts,
+            "hbonds_protein": np.array([(topology.atom_residue[h] < prot_size).sum() for h in hbond_lists],
+                                       dtype=np.int32),
+            "bridges": bridges,
+            "hbond_offsets": np.append(0, np.cumsum(hbond_counts)).astype(np.int64), "hbond_atoms": hbond_atoms,
+            "contact_offsets": np.append(0, np.cumsum(contact_counts)).astype(np.int64),
+            "hbond_residues": topology.residue_names[topology.atom_residue[hbond_atoms]].astype("<U4"),
+            "hbond_resids": (topology.atom_residue[hbond_atoms] + 1).astype(np.int32),
+            "hbond_names": topology.atom_names[hbond_atoms].astype("<U4"),
+            "contact_atoms": contact_atoms,
+            "contact_resids": (topology.atom_residue[contact_atoms] + 1).astype(np.int32),
+            "contact_names": topology.atom_names[contact_atoms].astype("<U4"),
+            "contact_distances": np.concatenate([c[1] for c in contact_lists]) if len(events)
+            else np.zeros(0, dtype=np.float32)}
+
+
+def _merge_tables(tables):
+    # per MD tables in the row order of the event table, the offsets of every MD are shifted by the partners before it
+    merged = {}
+    for column in tables[0]:
+        if column.endswith("_offsets"):
+            shifts = np.cumsum([0] + [t[column][-1] for t in tables[:-1]])
+            merged[column] = np.concatenate([[0]] + [t[column][1:] + s for t, s in zip(tables, shifts)])
+        else:
+            merged[column] = np.concatenate([t[column] for t in tables])
+    return merged
+
+
+def get_interactions(datafile, simulation_folder, outfile, prot_size, hb_distance=HB_DISTANCE, hb_angle=HB_ANGLE,
+                     contact_distance=CONTACT_DISTANCE):
+    """
+    H-bonds and contacts of every event of an events database, saved as one npz table: the per event columns of all
+    MDs concatenated (in the row order of the event table) with an 'md' column, partner atoms as CSR.
+    """
+    events = load_event_table(datafile)
+    if not events.mds:
+        raise ValueError("No events in {}".format(datafile))
+    tables = []
+    for md in events.mds:
+        md_events = events.events(md)
+        table = md_interactions(os.path.join(simulation_folder, md), md_events, prot_size, hb_distance=hb_distance,
+                                hb_angle=hb_angle, contact_distance=contact_distance)
+        table["md"] = np.full(len(md_events), md)
+        tables.append(table)
+        print("Finished interactions of md:", md)
+    merged = _merge_tables(tables)
+    np.savez(outfile, **merged)
+    return merged
+
+
+def save_md_interactions(outfile, table):
+    """Saves the table of md_interactions of one MD ({md}.npz read by collect_interactions and event_outputs)"""
+    tmp_file = outfile + ".tmp.npz"
+    np.savez(tmp_file, **table)
+    os.replace(tmp_file, outfile)
+
+
+def collect_interactions(datafile, folder, outfile=None):
+    """
+    Table of get_interactions of a database from the {md}.npz files of md_interactions saved in folder (e.g. by the
+    work units of 04_ncontacts_hbonds.py), saved to outfile if given.
+    """
+    events = load_event_table(datafile)
+    if not events.mds:
+        raise ValueError("No events in {}".format(datafile))
+    missing = [md for md in events.mds if not os.path.isfile(os.path.join(folder, "{}.npz".format(md)))]
+    if missing:
+        raise FileNotFoundError("No interactions of the MDs {} in {}".format(", ".join(missing), folder))
+    tables = []
+    for md in events.mds:
+        with np.load(os.path.join(folder, "{}.npz".format(md))) as saved:
+            table = {name: saved[name] for name in saved.files}
+        rows = events.rows(md)
+        if not (np.array_equal(table["tid"], events.column("tid", md)) and
+                np.array_equal(table["frame"], events.column("frame", md))):
+            raise ValueError("The interactions of {} in {} are not of the events of {}".format(md, folder, datafile))
+        table["md"] = np.full(rows.stop - rows.start, md)
+        tables.append(table)
+    merged = _merge_tables(tables)
+    if outfile is not None:
+        np.savez(outfile, **merged)
+    return merged
+
+
+def add_interaction_columns(datafile, table):
+    """Adds (or replaces) the hbonds, hbonds_protein and bridges columns of an event table from get_interactions"""
+    events = load_event_table(datafile)
+    for column in ("hbonds", "hbonds_protein", "bridges"):
+        events.add_column(column, table[column], overwrite=True)
+    return events
+
+
+def annotate_events(data, table):
+    """Sets hbonds, hbonds_protein and bridges of the TEvents of a database from a table of get_interactions"""
+    row = 0
+    for md in sorted(data.keys()):
+        for event in data[md]:
+            event.hbonds = int(table["hbonds"][row])
+            event.hbonds_protein = int(table["hbonds_protein"][row])
+            event.bridges = int(table["bridges"][row])
+            row += 1
+
+
+if __name__ == "__main__":
+    epochs = ["1_4", "1_8"]
+    models = ["O", "T3", "T4"]
+    for epoch in epochs:
+        for model in models:
+            database_name = f"../databases/database_{epoch}_{model}"
+            simulation_folder = "../../../md/simulations"
+            table = get_interactions(database_name, simulation_folder, f"../hbonds/interactions_{epoch}_{model}.npz",
+                                     293)
+            add_interaction_columns(database_name, table)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Residue names and residue classes (backbone, nonpolar, polar, positive, negative) of a protein read from its parm7
+# topology, so contacts and H-bonds are classified with array lookups instead of per protein residue dicts.
+
+import hashlib
+import os
+
+import numpy as np
+
+from interactions import read_parm7
+
+# Class codes, in the order of the stacked histograms of 05_analyze_ncontacts_hbonds.py, -1 is not in any class
+RESIDUE_CLASSES = ("bbone", "aa_nonp", "aa_polar", "aa_pos", "aa_neg")
+BACKBONE, OTHER = 0, -1
+CLASS_RESIDUES = {"aa_nonp": {"ALA", "GLY", "ILE", "LEU", "MET", "PHE", "PRO", "TRP", "VAL"},
+                  "aa_polar": {"ASN", "CYS", "CYX", "GLN", "SER", "THR", "TYR"},
+                  "aa_pos": {"ARG", "HID", "HIE", "HIP", "LYS"},
+                  "aa_neg": {"GLU", "GLH", "ASP", "ASH"}}
+BACKBONE_ATOMS = ("N", "CA", "C", "O", "NH", "HA", "H")
+# residue names of the topologies already read in this process
+_RESIDUE_NAMES = {}
+
+
+def residue_names(parm7_file, cache_folder=None):
+    """
+    Residue names of a parm7 topology (index 0 is residue 1).
+    :param cache_folder: Folder of the analysis outputs where the names are saved (residues_<path hash>.npz, the
+    simulation folders may be read-only), read again only if the size or modification time of the topology changed.
+    Without it the names are only kept in memory
+    """
+    parm7_file = os.path.abspath(parm7_file)
+    stat = os.stat(parm7_file)
+    signature = np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+    if parm7_file in _RESIDUE_NAMES and np.array_equal(_RESIDUE_NAMES[parm7_file][0], signature):
+        return _RESIDUE_NAMES[parm7_file][1]
+    names_file = None
+    if cache_folder is not None:
+        names_file = os.path.join(cache_folder, "residues_{}.npz".format(
+            hashlib.sha1(parm7_file.encode()).hexdigest()[:16]))
+    names = None
+    if names_file is not None and os.path.isfile(names_file):
+        with np.load(names_file) as saved:
+            if np.array_equal(saved["signature"], signature):
+                names = saved["names"]
+    if names is None:
+        names = read_parm7(parm7_file).residue_names
+        if names_file is not None:
+            try:
+                os.makedirs(cache_folder, exist_ok=True)
+                np.savez(names_file, signature=signature, names=names)
+            except OSError as error:
+                print("Could not save the residue names to {}: {}".format(names_file, error))
+    _RESIDUE_NAMES[parm7_file] = (signature, names)
+    return names
+
+
+def _base_residue(name):
+    # residue of a terminal name of Amber (NMET, CALA), else its first 3 letters
+    name = name.strip()
+    if len(name) == 4 and name[0] in "NC" and any(name[1:] in residues for residues in CLASS_RESIDUES.values()):
+        return name[1:]
+    return name[:3]
+
+
+def class_codes(names):
+    """Class code of every residue name (N- and C-terminal names as their residue), OTHER for names in no class"""
+    unique, inverse = np.unique(np.asarray(names).astype(str), return_inverse=True)
+    bases = np.array([_base_residue(name) for name in unique], dtype="<U4")
+    codes = np.full(len(unique), OTHER, dtype=np.int8)
+    for code, residue_class in enumerate(RESIDUE_CLASSES):
+        if residue_class in CLASS_RESIDUES:
+            codes[np.isin(bases, list(CLASS_RESIDUES[residue_class]))] = code
+    return codes[inverse.reshape(-1)]
+
+
+def residue_class_codes(parm7_file, cache_folder=None):
+    """Class code of every residue of a topology (index 0 is residue 1), cached with residue_names"""
+    return class_codes(residue_names(parm7_file, cache_folder))
+
+
+def partner_classes(residue_codes, atoms):
+    """
+    Class of every partner atom: BACKBONE for backbone atoms, else the class of its residue.
+    :param residue_codes: Class code of every partner residue, e.g. residue_class_codes(parm7)[resids - 1]
+    :param atoms: Atom name of every partner
+    """
+    return np.where(np.isin(atoms, BACKBONE_ATOMS), BACKBONE, residue_codes).astype(np.int8)
+
+
+def first_per_residue(rows, resids):
+    """Indices of the first partner of every (row, residue) pair, in their original order"""
+    if len(rows) == 0:
+        return np.zeros(0, dtype=np.int64)
+    keys = rows.astype(np.int64) * (int(resids.max()) + 1) + resids
+    _, first = np.unique(keys, return_index=True)
+    return np.sort(first)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Runs the (database, MD) work units of the hbond pipeline in a process pool, finished units are recorded in a JSON
+# lines manifest with the hash of their inputs so a rerun skips them without looking at their outputs
+
+import hashlib
+import json
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+
+from events import load_event_table
+
+
+@dataclass
+class WorkUnit:
+    """
+    key -> unique name of the unit, e.g. 'database_1_O:1A_opc_1'
+    inputs -> hash of everything the unit reads (events, parameters, input files), see input_hash
+    args -> arguments of the worker function
+    """
+    key: str
+    inputs: str
+    args: tuple
+
+
+def input_hash(events, params=(), files=()):
+    """
+    Hash of the inputs of a work unit: the events (frame, water and ID of every event), the parameters and the size
+    and modification time of the input files (missing files hash as missing).
+    """
+    digest = hashlib.sha1()
+    digest.update(pickle.dumps([(e.tid, e.watid, e.frame, e.event_type) for e in events]))
+    digest.update(json.dumps(params, default=str).encode())
+    for f in files:
+        stat = os.stat(f) if os.path.exists(f) else None
+        digest.update("{}:{}".format(f, (stat.st_size, stat.st_mtime_ns) if stat else None).encode())
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_file):
+    """Finished units of a manifest, dict(key: input hash), later lines win"""
+    finished = {}
+    if os.path.isfile(manifest_file):
+        with open(manifest_file, "r") as fin:
+            for line in fin:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record["status"] == "done":
+                    finished[record["key"]] = record["inputs"]
+                else:
+                    finished.pop(record["key"], None)
+    return finished
+
+
+def _format_time(seconds):
+    return time.strftime("%H:%M:%S", time.gmtime(seconds))
+
+
+def run_units(worker, units, manifest_file, workers=None):
+    """
+    Runs worker(*unit.args) for every unit not recorded as done with the same input hash in the manifest, in a pool
+    of processes. Every finished (or failed) unit is appended to the manifest with its wall time.
+    :param worker: Top level function run for every unit
+    :param workers: Number of processes, default is the number of CPUs, 1 runs in this process
+    :returns dict(key: seconds) of the units run
+    """
+    finished = load_manifest(manifest_file)
+    todo = [unit for unit in units if finished.get(unit.key) != unit.inputs]
+    print("{} of {} units already done, {} to run".format(len(units) - len(todo), len(units), len(todo)))
+    if not todo:
+        return {}
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_file)), exist_ok=True)
+    timings, failures = {}, []
+    start = time.perf_counter()
+
+    def _record(manifest, unit, seconds, error=None):
+        record = {"key": unit.key, "inputs": unit.inputs, "status": "done" if error is None else "failed",
+                  "seconds": round(seconds, 3), "finished": time.strftime("%Y-%m-%d %H:%M:%S")}
+        if error is not None:
+            record["error"] = repr(error)
+            failures.append(unit.key)
+        manifest.write(json.dumps(record) + "\n")
+        manifest.flush()
+        timings[unit.key] = seconds
+        elapsed = time.perf_counter() - start
+        eta = elapsed / len(timings) * (len(todo) - len(timings))
+        print("[{}/{}] {} {} in {:.1f} s, elapsed {}, ETA {}".format(len(timings), len(todo), unit.key,
+                                                                     record["status"], seconds,
+                                                                     _format_time(elapsed), _format_time(eta)))
+
+    with open(manifest_file, "a") as manifest:
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers == 1:
+            for unit in todo:
+                unit_start = time.perf_counter()
+                try:
+                    worker(*unit.args)
+                    _record(manifest, unit, time.perf_counter() - unit_start)
+                except Exception as error:
+                    _record(manifest, unit, time.perf_counter() - unit_start, error)
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as executor:
+                futures = {executor.submit(_timed, worker, unit.args): unit for unit in todo}
+                for future in as_completed(futures):
+                    unit = futures[future]
+                    try:
+                        _record(manifest, unit, future.result())
+                    except Exception as error:
+                        _record(manifest, unit, 0.0, error)
+    if failures:
+        print("{} units failed, see {}".format(len(failures), manifest_file))
+    return timings
+
+
+def _timed(worker, args):
+    start = time.perf_counter()
+    worker(*args)
+    return time.perf_counter() - start
+
+
+def database_units(databases, simulation_folder, unit_args, params=(), input_files=(), unit_files=None):
+    """
+    One work unit per (database, MD).
+    :param databases: Event databases (event table folders, legacy pickles are converted)
+    :param unit_args: function(database, md, events) -> arguments of the worker function
+    :param input_files: Input files of an MD relative to its simulation folder (e.g. merged.nc), part of the hash
+    :param unit_files: function(database, md, events) -> other input files of the unit (e.g. its frames), part of
+    the hash
+    """
+    units = []
+    for database in databases:
+        table = load_event_table(database)
+        for md in table.mds:
+            events = table.events(md)
+            files = [os.path.join(simulation_folder, md, f) for f in input_files]
+            if unit_files is not None:
+                files += list(unit_files(database, md, events))
+            units.append(WorkUnit("{}:{}".format(os.path.basename(os.path.normpath(database)), md),
+                                  input_hash(events, params, files), unit_args(database, md, events)))
+    return units
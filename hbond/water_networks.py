@@ -1,59 +1,26 @@
 # -*- coding: utf-8 -*-
 # Find if waters are forming H-bond networks within themselves and migrating as a cluster
 import os
-import pickle
 from collections import defaultdict
-from dataclasses import dataclass, field
 
 import numpy as np
 from matplotlib import pyplot as plt
 
-@dataclass(order=True)
-class TEvent:
-    tid: int = field(compare=True, hash=True)
-    watid: int = 0
-    frame: int = -1
-    radius: float = 999.999
-    dist2lig: float = 999.999
-    fraction: float = -1.0
-    event_type: str = ""
-    supercluster: int = -1
-    caver_cluster: int = -1
-
+from event_outputs import hbond_table, iter_events
+from event_filters import EventFilter, event_index, grouped
+from events import load_events
 
 def plot_radii_by_HB(data, hbond_outfolder, outfolder, tag="", frac_thr=0.7):
-    def _get_hbonds(hbondfile):
-        hbonds = 0
-        with open(hbondfile, "r") as hfile:
-            for line in hfile:
-                if line.startswith("#"):
-                    continue
-                hbonds = int(line.strip().split()[1])  # 3 is event_H[Bridge]
-        return hbonds
-
-    mds = list(data.keys())
-    mds.sort()
-    for md in mds:
-        for event in data[md]:
-            # hbondfile = "{}/hbonds/{}/f{:0>5}_e{:0>4}.txt".format(outfolder, md, event.frame+1, event.tid)
-            hbondfile = "{}/{}/f{:0>5}_e{:0>4}.txt".format(hbond_outfolder, md, event.frame + 1, event.tid)
-            event.hbonds = _get_hbonds(hbondfile)
-
-    sc_mds = defaultdict(int)
-    for md in mds:
-        _scs = set()
-        for event in data[md]:
-            if event.fraction >= frac_thr:
-                _scs.add(event.supercluster)
-        for s in _scs:
-            sc_mds[s] += 1
-
-    e_hb = defaultdict(list)
-    for md in mds:
-        for event in data[md]:
-            # if water is buried in tunnel and SC present in more than one simulation
-            if (event.fraction >= frac_thr) and (sc_mds[event.supercluster] >= 1):
-                e_hb[event.hbonds].append(event.radius)
+    hbonds = hbond_table(data, hbond_outfolder)["hbonds_uu"]  # hbonds_bridge is event_H[Bridge]
+    index = event_index(data)
+    # if water is buried in tunnel and SC present in more than one simulation
+    # events without hbond outputs (-1) are left out
+    selected = index.mask(EventFilter(frac_thr=frac_thr, min_replicas=1, hbonds_range=(0, np.inf)), hbonds=hbonds)
+    e_hb = grouped(index.radius, hbonds, selected)
+    if not e_hb:
+        # the interactions engine of 04_ncontacts_hbonds.py does not count the solute-solute H-bonds
+        print("No solute-solute H-bonds of the selected events in {}".format(hbond_outfolder))
+        return
 
     ehb_hists = {}
     hbonds = list(e_hb.keys())
@@ -85,9 +52,8 @@ def plot_radii_by_HB(data, hbond_outfolder, outfolder, tag="", frac_thr=0.7):
 
 
 if __name__ == '__main__':
-    dat_file = "/data/aravindramt/dean/tt/hbond/databases/database_1_8_T3.dat"
-    with open(dat_file, "rb") as fin:
-        database = pickle.load(fin)
+    dat_file = "/data/aravindramt/dean/tt/hbond/databases/database_1_8_T3"
+    database = load_events(dat_file)
     hbond_outfolder = "/data/aravindramt/dean/tt/hbond/hbonds/hb_1_8_T3"
     plot_folder = "/data/aravindramt/dean/tt/hbond/plots/1_8_TIP3P"
 
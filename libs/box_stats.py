@@ -0,0 +1,108 @@
+# Boxplot summaries (quartiles, whiskers, sampled outliers) of long per frame series, drawn with matplotlib's bxp
+# -*- coding: utf-8 -*-
+__author__ = 'Aravind Selvaram Thirunavukarasu'
+__email__ = 'arathi@amu.edu.pl, aravind1233@gmail.com'
+
+import json
+import os
+
+import numpy as np
+
+
+def box_stats(values, labels: list, whis: float = 1.5, max_fliers: int = 200, seed: int = 0):
+    """
+    Boxplot statistics of every column of a frames x series matrix, computed for all columns in one pass. Quartiles
+    are exact (linear interpolation, like matplotlib and seaborn), whiskers reach the furthest value within whis * IQR
+    of the box, NaN are ignored. Outliers are randomly sampled down to max_fliers (the lowest and highest are always
+    kept), so the size of the summary does not depend on the number of frames.
+    :param values: 2D array (frames, series) or 1D array of one series
+    :param labels: Label of every series
+    :param whis: Whisker length in IQRs
+    :param max_fliers: Maximum number of outliers kept per series
+    :param seed: Seed of the outlier sampling
+    :returns list of dicts per series as taken by matplotlib's Axes.bxp (+ 'n' and 'n_fliers')
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+    rng = np.random.default_rng(seed)
+    valid = ~np.isnan(values)
+    n = valid.sum(axis=0)
+    q1, med, q3 = np.full((3, values.shape[1]), np.nan)
+    mean = np.full(values.shape[1], np.nan)
+    has_values = n > 0
+    if has_values.any():
+        q1[has_values], med[has_values], q3[has_values] = np.nanpercentile(values[:, has_values], [25, 50, 75],
+                                                                           axis=0)
+        mean[has_values] = np.nanmean(values[:, has_values], axis=0)
+    iqr = q3 - q1
+    inside = (values >= q1 - whis * iqr) & (values <= q3 + whis * iqr)
+    whislo = np.where(inside, values, np.inf).min(axis=0)
+    whishi = np.where(inside, values, -np.inf).max(axis=0)
+    whislo = np.where(np.isfinite(whislo), whislo, q1)
+    whishi = np.where(np.isfinite(whishi), whishi, q3)
+
+    stats = []
+    for i, label in enumerate(labels):
+        column = values[valid[:, i], i]
+        fliers = column[(column < whislo[i]) | (column > whishi[i])]
+        n_fliers = len(fliers)
+        if n_fliers > max_fliers:
+            extremes = [fliers.argmin(), fliers.argmax()]
+            sample = rng.choice(np.delete(np.arange(n_fliers), extremes), max_fliers - 2, replace=False)
+            fliers = fliers[np.concatenate([extremes, sample])]
+        stats.append({"label": str(label), "n": int(n[i]), "mean": float(mean[i]), "med": float(med[i]),
+                      "q1": float(q1[i]), "q3": float(q3[i]), "whislo": float(whislo[i]),
+                      "whishi": float(whishi[i]), "fliers": np.sort(fliers).tolist(), "n_fliers": n_fliers})
+    return stats
+
+
+def save_box_stats(stats: list, stats_file: str, source: str = None):
+    """
+    Saves boxplot statistics (a list from box_stats or a dict of them) to a json file.
+    :param source: File the statistics were computed from, its size and modification time are saved to check the
+    statistics when loading
+    """
+    signature = None
+    if source is not None:
+        signature = [os.stat(source).st_size, os.stat(source).st_mtime_ns]
+    with open(stats_file, 'w') as f:
+        json.dump({"source": signature, "stats": stats}, f)
+
+
+def load_box_stats(stats_file: str, source: str = None):
+    """
+    Loads boxplot statistics saved by save_box_stats.
+    :param source: File the statistics were computed from, None if it changed since
+    :returns the saved statistics or None if the file is missing or out of date
+    """
+    if not os.path.isfile(stats_file):
+        return None
+    with open(stats_file, 'r') as f:
+        saved = json.load(f)
+    if source is not None and saved["source"] != [os.stat(source).st_size, os.stat(source).st_mtime_ns]:
+        return None
+    return saved["stats"]
+
+
+def draw_boxes(ax, stats: list, colors, widths: float = 0.6, linewidth: float = 0.5, fliersize: float = 0.5):
+    """
+    Draws boxplots from precomputed statistics, styled like the seaborn boxplots used before.
+    :param ax: matplotlib axes
+    :param stats: Statistics from box_stats
+    :param colors: One color for all boxes or a list of colors per box
+    :returns dict of artists from Axes.bxp
+    """
+    if isinstance(colors, str):
+        colors = [colors] * len(stats)
+    artists = ax.bxp([{key: value for key, value in box.items() if key not in ("n", "n_fliers")} for box in stats],
+                     positions=np.arange(len(stats)), widths=widths, patch_artist=True,
+                     boxprops={"linewidth": linewidth}, whiskerprops={"linewidth": linewidth},
+                     capprops={"linewidth": linewidth}, medianprops={"linewidth": linewidth, "color": "0.2"},
+                     flierprops={"marker": "d", "markersize": fliersize, "markerfacecolor": "0.2",
+                                 "markeredgecolor": "0.2"})
+    for box, color in zip(artists["boxes"], colors):
+        box.set_facecolor(color)
+    ax.set_xticks(np.arange(len(stats)))
+    ax.set_xticklabels([box["label"] for box in stats])
+    return artists
@@ -0,0 +1,80 @@
+# Byte offset index of the supercluster blocks in TransportTools details files
+# -*- coding: utf-8 -*-
+__author__ = 'Aravind Selvaram Thirunavukarasu'
+__email__ = 'arathi@amu.edu.pl, aravind1233@gmail.com'
+
+import json
+import mmap
+import os
+
+SC_HEADER = b"Supercluster ID"
+
+
+def build_sc_index(details_file: str):
+    """
+    Finds the byte offset and length of every 'Supercluster ID' block of a details file
+    (initial_super_cluster_details.txt, filtered_super_cluster_details2.txt, ...). A block runs until the next
+    'Supercluster ID' line or the end of the file.
+    :param details_file: Location of the details file
+    :returns dict(SC_ID:(offset, length))
+    """
+    headers = []
+    with open(details_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return {}
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            file_size = len(mm)
+            position = 0 if mm[:len(SC_HEADER)] == SC_HEADER else mm.find(b"\n" + SC_HEADER) + 1
+            while position != 0 or not headers and mm[:len(SC_HEADER)] == SC_HEADER:
+                line_end = mm.find(b"\n", position)
+                header = mm[position:line_end if line_end != -1 else file_size]
+                headers.append((int(header.split()[2]), position))
+                position = mm.find(b"\n" + SC_HEADER, position) + 1
+    index = {}
+    for i, (sc_id, offset) in enumerate(headers):
+        end = headers[i + 1][1] if i + 1 < len(headers) else file_size
+        index[sc_id] = (offset, end - offset)
+    return index
+
+
+def load_sc_index(details_file: str, rebuild: bool = False):
+    """
+    Loads the sidecar index (<details_file>.idx.json) of a details file, building and saving it if it is missing or
+    the size/modification time of the details file changed.
+    :param details_file: Location of the details file
+    :param rebuild: Build the index again even if the sidecar file is valid
+    :returns dict(SC_ID:(offset, length))
+    """
+    index_file = details_file + ".idx.json"
+    stat = os.stat(details_file)
+    if not rebuild and os.path.isfile(index_file):
+        with open(index_file, 'r') as f:
+            saved = json.load(f)
+        if saved["size"] == stat.st_size and saved["mtime"] == stat.st_mtime_ns:
+            return {int(sc_id): tuple(block) for sc_id, block in saved["blocks"].items()}
+    index = build_sc_index(details_file)
+    try:
+        with open(index_file, 'w') as f:
+            json.dump({"size": stat.st_size, "mtime": stat.st_mtime_ns, "blocks": index}, f)
+    except OSError as error:
+        print(f"Could not save the index of {details_file}: {error}")
+    return index
+
+
+def read_sc_blocks(details_file: str, sc_ids: list):
+    """
+    Reads only the blocks of the requested superclusters, seeking straight to them in the memory mapped file.
+    :param details_file: Location of the details file
+    :param sc_ids: SC_IDs to read, IDs not present in the file are skipped
+    :returns dict(SC_ID:text of the block), in the order of the file
+    """
+    index = load_sc_index(details_file)
+    selected = sorted((index[sc_id][0], index[sc_id][1], sc_id) for sc_id in set(sc_ids) if sc_id in index)
+    blocks = {}
+    if not selected:
+        return blocks
+    with open(details_file, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for offset, length, sc_id in selected:
+                blocks[sc_id] = mm[offset:offset + length].decode()
+    return blocks
@@ -6,11 +6,128 @@
 import json
 import os
 from collections import defaultdict
+from dataclasses import dataclass
 
+import numpy as np
 import pandas
 import pandas as pd
 from pandas import DataFrame
 
+from libs.box_stats import box_stats, draw_boxes, load_box_stats, save_box_stats
+
+# CAVER profile of every tunnel in every frame, relative to the simulation directory, and the columns read from it
+PROFILE_CSV = 'caver_analyses/final_clustering/analysis/tunnel_characteristics.csv'
+PROFILE_COLUMNS = {"Tunnel cluster": np.int32, "Bottleneck radius": np.float32}
+# (signature of the details file, CaverClusterMap) per initial_super_cluster_details.txt, see load_caver_cluster_map
+_CAVER_MAPS = {}
+
+
+@dataclass
+class CaverClusterMap:
+    """
+    Original CAVER tunnel clusters of every supercluster of initial_super_cluster_details.txt, one row per
+    (SC_ID, simulation, caver cluster).
+    sims -> simulation IDs, the 'sim' column holds the position of the simulation in this array
+    """
+    sims: np.ndarray
+    sc_id: np.ndarray
+    sim: np.ndarray
+    caver_cluster: np.ndarray
+
+    def highest_priority(self, req_sc_ids: list):
+        """
+        Lowest (highest priority) caver cluster ID per simulation among the given SCs.
+        :returns array (per simulation of sims) of cluster IDs, -1 for simulations without cluster in the SCs
+        """
+        selected = np.isin(self.sc_id, np.asarray(req_sc_ids, dtype=np.int32))
+        lowest = np.full(len(self.sims), np.iinfo(np.int32).max, dtype=np.int32)
+        np.minimum.at(lowest, self.sim[selected], self.caver_cluster[selected])
+        lowest[lowest == np.iinfo(np.int32).max] = -1
+        return lowest
+
+
+def _parse_caver_cluster_map(initial_sc_details_txt: str):
+    """
+    Single pass over initial_super_cluster_details.txt collecting the 'from SIM: caver cluster IDs' lines of the
+    superclusters (from the 7th line of a block on), lines which are not lists of IDs are skipped.
+    :returns CaverClusterMap
+    """
+    from array import array
+    sim_codes = {}
+    columns = {name: array('i') for name in ("sc_id", "sim", "caver_cluster")}
+    sc_id = None
+    line_number = 0
+    with open(initial_sc_details_txt, 'r') as details:
+        for line in details:
+            if line.startswith("Supercluster ID"):
+                sc_id = int(line.split()[-1])
+                line_number = 0
+            elif sc_id is not None:
+                line_number += 1
+                if line_number >= 6 and line.startswith("from"):
+                    try:
+                        sim_id, values = line.split(":")
+                        values = [int(x) for x in values.split(',') if x.strip()]
+                    except ValueError:
+                        continue
+                    sim_code = sim_codes.setdefault(sim_id.split()[1], len(sim_codes))
+                    columns["caver_cluster"].extend(values)
+                    columns["sc_id"].extend([sc_id] * len(values))
+                    columns["sim"].extend([sim_code] * len(values))
+    return CaverClusterMap(sims=np.array(list(sim_codes), dtype=str),
+                           **{name: np.frombuffer(values, dtype=np.intc).astype(np.int32)
+                              for name, values in columns.items()})
+
+
+def load_caver_cluster_map(initial_sc_details_txt: str):
+    """
+    CaverClusterMap of a TransportTools run. It is built once and saved next to the details file
+    (<initial_super_cluster_details.txt>.caver_map.npz), it is built again if the size or modification time of the
+    details file changed.
+    :param initial_sc_details_txt: The file location of initial_super_clusters_details.txt
+    :returns CaverClusterMap
+    """
+    initial_sc_details_txt = os.path.abspath(initial_sc_details_txt)
+    stat = os.stat(initial_sc_details_txt)
+    signature = np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+    if initial_sc_details_txt in _CAVER_MAPS and np.array_equal(_CAVER_MAPS[initial_sc_details_txt][0], signature):
+        return _CAVER_MAPS[initial_sc_details_txt][1]
+    map_file = initial_sc_details_txt + ".caver_map.npz"
+    caver_map = None
+    if os.path.isfile(map_file):
+        with np.load(map_file) as saved:
+            if np.array_equal(saved["signature"], signature):
+                caver_map = CaverClusterMap(sims=saved["sims"], sc_id=saved["sc_id"], sim=saved["sim"],
+                                            caver_cluster=saved["caver_cluster"])
+    if caver_map is None:
+        caver_map = _parse_caver_cluster_map(initial_sc_details_txt)
+        try:
+            np.savez(map_file, signature=signature, sims=caver_map.sims, sc_id=caver_map.sc_id, sim=caver_map.sim,
+                     caver_cluster=caver_map.caver_cluster)
+        except OSError as error:
+            print(f"Could not save the caver cluster map to {map_file}: {error}")
+    _CAVER_MAPS[initial_sc_details_txt] = (signature, caver_map)
+    return caver_map
+
+
+def _highest_priority_ids(caver_map: CaverClusterMap, req_sc_ids: list, dirs: list):
+    """
+    Lowest (highest priority) caver cluster ID of every simulation directory (and of the other simulations having
+    clusters in the SCs), reports the simulations without caver clusters.
+    :returns dict(sim_id:caver cluster ID or None)
+    """
+    lowest = caver_map.highest_priority(req_sc_ids)
+    cluster_of_sim = dict(zip(caver_map.sims.tolist(), lowest.tolist()))
+    sims = dirs + [sim for sim, cluster in cluster_of_sim.items() if cluster != -1 and sim not in dirs]
+    reduced_result = {sim: None if cluster_of_sim.get(sim, -1) == -1 else cluster_of_sim[sim] for sim in sims}
+    missing_values = [sim for sim, cluster in reduced_result.items() if cluster is None]
+    if missing_values:
+        print("Some simulations have missing corresponding caver clusters assigned in TransportTools")
+        print(missing_values, sep="|")
+    else:
+        print("All simulations have corresponding caver clusters assigned in TransportTools ")
+    return reduced_result
+
 
 def get_orig_caver_id(req_sc_ids:list, initial_sc_details_txt:str, simulation_results_dir:str):
     """
@@ -18,181 +135,215 @@ def get_orig_caver_id(req_sc_ids:list, initial_sc_details_txt:str, simulation_re
     initial_super_cluster_details.txt
     :param initial_sc_details_txt: The file location of initial_super_clusters_details.txt
     :type req_sc_ids: SuperCluster IDs for your group, example in my case P1 is formed by the following SuperClusters
-    ['1', "2", "5", "7", "12", "16", "30", "31"]
+    [1, 2, 5, 7, 12, 16, 30, 31]
+    """
+    dirs = [d for d in os.listdir(simulation_results_dir) if os.path.isdir(os.path.join(simulation_results_dir, d))]
+    return _highest_priority_ids(load_caver_cluster_map(initial_sc_details_txt), req_sc_ids, dirs)
+
+
+def get_orig_caver_ids_of_groups(groups_definition: dict, initial_sc_details_txt: str, simulation_results_dir: str):
+    """
+    get_orig_caver_id for several groups at once.
+    :param groups_definition: Tunnels definition, group_name:superclusters, e.g. {"P1": [1, 2, 5], "P2": [3, 4]}
+    :param initial_sc_details_txt: The file location of initial_super_clusters_details.txt
+    :param simulation_results_dir: Simulation directory location
+    :returns dict(group_name:dict(sim_id:original_caver_cluster_id))
     """
     dirs = [d for d in os.listdir(simulation_results_dir) if os.path.isdir(os.path.join(simulation_results_dir, d))]
-    result = {d: [] for d in dirs}
-    with open(initial_sc_details_txt) as f:
-        content = f.read()
-        clusters = content.split(
-            "--------------------------------------------------------------------------------------------"
-            "----------------------------")
-        for cluster in clusters:
-            cluster = cluster.strip()
-            lines = cluster.split("\n")
-            if lines[0].startswith("Supercluster ID"):
-                super_cluster_id = int(lines[0].split()[-1])
-                if super_cluster_id in req_sc_ids:
-                    for line in lines[6:]:
-                        if line.startswith("from"):
-                            sim_id, values = line.split(":")
-                            values = [x.strip() for x in values.split(',') if x.strip()]
-                            sim_id = sim_id.split()[1]
-                            print(line)
-                            try:
-                                # convert values to int
-                                values = [int(x) for x in values]
-                                if sim_id not in result:
-                                    result[sim_id] = values
-                                else:
-                                    result[sim_id].extend(values)
-                            except ValueError:
-                                pass
-                else:
-                    continue
-        if any(not v for v in result.values()):
-            print("Some simulations have missing corresponding caver clusters assigned in TransportTools")
-            missing_values = []
-            for key, value in result.items():
-                if not value:
-                    missing_values.append(key)
-            print(missing_values, sep="|")
-        else:
-            print("All simulations have corresponding caver clusters assigned in TransportTools ")
-        reduced_result = {k: min(v) if v else None for k, v in result.items()}
-        return reduced_result
-
-
-def get_bottleneck_radii(scid_orig_caver_ID: dict, sim_results_location: str):
+    caver_map = load_caver_cluster_map(initial_sc_details_txt)
+    return {group: _highest_priority_ids(caver_map, sc_ids, dirs) for group, sc_ids in groups_definition.items()}
+
+
+def _read_bottleneck_radii(csv_file: str, cav_cluster_ids: list, chunksize: int = 200000):
+    """
+    Bottleneck radii of tunnel clusters from a CAVER tunnel_characteristics.csv, all clusters in one pass. Only the
+    tunnel cluster and bottleneck radius columns are parsed, with fixed dtypes, and the rows are filtered chunk by
+    chunk while reading.
+    :param csv_file: Location of tunnel_characteristics.csv
+    :param cav_cluster_ids: Original CAVER cluster IDs, None gives no radii
+    :returns list of float32 arrays of the radii (in the order of the file), one per cluster ID
+    """
+    radii = [[] for _ in cav_cluster_ids]
+    if all(cluster_id is None for cluster_id in cav_cluster_ids):
+        return [np.empty(0, dtype=np.float32) for _ in cav_cluster_ids]
+    for chunk in pd.read_csv(csv_file, usecols=PROFILE_COLUMNS, dtype=PROFILE_COLUMNS, skipinitialspace=True,
+                             chunksize=chunksize):
+        tunnel_cluster = chunk["Tunnel cluster"].to_numpy()
+        bottleneck = chunk["Bottleneck radius"].to_numpy()
+        for i, cluster_id in enumerate(cav_cluster_ids):
+            if cluster_id is not None:
+                radii[i].append(bottleneck[tunnel_cluster == cluster_id])
+    return [np.concatenate(r) if r else np.empty(0, dtype=np.float32) for r in radii]
+
+
+def _read_radii_of_sims(csv_files: list, cluster_ids: list, workers: int = None):
+    """
+    Runs _read_bottleneck_radii for every simulation in a process pool.
+    :param csv_files: tunnel_characteristics.csv per simulation
+    :param cluster_ids: list of the caver cluster IDs to extract per simulation
+    :param workers: Number of processes, 1 reads sequentially
+    :returns list (per simulation) of lists (per cluster ID) of float32 arrays
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    if workers is None:
+        workers = min(len(csv_files), os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_read_bottleneck_radii, csv_files, cluster_ids))
+    return [_read_bottleneck_radii(f, c) for f, c in zip(csv_files, cluster_ids)]
+
+
+def _radii_matrix(radii: list):
+    """
+    frames x sims float32 matrix of per simulation radii, simulations with less frames are padded with NaN.
+    """
+    bottleneck_radius = np.full((max((len(r) for r in radii), default=0), len(radii)), np.nan, dtype=np.float32)
+    for i, sim_radii in enumerate(radii):
+        bottleneck_radius[:len(sim_radii), i] = sim_radii
+    return bottleneck_radius
+
+
+def get_bottleneck_radii(scid_orig_caver_ID: dict, sim_results_location: str, cache_file: str = None,
+                         csv_file: str = None, workers: int = None):
     """
     Gets the bottleneck radii for given dict of simulation_ID:original_caver_cluster_id from tunnel_characteristics.csv from
-    the original caver result for that simulation_ID
+    the original caver result for that simulation_ID. The csv files are read in parallel.
     :param scid_orig_caver_ID: Dictionary containing simulation_ID:original_caver_cluster_id
     :param sim_results_location: Simulation directory locaton
-    :return: Dataframe of sim_ID as column name and bottleneck radii as values for the simulation frames.
+    :param cache_file: .npz file to keep the radii in, reused while the caver cluster IDs and the csv files are the same
+    :param csv_file: Also save the dataframe to this csv file (e.g. bottleneck_per_sim.csv for stats.py)
+    :param workers: Number of processes, 1 reads sequentially
+    :return: Dataframe (float32) of sim_ID as column name and bottleneck radii as values for the simulation frames,
+    simulations with less frames are padded with NaN.
     """
-    bottleneck_radius = pd.DataFrame()
-    # print("The assigned caver clusters are: \n")
-    for sim_id, cav_cluster_id in scid_orig_caver_ID.items():
-        # print(sim_id, "->", cav_cluster_id)
-        csv_loc = 'caver_analyses/final_clustering/analysis/tunnel_characteristics.csv'
-        csv_file = os.path.join(sim_results_location, sim_id, csv_loc)
-        tc = pd.read_csv(csv_file, usecols=[1, 5])
-        tc_filtered = tc.loc[(tc[" Tunnel cluster"] == cav_cluster_id)]
-        bottleneck_radius[sim_id] = (tc_filtered[" Bottleneck radius"].reset_index(drop=True))
-    bl_sorted_df = (bottleneck_radius.reindex(sorted(bottleneck_radius.columns), axis=1))
-    bl_sorted_df.to_csv("/home/aravind/PhD_local/dean/figures/bottlenecks/time_evolution/bottleneck_per_sim.csv")
+    sim_ids = sorted(scid_orig_caver_ID)
+    cluster_ids = [scid_orig_caver_ID[sim_id] for sim_id in sim_ids]
+    csv_files = [os.path.join(sim_results_location, sim_id, PROFILE_CSV) for sim_id in sim_ids]
+    signature = np.array([[os.stat(f).st_size, os.stat(f).st_mtime_ns] for f in csv_files], dtype=np.int64)
+    cluster_array = np.array([-1 if c is None else c for c in cluster_ids], dtype=np.int64)
+
+    bottleneck_radius = None
+    if cache_file is not None and os.path.isfile(cache_file):
+        with np.load(cache_file) as cache:
+            if cache["sims"].tolist() == sim_ids and np.array_equal(cache["cluster_ids"], cluster_array) \
+                    and np.array_equal(cache["signature"], signature):
+                bottleneck_radius = cache["radii"]
+    if bottleneck_radius is None:
+        radii = _read_radii_of_sims(csv_files, [[c] for c in cluster_ids], workers)
+        bottleneck_radius = _radii_matrix([sim_radii[0] for sim_radii in radii])
+        if cache_file is not None:
+            np.savez(cache_file, radii=bottleneck_radius, sims=np.array(sim_ids), cluster_ids=cluster_array,
+                     signature=signature)
+    bl_sorted_df = pd.DataFrame(bottleneck_radius, columns=sim_ids)
+    if csv_file is not None:
+        bl_sorted_df.to_csv(csv_file)
     return bl_sorted_df
 
 
-def plot_bottlenecks(bottleneck_dataframe: DataFrame, group_name: str):
+def get_bottleneck_radii_of_groups(orig_caver_ids_of_groups: dict, sim_results_location: str, workers: int = None):
+    """
+    Bottleneck radii of several groups (tunnels) at once, every tunnel_characteristics.csv is read only once for all
+    groups.
+    :param orig_caver_ids_of_groups: dict(group_name:dict(sim_id:original_caver_cluster_id)), e.g. from
+    get_orig_caver_ids_of_groups
+    :param sim_results_location: Simulation directory location
+    :param workers: Number of processes, 1 reads sequentially
+    :returns dict(group_name:Dataframe like get_bottleneck_radii)
+    """
+    groups = list(orig_caver_ids_of_groups)
+    sim_ids = sorted({sim_id for caver_ids in orig_caver_ids_of_groups.values() for sim_id in caver_ids})
+    csv_files = [os.path.join(sim_results_location, sim_id, PROFILE_CSV) for sim_id in sim_ids]
+    cluster_ids = [[orig_caver_ids_of_groups[group].get(sim_id) for group in groups] for sim_id in sim_ids]
+    radii = _read_radii_of_sims(csv_files, cluster_ids, workers)
+    bottlenecks_of_groups = {}
+    for i, group in enumerate(groups):
+        group_sims = [j for j, sim_id in enumerate(sim_ids) if sim_id in orig_caver_ids_of_groups[group]]
+        bottlenecks_of_groups[group] = pd.DataFrame(_radii_matrix([radii[j][i] for j in group_sims]),
+                                                    columns=[sim_ids[j] for j in group_sims])
+    return bottlenecks_of_groups
+
+
+def simulation_multiindex(sim_ids: list):
+    """
+    (group, model, replica) MultiIndex of simulation IDs named group_model_replica, e.g. 1.4A_opc_3 -> ('1.4A', 'opc', 3)
+    """
+    return pd.MultiIndex.from_tuples([(group, model, int(replica)) for group, model, replica in
+                                      (sim_id.split("_") for sim_id in sim_ids)], names=["group", "model", "replica"])
+
+
+def _group_order(sim_index: pd.MultiIndex):
+    """
+    Column order sorting the simulations by group (by the number of the group name, 1A -> 1.4A -> ... -> 3A), model
+    and replica.
+    :returns order of the columns, groups in that order
+    """
+    group_value = np.array([float(group[:-1]) for group in sim_index.get_level_values("group")])
+    order = np.lexsort((sim_index.get_level_values("replica"), sim_index.get_level_values("model"), group_value))
+    return order, list(sim_index.get_level_values("group")[order].unique())
+
+
+def plot_bottlenecks(bottleneck_dataframe: DataFrame, group_name: str, box_stats_file: str = None):
+    """
+    Boxplots of the bottleneck radii of every simulation, one panel per group. The boxes are drawn from boxplot
+    statistics (libs.box_stats) instead of the raw frames.
+    :param bottleneck_dataframe: Dataframe of frames x simulations from get_bottleneck_radii, can be None if the
+    statistics are loaded from box_stats_file
+    :param group_name: Name of the tunnel, for the title and file name
+    :param box_stats_file: json file to save the statistics to, or to load them from if bottleneck_dataframe is None
+    """
     import seaborn as sns
     import matplotlib.pyplot as plt
-    import numpy as np
-
-    bl_sorted_df = bottleneck_dataframe
 
-    # # Prepare data
-    col_names = bl_sorted_df.columns.values.tolist()
-    # df_melt = pd.melt(bl_sorted_df.reset_index(), id_vars=['index'], value_vars=col_names)
-    # df_melt.columns = ['index', 'Sim_ID', 'Bottleneck']
-    #
-    # # Group data
-    # avg_1 = pd.melt(bl_sorted_df.iloc[:, 30:45].reset_index(), id_vars='index', value_vars=col_names[30:45])
-    # avg_1.columns = ['index', 'Sim_ID', 'Whole']
-    # avg_1_4 = pd.melt(bl_sorted_df.iloc[:, 0:15].reset_index(), id_vars='index', value_vars=col_names[0:15])
-    # avg_1_4.columns = ['index', 'Sim_ID', 'Whole']
-    # avg_1_8 = pd.melt(bl_sorted_df.iloc[:, 15:30].reset_index(), id_vars='index', value_vars=col_names[15:30])
-    # avg_1_8.columns = ['index', 'Sim_ID', 'Whole']
-    # avg_2_4 = pd.melt(bl_sorted_df.iloc[:, 45:60].reset_index(), id_vars='index', value_vars=col_names[45:60])
-    # avg_2_4.columns = ['index', 'Sim_ID', 'Whole']
-    # avg_3 = pd.melt(bl_sorted_df.iloc[:, 60:75].reset_index(), id_vars='index', value_vars=col_names[60:75])
-    # avg_3.columns = ['index', 'Sim_ID', 'Whole']
-    #
-    # avg_df = pd.concat([avg_1.loc[:, 'Whole'], avg_1_4.loc[:, 'Whole'], avg_1_8.loc[:, 'Whole'],
-    #                     avg_2_4.loc[:, 'Whole'], avg_3.loc[:, 'Whole']], axis=1)
-    # avg_df.columns = ['1A', '1.4A', '1.8A', '2.4A', '3A']
-    #
-    # # Concat data per group
-    # df_1 = pd.concat([avg_1.loc[:, 'Whole'], bl_sorted_df.iloc[:, 30:45]], axis=1)
-    # df_1_4 = pd.concat([avg_1_4.loc[:, 'Whole'], bl_sorted_df.iloc[:, 0:15]], axis=1)
-    # df_1_8 = pd.concat([avg_1_8.loc[:, 'Whole'], bl_sorted_df.iloc[:, 15:30]], axis=1)
-    # df_2_4 = pd.concat([avg_2_4.loc[:, 'Whole'], bl_sorted_df.iloc[:, 45:60]], axis=1)
-    # df_3 = pd.concat([avg_3.loc[:, 'Whole'], bl_sorted_df.iloc[:, 60:75]], axis=1)
-    #
-    # df without whole
+    if bottleneck_dataframe is None:
+        stats = load_box_stats(box_stats_file)
+    else:
+        stats = box_stats(bottleneck_dataframe.to_numpy(), bottleneck_dataframe.columns)
+        if box_stats_file is not None:
+            save_box_stats(stats, box_stats_file)
 
-    df_1 = bl_sorted_df.iloc[:, 30:45]
-    df_1_4 = bl_sorted_df.iloc[:, 0:15]
-    df_1_8 = bl_sorted_df.iloc[:, 15:30]
-    df_2_4 = bl_sorted_df.iloc[:, 45:60]
-    df_3 = bl_sorted_df.iloc[:, 60:75]
+    # boxes of every group (TCG0 = 1A, TCG1 = 1.4A ...) sorted by model and replica
+    sim_index = simulation_multiindex([box["label"] for box in stats])
+    order, groups = _group_order(sim_index)
+    group_of_sim = sim_index.get_level_values("group")[order]
 
-    x_labels = [col_names[i].split(sep='_', maxsplit=1)[1] for i in range(15)]
     fig, axes = plt.subplots(3, 2, figsize=(30, 25), dpi=150)
     plt.subplots_adjust(hspace=0.3, top=1)
     sns.set()
     plt.suptitle(f"BOTTLENECK RADII OF TUNNEL {group_name}", fontsize=20, fontweight='bold')
     # plt.suptitle("BOTTLENECK RADII OF P3 TUNNEL", fontsize=20, fontweight='bold',y=0.98)
-    box1 = sns.boxplot(data=df_1, ax=axes[0, 0], color='b')
-    box1.set_xlabel("TCG0", fontsize=20, fontweight='bold')
-    # box1.artists[0].set_facecolor('grey')
-
-    box2 = sns.boxplot(data=df_1_4, ax=axes[0, 1], color='g')
-    box2.set_xlabel("TCG1", fontsize=20, fontweight='bold')
-    # box2.artists[0].set_facecolor('grey')
-
-    box3 = sns.boxplot(data=df_1_8, ax=axes[1, 0], color='r')
-    box3.set_xlabel("TCG2", fontsize=20, fontweight='bold')
-    box3.set_ylabel("Bottleneck radii (Å)", fontsize=20, fontweight='bold')
-    # box3.artists[0].set_facecolor('grey')
-
-    box4 = sns.boxplot(data=df_2_4, ax=axes[1, 1], color='c')
-    box4.set_xlabel("TCG3", fontsize=20, fontweight='bold')
-    # box4.artists[0].set_facecolor('grey')
-
-    box5 = sns.boxplot(data=df_3, ax=axes[2, 0], color='m')
-    box5.set_xlabel("TCG4", fontsize=20, fontweight='bold')
-    # box5.artists[0].set_facecolor('grey')
-    x_tick_location = np.arange(15)
+    colors = ['b', 'g', 'r', 'c', 'm']
+    for i, (group, ax) in enumerate(zip(groups, axes.flatten())):
+        group_stats = [dict(stats[j], label=f"{sim_index[j][1]}_{sim_index[j][2]}")
+                       for j in order[group_of_sim == group]]
+        draw_boxes(ax, group_stats, colors[i % len(colors)], widths=0.8, linewidth=1.5, fliersize=5)
+        ax.set_xlabel(f"TCG{i}", fontsize=20, fontweight='bold')
+        ax.set_xticklabels([box["label"] for box in group_stats], rotation=30, fontsize=20)
+    axes[1, 0].set_ylabel("Bottleneck radii (Å)", fontsize=20, fontweight='bold')
     for ax in axes.flatten():
         ax.set_ylim(bottom=0.8, top=4)
-        ax.set_xticks(x_tick_location)
-        ax.set_xticklabels(x_labels, rotation=30, fontsize=20)
         ax.tick_params(axis='y', labelsize=20)
         sns.set_theme(style='darkgrid')
-    color_pal = {'1A': 'b', '1.4A': 'g', '1.8A': 'r', '2.4A': 'c', '3A': 'm'}
-    # box6 = sns.boxplot(data=avg_df, palette=color_pal)
-    # box6.set_xlabel("Overall", fontsize=20, fontweight='bold')
-    # box6.set_xticklabels(box6.get_xticklabels(),["TCG0","TCG1","TCG2","TCG3","TCG4"])
     plt.tight_layout(pad=1.8)
     plt.savefig(f"/home/aravind/PhD_local/dean/figures/bottlenecks/time_evolution/{group_name}_manuscript.png")
 
 
 def process_bottleneck(bottleneck_dataframe):
-    bl_sorted_df = bottleneck_dataframe
-
-    # Prepare data
-    col_names = bl_sorted_df.columns.values.tolist()
-    df_melt = pd.melt(bl_sorted_df.reset_index(), id_vars=['index'], value_vars=col_names)
-    df_melt.columns = ['index', 'Sim_ID', 'Bottleneck']
-
-    # Group data
-    avg_1 = pd.melt(bl_sorted_df.iloc[:, 30:45].reset_index(), id_vars='index', value_vars=col_names[30:45])
-    avg_1.columns = ['index', 'Sim_ID', 'Whole']
-    avg_1_4 = pd.melt(bl_sorted_df.iloc[:, 0:15].reset_index(), id_vars='index', value_vars=col_names[0:15])
-    avg_1_4.columns = ['index', 'Sim_ID', 'Whole']
-    avg_1_8 = pd.melt(bl_sorted_df.iloc[:, 15:30].reset_index(), id_vars='index', value_vars=col_names[15:30])
-    avg_1_8.columns = ['index', 'Sim_ID', 'Whole']
-    avg_2_4 = pd.melt(bl_sorted_df.iloc[:, 45:60].reset_index(), id_vars='index', value_vars=col_names[45:60])
-    avg_2_4.columns = ['index', 'Sim_ID', 'Whole']
-    avg_3 = pd.melt(bl_sorted_df.iloc[:, 60:75].reset_index(), id_vars='index', value_vars=col_names[60:75])
-    avg_3.columns = ['index', 'Sim_ID', 'Whole']
-
-    avg_df = pd.concat([avg_1.loc[:, 'Whole'], avg_1_4.loc[:, 'Whole'], avg_1_8.loc[:, 'Whole'],
-                        avg_2_4.loc[:, 'Whole'], avg_3.loc[:, 'Whole']], axis=1)
-    avg_df.columns = ['1A', '1.4A', '1.8A', '2.4A', '3A']
-
+    """
+    Pools the bottleneck radii of all the simulations (all models and replicas) of every group into one column.
+    :param bottleneck_dataframe: Dataframe of frames x simulations from get_bottleneck_radii
+    :returns Dataframe with one column per group ('1A', '1.4A', '1.8A', '2.4A', '3A'), the frames of the
+    simulations one after the other (sorted by model and replica)
+    """
+    sim_index = simulation_multiindex(bottleneck_dataframe.columns)
+    order, groups = _group_order(sim_index)
+    sims_per_group = sim_index.get_level_values("group").value_counts()
+    # (sims, frames) -> (groups, sims of the group * frames), a single copy of the data
+    values = bottleneck_dataframe.to_numpy().T[order]
+    if sims_per_group.nunique() == 1:
+        avg_df = pd.DataFrame(values.reshape(len(groups), -1).T, columns=groups)
+    else:
+        group_of_sim = sim_index.get_level_values("group")[order]
+        avg_df = pd.DataFrame({group: pd.Series(values[group_of_sim == group].ravel()) for group in groups})
     return avg_df
 
 
@@ -201,33 +352,26 @@ def plot_bottlenecks_overview(tunnels_def: list, group_names: list, simulation_r
     import seaborn as sns
     import matplotlib.pyplot as plt
 
-    bottlenecks_of_groups = defaultdict(pandas.DataFrame)
-    i = 0
-    for group in group_names:
-        original_ids_dict = get_orig_caver_id(req_sc_ids=tunnels_def[i], initial_sc_details_txt=sc_details_loc,
-                                              simulation_results_dir=simulation_results)
-        bottlenecks = get_bottleneck_radii(scid_orig_caver_ID=original_ids_dict,
-                                           sim_results_location=simulation_results)
-        bottlenecks_of_groups[group] = bottlenecks
-        i += 1
-
-    average_df = defaultdict(pandas.DataFrame)
+    # every csv file is read once for all the groups
+    original_ids = get_orig_caver_ids_of_groups(dict(zip(group_names, tunnels_def)),
+                                                initial_sc_details_txt=sc_details_loc,
+                                                simulation_results_dir=simulation_results)
+    bottlenecks_of_groups = get_bottleneck_radii_of_groups(original_ids, sim_results_location=simulation_results)
+
+    # pooled boxplot statistics of every tunnel, saved next to the figure
+    average_stats = {}
     for group in group_names:
         avg_df = process_bottleneck(bottlenecks_of_groups[group])
-        average_df[group] = avg_df
+        average_stats[group] = box_stats(avg_df.to_numpy(), avg_df.columns)
+    save_box_stats(average_stats, os.path.join(save_loc + "overall_box_stats.json"))
     sns.set(style='whitegrid')
     fig, axes = plt.subplots(nrows=1, ncols=3, dpi=300, figsize=(10, 4))
     color_pal = {'1A': 'b', '1.4A': 'g', '1.8A': 'r', '2.4A': 'c', '3A': 'm'}
-    box1 = sns.boxplot(ax=axes[0], data=average_df['P1'], palette=color_pal, linewidth=0.5, fliersize=0.5)
-    box1.set_xlabel("P1", fontweight="bold")
-    box1.set_ylabel("Bottleneck radii (Å)")
-    box1.set_ylim(0.7, 3.7)
-    box2 = sns.boxplot(ax=axes[1], data=average_df['P2'], palette=color_pal, linewidth=0.5, fliersize=0.5)
-    box2.set_xlabel("P2", fontweight="bold")
-    box2.set_ylim(0.7, 3.7)
-    box3 = sns.boxplot(ax=axes[2], data=average_df['P3'], palette=color_pal, linewidth=0.5, fliersize=0.5)
-    box3.set_xlabel("P3", fontweight="bold")
-    box3.set_ylim(0.7, 3.7)
+    for ax, group in zip(axes, group_names):
+        draw_boxes(ax, average_stats[group], [color_pal[box["label"]] for box in average_stats[group]])
+        ax.set_xlabel(group, fontweight="bold")
+        ax.set_ylim(0.7, 3.7)
+    axes[0].set_ylabel("Bottleneck radii (Å)")
     plt.suptitle("TIME EVOLUTION OF BOTTLENECKS", fontweight="bold")
     save_location = os.path.join(save_loc + "overall.png")
     plt.tight_layout()
@@ -249,10 +393,13 @@ if __name__ == '__main__':
                                           simulation_results_dir=simulation_results)
     #
     # Get bottlenecks for the original Ids for all simulations
-    bottlenecks = get_bottleneck_radii(scid_orig_caver_ID=original_ids_dict, sim_results_location=simulation_results)
+    bottlenecks = get_bottleneck_radii(scid_orig_caver_ID=original_ids_dict, sim_results_location=simulation_results,
+                                       cache_file=os.path.join(save_location, "bottleneck_per_sim.npz"),
+                                       csv_file=os.path.join(save_location, "bottleneck_per_sim.csv"))
 
     # Plot per group
-    bottlenecks = pd.read_csv("/home/aravind/PhD_local/dean/figures/bottlenecks/time_evolution/bottleneck_per_sim.csv")
+    bottlenecks = pd.read_csv("/home/aravind/PhD_local/dean/figures/bottlenecks/time_evolution/bottleneck_per_sim.csv",
+                              index_col=0)
     plot_bottlenecks(bottleneck_dataframe=bottlenecks, group_name="P1")
 
     # Plot overall
@@ -0,0 +1,178 @@
+# Autocorrelation, statistical inefficiency and block averaging of per frame series (frames x simulations matrices)
+# -*- coding: utf-8 -*-
+__author__ = 'Aravind Selvaram Thirunavukarasu'
+__email__ = 'arathi@amu.edu.pl, aravind1233@gmail.com'
+
+import numpy as np
+import pandas as pd
+
+from libs.time_evolution_bottleneck import simulation_multiindex
+
+
+def _as_matrix(values):
+    """float64 (frames, series) matrix of a DataFrame, 2D or 1D array"""
+    values = np.asarray(values, dtype=np.float64)
+    return values[:, None] if values.ndim == 1 else values
+
+
+def autocorrelation(values, max_lag: int = None):
+    """
+    Normalised autocorrelation function of every column, computed with one zero-padded FFT over all columns.
+    NaN frames are treated as missing: every lag is normalised by the number of frame pairs present at that lag.
+    :param values: (frames, series) matrix or 1D array
+    :param max_lag: Last lag returned, default is the number of frames - 1
+    :returns (max_lag + 1, series) array, C(0) = 1, NaN for constant or empty series
+    """
+    values = _as_matrix(values)
+    n_frames = values.shape[0]
+    max_lag = n_frames - 1 if max_lag is None else min(max_lag, n_frames - 1)
+    valid = ~np.isnan(values)
+    mean = np.where(valid, values, 0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+    centered = np.where(valid, values - mean, 0)
+    fft_size = 1 << (2 * n_frames - 1).bit_length()
+    spectrum = np.fft.rfft(centered, n=fft_size, axis=0)
+    covariance = np.fft.irfft(spectrum * spectrum.conj(), n=fft_size, axis=0)[:max_lag + 1]
+    if valid.all():
+        pairs = (n_frames - np.arange(max_lag + 1))[:, None].astype(np.float64)
+    else:
+        mask_spectrum = np.fft.rfft(valid.astype(np.float64), n=fft_size, axis=0)
+        pairs = np.rint(np.fft.irfft(mask_spectrum * mask_spectrum.conj(), n=fft_size, axis=0)[:max_lag + 1])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = np.where(pairs > 0, covariance / pairs, np.nan)
+        return covariance / covariance[0]
+
+
+def statistical_inefficiency(values, mintime: int = 3, acf=None):
+    """
+    Statistical inefficiency g = 1 + 2 * sum_t (1 - t/N) C(t) of every column, the sum is truncated at the first lag
+    (>= mintime) where the autocorrelation is no longer positive (like pymbar's timeseries.statisticalInefficiency).
+    g frames of the series carry as much information as one independent sample.
+    :param values: (frames, series) matrix or 1D array
+    :param mintime: Lags shorter than this are always summed, to not stop on noise at the first lags
+    :param acf: Autocorrelation of values if already computed
+    :returns array of g per series (>= 1), NaN for series with less than 2 frames
+    """
+    values = _as_matrix(values)
+    acf = autocorrelation(values) if acf is None else acf
+    n = (~np.isnan(values)).sum(axis=0)
+    lags = np.arange(acf.shape[0])[:, None]
+    # the first non-positive lag (NaN, i.e. no pairs left, also stops the sum)
+    stop = (~(acf > 0)) & (lags >= mintime)
+    first = np.where(stop.any(axis=0), stop.argmax(axis=0), acf.shape[0])
+    in_sum = (lags >= 1) & (lags < first)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        terms = np.where(in_sum, (1 - lags / n) * acf, 0)
+        g = 1 + 2 * terms.sum(axis=0)
+    # constant series (no variance) are uncorrelated for this purpose
+    g = np.where(np.isnan(acf[0]), 1, np.maximum(g, 1))
+    return np.where(n >= 2, g, np.nan)
+
+
+def _compact(values):
+    """Moves the NaN of every column to its end (stable), the present frames are blocked as a contiguous series"""
+    valid = ~np.isnan(values)
+    if valid.all():
+        return values
+    order = np.argsort(~valid, axis=0, kind='stable')
+    return np.take_along_axis(values, order, axis=0)
+
+
+def block_average(values, min_blocks: int = 4):
+    """
+    Flyvbjerg-Petersen blocking of every column: the series is averaged in pairs of consecutive frames again and
+    again, and the standard error of the mean is estimated from the block means of every level. NaN frames are dropped
+    first, so series of different lengths (NaN padded) are blocked on their own frames.
+    :param values: (frames, series) matrix or 1D array
+    :param min_blocks: Last level kept has at least this many blocks
+    :returns (standard errors, errors of the standard errors) as (levels, series) arrays, NaN where a series has less
+    than min_blocks blocks, and the block size (frames) of every level
+    """
+    blocks = _compact(_as_matrix(values))
+    standard_errors, errors, block_sizes = [], [], []
+    size = 1
+    while blocks.shape[0] >= min_blocks:
+        n_blocks = (~np.isnan(blocks)).sum(axis=0)
+        enough = n_blocks >= min_blocks
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = np.nanvar(np.where(enough, blocks, 0), axis=0, ddof=1)
+            standard_error = np.where(enough, np.sqrt(variance / n_blocks), np.nan)
+            errors.append(standard_error / np.sqrt(2 * (n_blocks - 1)))
+        standard_errors.append(standard_error)
+        block_sizes.append(size)
+        # a block with a missing frame is missing as well
+        pairs = blocks.shape[0] // 2
+        blocks = (blocks[0:2 * pairs:2] + blocks[1:2 * pairs:2]) / 2
+        size *= 2
+    return np.array(standard_errors), np.array(errors), np.array(block_sizes)
+
+
+def block_standard_error(values, min_blocks: int = 4):
+    """
+    Standard error of the mean of every column from the plateau of block_average: the first level from which the
+    standard error no longer grows by more than its own error. The largest level is used if no plateau is reached
+    (the series is too short for its correlation time and the error is underestimated).
+    :returns array of standard errors per series
+    """
+    standard_errors, errors, _ = block_average(values, min_blocks=min_blocks)
+    if standard_errors.size == 0:
+        return np.full(_as_matrix(values).shape[1], np.nan)
+    growth = np.diff(standard_errors, axis=0, append=np.nan)
+    # the growth after the last level of a series is NaN, so that level is taken if no earlier plateau is found
+    plateau = ~(growth > errors)
+    return standard_errors[plateau.argmax(axis=0), np.arange(standard_errors.shape[1])]
+
+
+def convergence_table(dataframe: pd.DataFrame, mintime: int = 3, min_blocks: int = 4):
+    """
+    Convergence statistics of every column (simulation) of a frames x simulations DataFrame, e.g. the bottleneck
+    radii of get_bottleneck_radii or the helix distances of 1_helix_distance.collect_distance.
+    n -> frames present, g -> statistical inefficiency, n_eff -> effective sample size n / g,
+    se -> standard error of the mean from g (std * sqrt(g / n)), se_block -> standard error from block averaging
+    :returns DataFrame indexed by the columns of dataframe
+    """
+    values = _as_matrix(dataframe)
+    valid = ~np.isnan(values)
+    n = valid.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(valid, values, 0).sum(axis=0) / n
+        std = np.sqrt(np.where(valid, (values - mean) ** 2, 0).sum(axis=0) / (n - 1))
+    g = statistical_inefficiency(values, mintime=mintime)
+    return pd.DataFrame({"n": n, "mean": mean, "std": std, "g": g, "n_eff": n / g, "se": std * np.sqrt(g / n),
+                         "se_block": block_standard_error(values, min_blocks=min_blocks)},
+                        index=pd.Index(dataframe.columns, name="sim"))
+
+
+def group_convergence(table: pd.DataFrame, levels: tuple = ("group", "model")):
+    """
+    Combines the convergence statistics of the replicas (rows of convergence_table, named group_model_replica) of
+    every group and model. The mean is the average of the replica means, se and se_block are propagated from the
+    replicas (independent runs), se_replicas is the spread of the replica means (std / sqrt(number of replicas)).
+    :param levels: Levels of the (group, model, replica) index to group by
+    :returns DataFrame indexed by levels
+    """
+    per_sim = table.set_axis(simulation_multiindex(list(table.index)), axis=0)
+    grouped = per_sim.groupby(level=list(levels), sort=False)
+    replicas = grouped.size()
+    combined = pd.DataFrame({"replicas": replicas, "n": grouped["n"].sum(), "n_eff": grouped["n_eff"].sum(),
+                             "mean": grouped["mean"].mean(),
+                             "se": np.sqrt(grouped["se"].apply(lambda se: (se ** 2).sum())) / replicas,
+                             "se_block": np.sqrt(grouped["se_block"].apply(lambda se: (se ** 2).sum())) / replicas,
+                             "se_replicas": grouped["mean"].std(ddof=1) / np.sqrt(replicas)})
+    return combined
+
+
+def decorrelated_frames(dataframe: pd.DataFrame, g=None):
+    """
+    Subsamples every column to (roughly) independent frames, taking every ceil(g)-th present frame, for tests that
+    assume independent samples.
+    :param g: Statistical inefficiency per column, computed if not given
+    :returns dict(column: array of the kept values)
+    """
+    values = _as_matrix(dataframe)
+    g = statistical_inefficiency(values) if g is None else np.asarray(g)
+    subsamples = {}
+    for i, column in enumerate(dataframe.columns):
+        present = values[~np.isnan(values[:, i]), i]
+        step = int(np.ceil(g[i])) if np.isfinite(g[i]) else 1
+        subsamples[column] = present[::step]
+    return subsamples
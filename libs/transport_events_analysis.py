@@ -4,11 +4,15 @@ __author__ = 'Aravind Selvaram Thirunavukarasu'
 __email__ = 'arathi@amu.edu.pl, aravind1233@gmail.com'
 
 from collections import defaultdict
+from itertools import islice
+import numpy as np
 import pandas as pd
 import os
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from statistics import mean
 
+from libs.sc_details_index import read_sc_blocks
+
 
 @dataclass(order=True, repr=True, unsafe_hash=False)
 class TTEventsStats:
@@ -39,6 +43,10 @@ class TTUnassigned:
     Num_releases: int
 
 
+# Column types of the rows of 4-filtered_events_statistics.txt
+TT_STATS_DTYPES = {f.name: np.int64 if f.type is int else np.float64 for f in fields(TTEventsStats)}
+
+
 @dataclass(order=True, repr=True, unsafe_hash=False)
 class BeforeAssignment:
     SC_ID: int
@@ -57,47 +65,358 @@ class BeforeAssignment:
     Priority: float
 
 
-def _find_sc_per_group(comparative_results_dir: str):
+# Columns of TTEventTable.events, one row per AQUA-DUCT event. 'sim' is the code of the simulation in
+# TTEventTable.sims and 'event_type' the index in EVENT_TYPES
+EVENT_TYPES = ("entry", "release")
+TT_EVENT_DTYPE = np.dtype([("sc_id", np.int32), ("sim", np.int16), ("event_type", np.int8), ("aq_id", np.int32),
+                           ("resid", np.int32), ("start", np.int32), ("end", np.int32)])
+
+# sc_id of the outlier (unassigned) events
+UNASSIGNED_SC_ID = -1
+
+# Simulations of the study, named {group}A_{model}_{replica}, ordered by model, group (tunnel closing group) and replica
+MODELS = ("opc", "tip3p", "tip4pew")
+GROUPS = ("1", "1.4", "1.8", "2.4", "3")
+REPLICAS = 5
+SIM_LIST = [f"{group}A_{model}_{replica}" for model in MODELS for group in GROUPS for replica in range(1, REPLICAS + 1)]
+
+
+def simulation_list(replicas: int = REPLICAS):
+    """Simulation IDs of the study with the given number of replicas per model and group, ordered like SIM_LIST"""
+    return [f"{group}A_{model}_{replica}" for model in MODELS for group in GROUPS for replica in range(1, replicas + 1)]
+
+
+def _replicas_of(sims):
+    """
+    Number of replicas per model and group of simulation IDs ({group}A_{model}_{replica}): the highest replica of the
+    simulations of the study, at least REPLICAS.
+    """
+    replicas = REPLICAS
+    for sim in sims:
+        chunks = sim.split("_")
+        if len(chunks) == 3 and chunks[0][:-1] in GROUPS and chunks[1] in MODELS and chunks[2].isdigit():
+            replicas = max(replicas, int(chunks[2]))
+    return replicas
+
+
+def simulation_replicas(simulation_results: str):
+    """
+    Number of replicas per model and group of the simulation folders of simulation_results, which must hold the same
+    number of replicas for every model and group.
+    """
+    sims = [d for d in os.listdir(simulation_results) if os.path.isdir(os.path.join(simulation_results, d))]
+    replicas = len(sims) // (len(MODELS) * len(GROUPS))
+    if replicas == 0 or sorted(sims) != sorted(simulation_list(replicas)):
+        raise ValueError(f"The {len(sims)} simulations of {simulation_results} are not {len(MODELS)} models x "
+                         f"{len(GROUPS)} groups x n replicas named {{group}}A_{{model}}_{{replica}}")
+    return replicas
+
+
+@dataclass
+class TTEventTable:
+    """
+    Transport events of filtered_super_cluster_details2.txt, parsed once into a structured array.
+    sims -> simulation IDs, the 'sim' column holds the position of the simulation in this array
+    sc_ids -> all SC_IDs present in the details file (also the ones without events)
+    events -> structured array of TT_EVENT_DTYPE
+    """
+    source: str
+    sims: np.ndarray
+    sc_ids: np.ndarray
+    events: np.ndarray
+
+    def sim_codes(self, sim_ids: list):
+        """
+        Codes of the given simulation IDs, -1 for simulations without events.
+        """
+        lookup = {sim_id: code for code, sim_id in enumerate(self.sims)}
+        return np.array([lookup.get(sim_id, -1) for sim_id in sim_ids], dtype=np.int16)
+
+    def select(self, sc_ids: list = None, event_type: str = None, sims: list = None):
+        """
+        Boolean mask of the events belonging to the given SCs, event type ('entry' or 'release') and simulations.
+        None selects everything.
+        """
+        mask = np.ones(len(self.events), dtype=bool)
+        if sc_ids is not None:
+            mask &= np.isin(self.events["sc_id"], np.asarray(sc_ids, dtype=np.int32))
+        if event_type is not None:
+            mask &= self.events["event_type"] == EVENT_TYPES.index(event_type)
+        if sims is not None:
+            mask &= np.isin(self.events["sim"], self.sim_codes(sims))
+        return mask
+
+    def to_frame(self, mask=None):
+        """
+        DataFrame of the (selected) events with 'sim' and 'event_type' as categorical columns.
+        """
+        events = self.events if mask is None else self.events[mask]
+        events_df = pd.DataFrame(events)
+        events_df["sim"] = pd.Categorical.from_codes(events["sim"], categories=list(self.sims))
+        events_df["event_type"] = pd.Categorical.from_codes(events["event_type"], categories=list(EVENT_TYPES))
+        return events_df
+
+    def count_events(self, sc_ids: list, event_type: str):
+        """
+        Number of events per simulation summed over the given SCs.
+        :returns dict(sim_id:number_of_events) of simulations having events
+        """
+        counts = np.bincount(self.events["sim"][self.select(sc_ids, event_type)], minlength=len(self.sims))
+        return {self.sims[code]: int(counts[code]) for code in np.flatnonzero(counts)}
+
+    def _group_by_sim(self, mask, values):
+        """
+        Splits values of the selected events per simulation, keeping the order of the events in the details file.
+        :returns defaultdict(sim_id:values array)
+        """
+        sim = self.events["sim"][mask]
+        order = np.argsort(sim, kind="stable")
+        codes, starts = np.unique(sim[order], return_index=True)
+        grouped = defaultdict(list)
+        for code, chunk in zip(codes, np.split(values[mask][order], starts[1:])):
+            grouped[self.sims[code]] = chunk
+        return grouped
+
+    def durations(self, sc_id: int, event_type: str):
+        """
+        Number of frames (end - start) of every event of a SC.
+        :returns defaultdict(sim_id:[frames_of_event1, frames_of_event2, ...])
+        """
+        durations = self._group_by_sim(self.select([sc_id], event_type), self.events["end"] - self.events["start"])
+        return defaultdict(list, {sim_id: values.tolist() for sim_id, values in durations.items()})
+
+    def intervals(self, sc_id: int, event_type: str):
+        """
+        Frame intervals in which the events of a SC take place, start and end frames are included.
+        :returns defaultdict(sim_id:(n_events, 2) array of start_frame, end_frame)
+        """
+        return self._group_by_sim(self.select([sc_id], event_type),
+                                  np.stack([self.events["start"], self.events["end"]], axis=1))
+
+
+def expand_intervals(intervals):
+    """
+    Frame numbers covered by (start_frame, end_frame) intervals, end frames included. A frame is repeated for every
+    interval covering it. Only use it when per frame values are really needed, frame_coverage() works on intervals.
+    :param intervals: (n, 2) array of start_frame, end_frame
+    :returns 1D array of frame numbers
+    """
+    intervals = np.asarray(intervals, dtype=np.int64).reshape(-1, 2)
+    lengths = intervals[:, 1] - intervals[:, 0] + 1
+    offsets = np.repeat(intervals[:, 0] - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
+
+
+def frame_coverage(intervals, n_frames: int = None):
+    """
+    Number of intervals (i.e. waters) covering every frame, same as counting the frames of expand_intervals().
+    :param intervals: (n, 2) array of start_frame, end_frame
+    :param n_frames: Last frame of the simulation, default is the last end frame of the intervals
+    :returns 1D array where index is the frame number
+    """
+    intervals = np.asarray(intervals, dtype=np.int64).reshape(-1, 2)
+    if n_frames is None:
+        n_frames = int(intervals[:, 1].max()) if len(intervals) else 0
+    diff = np.zeros(n_frames + 2, dtype=np.int32)
+    np.add.at(diff, np.clip(intervals[:, 0], 0, n_frames + 1), 1)
+    np.add.at(diff, np.clip(intervals[:, 1] + 1, 0, n_frames + 1), -1)
+    return np.cumsum(diff[:-1])
+
+
+@dataclass
+class EventCounts:
+    """
+    Number of TT events per simulation of the study, counts[model, group, replica, tunnel, event_type]. The tunnels
+    are the user defined tunnels followed by 'others', event types follow EVENT_TYPES. The slices are views of
+    counts, nothing is copied.
+    """
+    tunnels: list
+    counts: np.ndarray
+
+    def of_model(self, model: str):
+        """(group, replica, tunnel, event_type) counts of a water model"""
+        return self.counts[MODELS.index(model)]
+
+    def of_group(self, model: str, group: int):
+        """(replica, tunnel, event_type) counts of a group (0 -> TCG0 ...) of a water model"""
+        return self.counts[MODELS.index(model), group]
+
+    def to_frame(self):
+        """
+        Entry + release events in the layout of consolidated_results.csv, one column per tunnel_model_group
+        (group numbered from 1) and one row per replica.
+        """
+        total = self.counts.sum(axis=-1).transpose(2, 0, 1, 3)
+        columns = [f"{tunnel}_{model}_{group + 1}" for model in MODELS for group in range(len(GROUPS))
+                   for tunnel in self.tunnels]
+        return pd.DataFrame(total.reshape(self.counts.shape[2], -1), columns=columns)
+
+
+@dataclass
+class EventOccupancy:
+    """
+    Frame occupancy of transport events per simulation, frames are numbered from 1 to the simulation length.
+    coverage -> (n_sims, max_length + 1) number of waters in every frame, the column is the frame number
+    fraction -> fraction of the frames of the simulation with at least one water
+    gaps -> {sim_id: lengths (in frames) of the stretches without any water, in order of occurrence}
+    """
+    sims: list
+    lengths: np.ndarray
+    coverage: np.ndarray
+    fraction: np.ndarray
+    gaps: dict
+
+
+def event_occupancy(intervals_by_sim: dict, sim_lengths: dict):
+    """
+    Turns the event intervals of all simulations into frame occupancy in one go, using a difference array and its
+    prefix sum. Frames outside of 1..length of a simulation are ignored.
+    :param intervals_by_sim: {sim_id: (n_events, 2) array of start_frame, end_frame}
+    :param sim_lengths: {sim_id: number of frames of the simulation}
+    :returns EventOccupancy
+    """
+    sims = list(intervals_by_sim)
+    lengths = np.array([sim_lengths[sim] for sim in sims], dtype=np.int64)
+    max_length = int(lengths.max()) if len(sims) else 0
+    intervals = [np.asarray(intervals_by_sim[sim], dtype=np.int64).reshape(-1, 2) for sim in sims]
+    rows = np.repeat(np.arange(len(sims)), [len(x) for x in intervals])
+    intervals = np.concatenate(intervals) if intervals else np.empty((0, 2), dtype=np.int64)
+
+    diff = np.zeros((len(sims), max_length + 2), dtype=np.int32)
+    np.add.at(diff, (rows, np.clip(intervals[:, 0], 1, lengths[rows] + 1)), 1)
+    np.add.at(diff, (rows, np.clip(intervals[:, 1] + 1, 1, lengths[rows] + 1)), -1)
+    coverage = np.cumsum(diff[:, :-1], axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = (coverage[:, 1:] > 0).sum(axis=1) / lengths
+
+    # Stretches of free frames, split per simulation
+    free = (coverage[:, 1:] == 0) & (np.arange(1, max_length + 1) <= lengths[:, None])
+    edges = np.diff(free.astype(np.int8), axis=1, prepend=0, append=0)
+    gap_rows, gap_starts = np.nonzero(edges == 1)
+    gap_lengths = np.nonzero(edges == -1)[1] - gap_starts
+    per_sim = np.split(gap_lengths, np.cumsum(np.bincount(gap_rows, minlength=len(sims)))[:-1])
+    return EventOccupancy(sims=sims, lengths=lengths, coverage=coverage, fraction=fraction,
+                          gaps=dict(zip(sims, per_sim)))
+
+
+def get_simulation_lengths(simulation_results: str, sims: list, trajectory: str = "merged.nc",
+                           intervals_by_sim: dict = None):
+    """
+    Number of frames of every simulation, read from the header of its NetCDF trajectory.
+    :param simulation_results: Simulation results location
+    :param sims: Simulation IDs (folder names)
+    :param trajectory: Name of the trajectory in the simulation folder
+    :param intervals_by_sim: If a trajectory is missing, the last event frame of the simulation is used instead
+    :returns dict(sim_id:number_of_frames)
+    """
+    from scipy.io import netcdf_file
+    lengths = {}
+    for sim in sims:
+        nc_file = os.path.join(simulation_results, sim, trajectory)
+        if os.path.isfile(nc_file):
+            with netcdf_file(nc_file, 'r', mmap=True) as nc:
+                lengths[sim] = nc.variables['coordinates'].shape[0]
+        else:
+            intervals = np.asarray([] if intervals_by_sim is None else intervals_by_sim.get(sim, []))
+            lengths[sim] = int(intervals.max()) if intervals.size else 0
+            print(f"{nc_file} does not exist, using the last event frame ({lengths[sim]}) as length of {sim}")
+    return lengths
+
+
+# TTEventTable per details file, filled by _load_event_store. Bump the version when the table layout changes so that
+# old cache files are parsed again
+_EVENT_STORES = {}
+_EVENT_STORE_VERSION = 2
+# SC_ID -> tunnel label code arrays per groups definition, filled by _tunnel_codes
+_TUNNEL_LOOKUPS = {}
+
+
+def _read_group_statistics(file_path: str):
+    """
+    Reads one 4-filtered_events_statistics.txt. The statistics rows (from line 22, without the '-' separator lines and
+    the last line) are parsed at once by the csv reader with the column types of TTEventsStats.
+    :param file_path: Location of 4-filtered_events_statistics.txt
+    :returns DataFrame of the assigned SCs, (total, entry, release) unassigned events
     """
-    Reads the comparative analysis results and then groups according to user definitions. Also gives out
-    'others' - which are the SCs not in any groups and 'unassigned' which are not assigned by transport tools
+    import io
+    with open(file_path, "r") as file:
+        lines = file.read().splitlines()
+    rows = [line for line in lines[21:-1] if "-" not in line]
+    if rows:
+        stats = pd.read_csv(io.StringIO("\n".join(rows)), header=None, names=list(TT_STATS_DTYPES),
+                            dtype=TT_STATS_DTYPES, skipinitialspace=True)
+    else:
+        stats = pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in TT_STATS_DTYPES.items()})
+    unassigned = lines[-1].split(",")
+    return stats, (int(unassigned[0].split()[5]), int(unassigned[1]), int(unassigned[2]))
+
+
+def _find_sc_per_group(comparative_results_dir: str, workers: int = None):
+    """
+    Reads the comparative analysis results of all groups (folders), the folders are parsed in parallel.
 
     :param comparative_results_dir: Directory in which comparative analysis results are present
-    :return:dict(comparative_group_name:[events_assigned_to_scs,unassigned_events]
+    :param workers: Number of processes, default is one per folder (up to the number of CPUs), 1 reads sequentially
+    :return: DataFrame of assigned SCs of all folders with a 'group' column (folder name) in the order of the
+    folders, DataFrame of unassigned events indexed by folder name
     """
-    # Parse the results and store it
+    from concurrent.futures import ProcessPoolExecutor
     comparative_analysis_results = [d for d in os.listdir(comparative_results_dir) if
                                     os.path.isdir(os.path.join(comparative_results_dir, d))]
     comparative_analysis_results.sort()
-    parsed_results = defaultdict(list)
-
+    groups = []
+    file_paths = []
     for group in comparative_analysis_results:
         file_path = os.path.join(comparative_results_dir, group, "4-filtered_events_statistics.txt")
-
         if os.path.isfile(file_path):
-            with open(file_path, "r") as file:
-                lines = file.readlines()
-                events_per_group = []
-                for line in lines[21:-1]:  # start reading from line 22
-                    # Parse the line and create a DataClass object
-                    if "-" in line:
-                        continue
-                    else:
-                        data = [float(x) if '.' in x else int(x) for x in line.split(",")]
-                        events_per_group.append(TTEventsStats(*data))
-                        # print the obj
-                # print(events_per_group[0])
-                unasigned = lines[-1].split(",")
-                total = int(unasigned[0].split()[5])
-                entry = int(unasigned[1])
-                release = int(unasigned[2])
-                group_name = group
-                unasigned_per_group = TTUnassigned(group_name, total, entry, release)
-                # print(unasigned_per_group)
-                parsed_results[group_name] = [events_per_group, unasigned_per_group]
+            groups.append(group)
+            file_paths.append(file_path)
         else:
             print(f"{file_path} does not exist.")
-    return parsed_results
+
+    if workers is None:
+        workers = min(len(file_paths), os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_read_group_statistics, file_paths))
+    else:
+        results = [_read_group_statistics(file_path) for file_path in file_paths]
+
+    if results:
+        stats = pd.concat([result[0] for result in results], ignore_index=True)
+    else:
+        stats = pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in TT_STATS_DTYPES.items()})
+    stats.insert(0, "group", pd.Categorical(np.repeat(groups, [len(result[0]) for result in results]),
+                                            categories=groups))
+    unassigned = pd.DataFrame([result[1] for result in results], index=pd.Index(groups, name="group"),
+                              columns=[f.name for f in fields(TTUnassigned)][1:])
+    return stats, unassigned
+
+
+def _tunnel_codes(sc_ids, groups_definition: dict):
+    """
+    Tunnel label code of every SC_ID, codes follow the order of the groups definition and len(groups_definition)
+    stands for 'others'. The SC_ID -> code lookup array is built once per groups definition.
+    :param sc_ids: Array of SC_IDs
+    :param groups_definition: Tunnels definition, tunnel_name:superclusters
+    :returns array of codes
+    """
+    key = tuple((name, tuple(scs)) for name, scs in groups_definition.items())
+    others = len(groups_definition)
+    if key not in _TUNNEL_LOOKUPS:
+        defined = [sc for scs in groups_definition.values() for sc in scs]
+        if len(set(defined)) != len(defined):
+            print("Some SCs are defined in more than one tunnel, they are assigned to the first tunnel defined")
+        lookup = np.full(max(defined, default=-1) + 1, others, dtype=np.int16)
+        # reversed, so that the first tunnel wins for SCs defined more than once
+        for code, scs in reversed(list(enumerate(groups_definition.values()))):
+            lookup[np.asarray(scs, dtype=np.intp)] = code
+        _TUNNEL_LOOKUPS[key] = lookup
+    lookup = _TUNNEL_LOOKUPS[key]
+    sc_ids = np.asarray(sc_ids, dtype=np.intp)
+    known = (sc_ids >= 0) & (sc_ids < len(lookup))
+    return np.where(known, lookup.take(np.where(known, sc_ids, 0)), others)
 
 
 def get_scids_of_groups(comparative_analysis_results, groups_definition: dict = None, show_info: bool = False):
@@ -109,30 +428,17 @@ def get_scids_of_groups(comparative_analysis_results, groups_definition: dict =
     :return: SC_IDs of tunnels split by user defined groups + others + unassigned
     """
     # Split by user defined groups definitions
-    parsed_results = _find_sc_per_group(comparative_analysis_results)
+    assigned, _ = _find_sc_per_group(comparative_analysis_results)
     sc_id_by_tunnels = defaultdict(list)
     group_names = list(groups_definition.keys())
-    for epoch in parsed_results.keys():
-        assigned = parsed_results[epoch][0]  # 0 -> assigned , 1 -> unassigned
-        sc_id = [x.SC_ID for x in assigned]
-        # Split into groups, which are defined at the beginning of script
-        for user_group_name in group_names:  # for P1 in [p1,p2,p3]
-            sc_id_in_group = [x for x in sc_id if x in groups_definition[user_group_name]]
-            if epoch not in sc_id_by_tunnels:
-                # Create a new entry in sc_id_by_tunnels if comparative_group does not exist
-                sc_id_by_tunnels[epoch] = [{user_group_name: sc_id_in_group}]
-            else:
-                # If it exists, append other values in user group . eg., P2, P3.. others
-                sc_id_by_tunnels[epoch][0][user_group_name] = sc_id_in_group
-        # Add a new entry called 'others' where it has all the SCIDs which does not belong to the groups which user
-        # defined
-        selected_sc_ids = [item for sublist in sc_id_by_tunnels[epoch][0].values() for item in sublist]
-        other_scids = [x for x in sc_id if x not in selected_sc_ids]
-        sc_id_by_tunnels[epoch][0]["others"] = other_scids
-        # reorder
-        order = group_names + ["others"]
-        sc_id_by_tunnels[epoch][0] = {key: sc_id_by_tunnels[epoch][0][key] for key in order
-                                      if key in sc_id_by_tunnels[epoch][0]}
+    order = group_names + ["others"]
+    # tunnel label code of every assigned SC of all comparative groups at once, len(group_names) -> others
+    sc_ids = assigned["SC_ID"].to_numpy()
+    codes = _tunnel_codes(sc_ids, groups_definition)
+    bounds = np.cumsum(assigned.groupby("group", observed=False).size().to_numpy())
+    for epoch, start, end in zip(assigned["group"].cat.categories, np.r_[0, bounds[:-1]], bounds):
+        sc_id, code = sc_ids[start:end], codes[start:end]
+        sc_id_by_tunnels[epoch] = [{key: sc_id[code == i].tolist() for i, key in enumerate(order)}]
     if show_info:
         for group in sc_id_by_tunnels:
             print(f"for group {group}")
@@ -148,161 +454,219 @@ def _get_unassigned_events(tt_results: str):
     :param tt_results: TransportTools results directory.
     :return:dict{comparative_group_name:unassigned_values,.....}
     """
-    outlier_file = os.path.join(tt_results, "data", "super_clusters", "details", "outlier_transport_events_details.txt")
-    with open(outlier_file, 'r') as infile:
-        contents = infile.readlines()
+    store = _load_event_store(tt_results, unassigned=True)
+    counts = np.bincount(store.events["sim"] * len(EVENT_TYPES) + store.events["event_type"],
+                         minlength=len(store.sims) * len(EVENT_TYPES)).reshape(len(store.sims), len(EVENT_TYPES))
     unassigned = defaultdict(dict)
+    for sim_id, sim_counts in zip(store.sims, counts.tolist()):
+        unassigned[sim_id] = dict(zip(EVENT_TYPES, sim_counts))
+    return unassigned
+
+
+def _parse_sc_details(tt_super_cluster_details: str, debug: bool = False, sc_ids: list = None):
+    """
+    Single pass parser of filtered_super_cluster_details2.txt. Every AQUA-DUCT event of every supercluster is read
+    once into a TTEventTable, only events from simulations which have a tunnel cluster in the supercluster are
+    stored (same as the old line by line parser).
+    :param tt_super_cluster_details: The file from tt_results/data/super_clusters/details/
+    :param debug: Print the number of events per SC and simulation while parsing
+    :param sc_ids: Parse only these superclusters, their blocks are read through the byte offset index of the file
+    :returns TTEventTable
+    """
+    from array import array
+
+    def _lines():
+        if sc_ids is None:
+            with open(tt_super_cluster_details, 'r') as results_file:
+                yield from results_file
+        else:
+            for block in read_sc_blocks(tt_super_cluster_details, sc_ids).values():
+                yield from block.splitlines(keepends=True)
+
+    sim_codes = {}
+    all_sc_ids = []
+    columns = {name: array('i') for name in TT_EVENT_DTYPE.names}
+    sc_id = None
+    tunnel_sims = set()
+    section = None  # None -> header of SC, tunnels -> Tunnel clusters, gap, entry, release
+    for line in _lines():
+        line = line.rstrip("\n")
+        if line.startswith('Super'):
+            sc_id = int(line.split(" ")[2])
+            all_sc_ids.append(sc_id)
+            tunnel_sims = set()
+            section = None
+            continue
+        if sc_id is None:
+            continue
+        if section is None:
+            if line.startswith('from'):  # first "from" lines are the tunnel clusters
+                section = "tunnels"
+            else:
+                continue
+        if section == "tunnels":
+            if line == '':
+                section = "gap"
+            else:
+                tunnel_sims.add(line.split()[1][:-1])
+            continue
+        if line.startswith('entry'):
+            section = "entry"
+        elif line.startswith('release'):
+            section = "release"
+        elif line.startswith('-'):
+            section = "gap"
+        elif section in ("entry", "release") and line.startswith('from'):
+            # from 3A_opc_3: 1952, (WAT:8178), 19098->19131; ...
+            epoch, waters = line.split(":", 1)
+            sim_id = epoch.split(sep=" ")[1]
+            if sim_id not in tunnel_sims:
+                continue
+            sim_code = sim_codes.setdefault(sim_id, len(sim_codes))
+            num_events = _append_events(columns, waters, sc_id, sim_code, EVENT_TYPES.index(section))
+            if debug:
+                print(f"[{section.upper()}] - SCID {sc_id} - {sim_id} - {num_events}")
+
+    return _event_table(tt_super_cluster_details, sim_codes, all_sc_ids, columns)
+
+
+def _append_events(columns: dict, waters: str, sc_id: int, sim_code: int, event_type: int):
+    """
+    Appends the events of one 'from SIM:' line to the columns of the event table.
+    :param waters: The part after 'from SIM:', e.g. ' 1952, (WAT:8178), 19098->19131; 1953, (WAT:81), 9->31;'
+    :returns number of events
+    """
+    waters = waters.split(sep=";")[:-1]
+    for water in waters:
+        aq_id, residue, frames = water.split(sep=",")[:3]
+        start, end = frames.split("->")
+        columns["aq_id"].append(int(aq_id))
+        columns["resid"].append(int(residue.strip()[1:-1].split(":")[1]))
+        columns["start"].append(int(start))
+        columns["end"].append(int(end))
+    columns["sc_id"].extend([sc_id] * len(waters))
+    columns["sim"].extend([sim_code] * len(waters))
+    columns["event_type"].extend([event_type] * len(waters))
+    return len(waters)
+
+
+def _event_table(source: str, sim_codes: dict, sc_ids: list, columns: dict):
+    """
+    TTEventTable from the array('i') columns filled by the parsers.
+    """
+    events = np.empty(len(columns["sc_id"]), dtype=TT_EVENT_DTYPE)
+    for name, values in columns.items():
+        events[name] = np.frombuffer(values, dtype=np.intc)
+    return TTEventTable(source=os.path.abspath(source), sims=np.array(list(sim_codes), dtype=object),
+                        sc_ids=np.array(sc_ids, dtype=np.int32), events=events)
+
+
+def _iter_outlier_events(outlier_file: str):
+    """
+    Streams the outlier (unassigned) transport events of outlier_transport_events_details.txt, one 'from SIM:' line
+    at a time. The events are entries until the 'release' header.
+    :param outlier_file: Location of outlier_transport_events_details.txt
+    :returns generator of (sim_id, event_type, part of the line after 'from SIM:')
+    """
     current_category = 'entry'
-    for line in contents[4:]:
-        # entry: (from Simulation: AQUA-DUCT ID, (Resname:Residue), start_frame->end_frame; ... )
-        # 'from 3A_opc_3: 1952, (WAT:8178), 19098->19131;'
-        if 'from' in line:
-            if 'release' not in line:
-                line = line.strip()
-                sim_id = line.split(" ")[1].split(":")[0]
-                num_events = len(line.split(";")[:-1])
-                if current_category in unassigned[sim_id]:
-                    unassigned[sim_id][current_category] += num_events
-                else:
-                    unassigned[sim_id] = {"entry": 0, "release": 0}
-                    unassigned[sim_id][current_category] += num_events
-            elif 'release' in line:
+    with open(outlier_file, 'r') as infile:
+        for line in islice(infile, 4, None):
+            # entry: (from Simulation: AQUA-DUCT ID, (Resname:Residue), start_frame->end_frame; ... )
+            # 'from 3A_opc_3: 1952, (WAT:8178), 19098->19131;'
+            if 'release' in line:
                 current_category = "release"
-        elif 'release' in line:
-            current_category = "release"
-    return unassigned
+            elif line.startswith('from'):
+                epoch, waters = line.strip().split(":", 1)
+                yield epoch.split(" ")[1], current_category, waters
 
 
-def _get_data_from_tt(tt_super_cluster_details, debug: bool = False, frame_numbers: bool = False):
-    """
-    Helper function to parse the details from filtered_supercluster_details2.txt file and returns the entry and release
-    len() for every sim #.
-    :param tt_super_cluster_details:
-    The file from tt_results/data/super_clusters
-    /details/filtered_super_clusters_details1.txt
-    :returns dict(entry,release) of Aquaduct frames per event , dict(entry_water), dict(release_water)
-    """
-    # EVENTS
-    num_frames_aq_water = defaultdict(list)
-    frame_numbers_aq_water = defaultdict(list)
-    entry_water = defaultdict(list)
-    release_water = defaultdict(list)
-    if debug:
-        print("---------------------------------------------------------------")
-    with open(tt_super_cluster_details, 'r') as results_file:
-        _read = results_file.readlines()
-        readfile = [i.strip("\n") for i in _read]
-        i = 0
-        while i < len(readfile) - 1:
-            _super_cluster_id = []  # Temp super cluster id
-            _epoch_water_entry = defaultdict(int)  # Temp water entry
-            _epoch_water_release = defaultdict(int)  # Temp water release
-            _epoch_frames_entry = defaultdict(list)
-            _epoch_frames_release = defaultdict(list)
-            _epoch_frame_numbers_entry = defaultdict(list)
-            _epoch_frame_numbers_release = defaultdict(list)
-
-            while not readfile[i].startswith('Super'):
-                i += 1
-
-            if readfile[i].startswith('Super'):
-                sc_id = int(readfile[i].split(" ")[2])
-                _super_cluster_id.append(sc_id)  # Add to tmp list to pass below
-                # print(readfile[i])
-
-            while not readfile[i].startswith('from'):  # move pointer below "Tunnel clusters:"
-                i += 1
-
-            _tunnel_clusters_sim_list = []
-            while not readfile[i] == '':
-                sim_id = readfile[i].split()[1][:-1]
-                _tunnel_clusters_sim_list.append(sim_id)
-                i += 1
-
-            while not readfile[i].startswith('entry'):  # Move the pointer to entry:
-                if readfile[i].startswith('release'):  # if there is no entry, move to release
-                    break
-                i += 1
-
-            while not readfile[i].startswith('release'):  # Move pointer until release, and parse the entry data
-                if readfile[i].startswith('entry'):  # overriding for mismatch of entries in the file
-                    pass
-                else:
-                    if readfile[i].startswith("-"):  # break loop if there is no entry
-                        break
-                    epoch, waters = readfile[i].split(":", 1)
-                    sim_id = epoch.split(sep=" ")[1]  # omit "from "
-                    entry_waters = waters.split(sep=";")
-                    # print(f"Parsing data for SCID - {sc_id}")
-                    frames = [i.split(sep=',')[2] for i in entry_waters[:-1]]
-                    number_of_frames_entry = []
-                    frame_numbers_entry = []
-                    for element in frames:
-                        start, end = element.split("->")
-                        number_of_frames = int(end) - int(start)
-                        if frame_numbers:
-                            _frame_numbers = list(range(int(start), int(end) + 1))
-                            frame_numbers_entry = frame_numbers_entry + _frame_numbers  # Frame 1,2,3,4 etc.
-                        number_of_frames_entry.append(number_of_frames)  # count of frames
-                    entry_water_count = len(entry_waters) - 1
-                    if sim_id in _tunnel_clusters_sim_list:
-                        _epoch_water_entry[sim_id] = entry_water_count
-                        _epoch_frames_entry[sim_id] = number_of_frames_entry
-                        if frame_numbers:
-                            _epoch_frame_numbers_entry[sim_id] = frame_numbers_entry
-
-                    if debug:
-                        # print("There is no tunnel cluster for the entry event below :  ")
-                        print(f"[ENTRY] - SCID {sc_id} - {sim_id} - {entry_water_count}")
-                    # print("ENTRY-"+sim_id+"="+str(entry_water_count))
-                i += 1
-
-            while not readfile[i].startswith('-'):  # Move the pointer until the dash part and parse the release data
-                if readfile[i].startswith('Super'):
-                    break
-                if readfile[i].startswith('release'):
-                    pass
-                    # print(readfile[i])
-                else:
-                    # print("release", i)
-                    epoch, waters = readfile[i].split(":", 1)
-                    sim_id = epoch.split(sep=" ")[1]
-                    release_waters = waters.split(sep=";")
-                    # print(release_waters)
-                    frames = [i.split(sep=',')[2] for i in release_waters[:-1]]
-                    number_of_frames_release = []
-                    frame_numbers_release = []
-                    for element in frames:
-                        start, end = element.split("->")
-                        number_of_frames = int(end) - int(start)
-                        if frame_numbers:
-                            _frame_numbers = list(range(int(start), int(end) + 1))
-                            frame_numbers_release = frame_numbers_release + _frame_numbers
-                        number_of_frames_release.append(number_of_frames)
-                    release_water_count = len(release_waters) - 1
-                    if sim_id in _tunnel_clusters_sim_list:
-                        _epoch_frames_release[sim_id] = number_of_frames_release
-                        _epoch_water_release[sim_id] = release_water_count
-                        if frame_numbers:
-                            _epoch_frame_numbers_release[sim_id] = frame_numbers_release
-                    if debug:
-                        print("There is no tunnel cluster for the release event below :  ")
-                        print(f"[RELEASE] - SCID {sc_id} - {sim_id} - {release_water_count}")
-                    # print("RELEASE-"+sim_id+"="+str(release_water_count))
-                #     One cycle of entry and release gets over here, i+1 to goto next supercluster ID
-                i += 1
-            entry_water[sc_id].append(_epoch_water_entry)
-            release_water[sc_id].append(_epoch_water_release)
-            num_frames_aq_water[sc_id] = [_epoch_frames_entry, _epoch_frames_release]
-            if frame_numbers:
-                frame_numbers_aq_water[sc_id] = [_epoch_frame_numbers_entry, _epoch_frame_numbers_release]
-    results_file.close()
-    if debug:
-        print("----------------------------------------------------------------\n \n")
-    if frame_numbers:
-        return frame_numbers_aq_water
-    else:
-        return num_frames_aq_water, entry_water, release_water
+def _parse_outlier_events(outlier_file: str):
+    """
+    Reads the outlier (unassigned) transport events into a TTEventTable, their sc_id is UNASSIGNED_SC_ID.
+    :param outlier_file: Location of outlier_transport_events_details.txt
+    :returns TTEventTable
+    """
+    from array import array
+    sim_codes = {}
+    columns = {name: array('i') for name in TT_EVENT_DTYPE.names}
+    for sim_id, event_type, waters in _iter_outlier_events(outlier_file):
+        _append_events(columns, waters, UNASSIGNED_SC_ID, sim_codes.setdefault(sim_id, len(sim_codes)),
+                       EVENT_TYPES.index(event_type))
+    return _event_table(outlier_file, sim_codes, [], columns)
+
+
+def _file_signature(file_path: str, with_hash: bool = True):
+    """
+    Size, modification time and (optionally) sha1 of a file, used to validate the on-disk event store cache.
+    """
+    import hashlib
+    stat = os.stat(file_path)
+    digest = None
+    if with_hash:
+        sha1 = hashlib.sha1()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(16 * 1024 * 1024), b''):
+                sha1.update(chunk)
+        digest = sha1.hexdigest()
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha1": digest}
+
+
+def _load_event_store(tt_results: str, use_cache: bool = True, cache_file: str = None, sc_ids: list = None,
+                      unassigned: bool = False):
+    """
+    Gives the TTEventTable of a TransportTools results directory. The details file is parsed only once per session
+    (kept in memory) and the parsed store is saved next to it, so later sessions only read the cache. The cache is
+    reused if the size and modification time of the details file are unchanged, or if the sha1 of the file still
+    matches (e.g. results copied to another disk).
+    :param tt_results: TransportTools results location
+    :param use_cache: Read and write the on-disk cache
+    :param cache_file: Location of the cache file, default is next to filtered_super_cluster_details2.txt
+    :param sc_ids: Superclusters needed by the caller. If the full store is neither in memory nor in a valid cache,
+    only the blocks of these superclusters are parsed (through the byte offset index) and nothing is cached
+    :param unassigned: Give the outlier (unassigned) events of outlier_transport_events_details.txt instead
+    :returns TTEventTable
+    """
+    import pickle
+    details = "outlier_transport_events_details.txt" if unassigned else "filtered_super_cluster_details2.txt"
+    sc_details_file = os.path.abspath(os.path.join(tt_results, "data", "super_clusters", "details", details))
+    if sc_details_file in _EVENT_STORES:
+        return _EVENT_STORES[sc_details_file]
+    if cache_file is None:
+        cache_file = sc_details_file + ".store.pkl"
+
+    store = None
+    save_cache = use_cache
+    if use_cache and os.path.isfile(cache_file):
+        with open(cache_file, 'rb') as f:
+            try:
+                cached_version, cached_signature, cached_store = pickle.load(f)
+            except (ValueError, AttributeError, ImportError, EOFError, pickle.UnpicklingError):
+                # cache of an older format, of a renamed module or truncated: parsed again
+                cached_version, cached_signature, cached_store = None, None, None
+        signature = _file_signature(sc_details_file, with_hash=False)
+        if cached_version == _EVENT_STORE_VERSION and signature["size"] == cached_signature["size"]:
+            if signature["mtime"] == cached_signature["mtime"]:
+                store = cached_store
+                save_cache = False
+            elif _file_signature(sc_details_file)["sha1"] == cached_signature["sha1"]:
+                store = cached_store  # same content, save again to update the mtime
+    if store is None:
+        if unassigned:
+            store = _parse_outlier_events(sc_details_file)
+        elif sc_ids is not None:
+            return _parse_sc_details(sc_details_file, sc_ids=sc_ids)
+        else:
+            store = _parse_sc_details(sc_details_file)
+    if save_cache:
+        try:
+            with open(cache_file + ".tmp", 'wb') as f:
+                pickle.dump((_EVENT_STORE_VERSION, _file_signature(sc_details_file), store), f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(cache_file + ".tmp", cache_file)
+        except OSError as error:
+            print(f"Could not save the event store cache to {cache_file}: {error}")
+    _EVENT_STORES[sc_details_file] = store
+    return store
 
 
 def get_entry_release_events(required_SCIDs: list, tt_results: str, model: str):
@@ -313,64 +677,65 @@ def get_entry_release_events(required_SCIDs: list, tt_results: str, model: str):
     :param model: Water model "OPC" or "TIP3P" or "TIP4PEW" (in small letters)
     :param required_SCIDs: Super Cluster IDs to be processed. Eg., [1] or [1,3,5] etc.,
     """
-    tt_sc_details2_file = os.path.join(tt_results, "data", "super_clusters", "details",
-                                       "filtered_super_cluster_details2.txt")
-    sim_list = ['1A_opc_1', '1A_opc_2', '1A_opc_3', '1A_opc_4', '1A_opc_5', '1.4A_opc_1', '1.4A_opc_2', '1.4A_opc_3',
-                '1.4A_opc_4', '1.4A_opc_5', '1.8A_opc_1', '1.8A_opc_2', '1.8A_opc_3', '1.8A_opc_4',
-                '1.8A_opc_5', '2.4A_opc_1', '2.4A_opc_2', '2.4A_opc_3', '2.4A_opc_4', '2.4A_opc_5', '3A_opc_1',
-                '3A_opc_2', '3A_opc_3', '3A_opc_4', '3A_opc_5',
-
-                '1A_tip3p_1', '1A_tip3p_2', '1A_tip3p_3', '1A_tip3p_4', '1A_tip3p_5', '1.4A_tip3p_1',
-                '1.4A_tip3p_2', '1.4A_tip3p_3', '1.4A_tip3p_4', '1.4A_tip3p_5', '1.8A_tip3p_1', '1.8A_tip3p_2',
-                '1.8A_tip3p_3', '1.8A_tip3p_4', '1.8A_tip3p_5', '2.4A_tip3p_1', '2.4A_tip3p_2',
-                '2.4A_tip3p_3', '2.4A_tip3p_4', '2.4A_tip3p_5', '3A_tip3p_1', '3A_tip3p_2', '3A_tip3p_3', '3A_tip3p_4',
-                '3A_tip3p_5',
-
-                '1A_tip4pew_1', '1A_tip4pew_2', '1A_tip4pew_3', '1A_tip4pew_4', '1A_tip4pew_5',
-                '1.4A_tip4pew_1', '1.4A_tip4pew_2', '1.4A_tip4pew_3', '1.4A_tip4pew_4', '1.4A_tip4pew_5',
-                '1.8A_tip4pew_1', '1.8A_tip4pew_2', '1.8A_tip4pew_3', '1.8A_tip4pew_4', '1.8A_tip4pew_5',
-                '2.4A_tip4pew_1', '2.4A_tip4pew_2', '2.4A_tip4pew_3', '2.4A_tip4pew_4', '2.4A_tip4pew_5',
-                '3A_tip4pew_1', '3A_tip4pew_2', '3A_tip4pew_3', '3A_tip4pew_4', '3A_tip4pew_5']
-
-    if model == "opc":
-        sim_list = sim_list[0:25]
-    elif model == "tip3p":
-        sim_list = sim_list[25:50]
-    elif model == "tip4pew":
-        sim_list = sim_list[50:75]
+    sim_list = [sim for sim in SIM_LIST if sim.split("_")[1] == model] if model in MODELS else SIM_LIST
 
     # print(model, sim_list)
-    super_cluster_ids, entry, release = _get_data_from_tt(tt_sc_details2_file)
-    _tmp_df = pd.DataFrame(0, index=[0], columns=sim_list)
-    # ENTRY
-    for sc_ID in required_SCIDs:
-        # location = list(entry.keys()).index(sc_ID)
-        #  Add 'entry' column to the dataframe
-        sc_id_df = pd.DataFrame(entry[sc_ID])
-        try:
-            _tmp_df = pd.concat([_tmp_df.convert_dtypes(), sc_id_df.convert_dtypes()], axis=0, ignore_index=True)
-        except ValueError:
-            pass
-    # _tmp_df --> Dataframe of Transport events per SC, can be used to plot the highest contributor
-    # print(_tmp_df)
-    sum_entry_per_replica = _tmp_df.sum(axis=0)
-    tt_entry_df_for_all_sc = pd.DataFrame(sum_entry_per_replica, columns=['Entry_events'])
-    _tmp_df = pd.DataFrame(0, index=[0], columns=sim_list)
-    # RELEASE
-    for sc_ID in required_SCIDs:
-        # location = list(entry.keys()).index(sc_ID)
-        try:
-            sc_id_df = pd.DataFrame(release[sc_ID])
-            _tmp_df = pd.concat([_tmp_df.convert_dtypes(), sc_id_df.convert_dtypes()], axis=0, ignore_index=True)
-        except ValueError:
-            pass
-        # print(_tmp_df)
-    # _tmp_df --> Dataframe of Transport events per SC, can be used to plot the highest contributor
-    sum_release = _tmp_df.sum(axis=0)
-    tt_release_df_for_all_sc = pd.DataFrame(sum_release, columns=['Release_events'])
+    store = _load_event_store(tt_results)
+    # Simulations of the model first, followed by the other simulations having events in the required SCs
+    entry = store.count_events(required_SCIDs, "entry")
+    entry_sims = sim_list + [sim for sim in entry if sim not in sim_list]
+    tt_entry_df_for_all_sc = pd.DataFrame({'Entry_events': [entry.get(sim, 0) for sim in entry_sims]},
+                                          index=entry_sims)
+    release = store.count_events(required_SCIDs, "release")
+    release_sims = sim_list + [sim for sim in release if sim not in sim_list]
+    tt_release_df_for_all_sc = pd.DataFrame({'Release_events': [release.get(sim, 0) for sim in release_sims]},
+                                            index=release_sims)
     return tt_entry_df_for_all_sc, tt_release_df_for_all_sc
 
 
+def _sim_positions(store: TTEventTable, sim_list: list = SIM_LIST):
+    """
+    Position in sim_list of the simulation of every event of the table, -1 for simulations not in sim_list.
+    """
+    sim_index = {sim: i for i, sim in enumerate(sim_list)}
+    return np.array([sim_index.get(sim, -1) for sim in store.sims], dtype=np.intp)[store.events["sim"]]
+
+
+def event_count_matrix(tt_results: str, groups_definitions: dict):
+    """
+    Counts the entry and release events of every simulation per tunnel in one pass over the event table. Like
+    get_scids_of_groups, a SC is only counted in the simulations of the comparative analysis group (folder) in whose
+    statistics it is present, the folders are assumed to be sorted by model and group like SIM_LIST. The number of
+    replicas is taken from the simulations of the events (at least REPLICAS).
+    :param tt_results: TransportTools results location
+    :param groups_definitions: The definitions of groups formed by SCs.
+    :returns EventCounts
+    """
+    store = _load_event_store(tt_results)
+    assigned, _ = _find_sc_per_group(os.path.join(tt_results, "statistics", "comparative_analysis"))
+    events = store.events
+    tunnels = list(groups_definitions.keys()) + ["others"]
+
+    # SCs present in every comparative analysis folder
+    max_sc = max(int(assigned["SC_ID"].max()) if len(assigned) else 0, int(events["sc_id"].max(initial=0)))
+    present = np.zeros((len(assigned["group"].cat.categories), max_sc + 1), dtype=bool)
+    present[assigned["group"].cat.codes.to_numpy(), assigned["SC_ID"].to_numpy()] = True
+
+    # position of the simulation of every event in the simulations of the study, its folder is position // replicas
+    replicas = _replicas_of(store.sims)
+    sim_list = simulation_list(replicas)
+    position = _sim_positions(store, sim_list)
+    folder = np.where(position >= 0, position // replicas, present.shape[0])
+    keep = folder < present.shape[0]
+    keep[keep] = present[folder[keep], events["sc_id"][keep]]
+
+    flat = (position * len(tunnels) + _tunnel_codes(events["sc_id"], groups_definitions)) * len(EVENT_TYPES) \
+        + events["event_type"]
+    counts = np.bincount(flat[keep], minlength=len(sim_list) * len(tunnels) * len(EVENT_TYPES))
+    return EventCounts(tunnels=tunnels,
+                       counts=counts.reshape(len(MODELS), len(GROUPS), replicas, len(tunnels), len(EVENT_TYPES)))
+
+
 def consolidate_results(tt_results: str, groups_definitions: dict, save_location=None):
     """
     Process the TT assigned and unassigned events and process results to produce entry,release and consolidated results.
@@ -378,117 +743,33 @@ def consolidate_results(tt_results: str, groups_definitions: dict, save_location
     :param tt_results: TransportTools results location
     :param groups_definitions: The definitions of groups formed by SCs.
     :returns consolidated_df Dataframe
-    [optional] saving of consolidated df to consolidated_results.csv
-    """
-    global sc_ids
-    sim_list = ['1A_opc_1', '1A_opc_2', '1A_opc_3', '1A_opc_4', '1A_opc_5', '1.4A_opc_1', '1.4A_opc_2', '1.4A_opc_3',
-                '1.4A_opc_4', '1.4A_opc_5', '1.8A_opc_1', '1.8A_opc_2', '1.8A_opc_3', '1.8A_opc_4',
-                '1.8A_opc_5', '2.4A_opc_1', '2.4A_opc_2', '2.4A_opc_3', '2.4A_opc_4', '2.4A_opc_5', '3A_opc_1',
-                '3A_opc_2', '3A_opc_3', '3A_opc_4', '3A_opc_5',
-
-                '1A_tip3p_1', '1A_tip3p_2', '1A_tip3p_3', '1A_tip3p_4', '1A_tip3p_5', '1.4A_tip3p_1',
-                '1.4A_tip3p_2', '1.4A_tip3p_3', '1.4A_tip3p_4', '1.4A_tip3p_5', '1.8A_tip3p_1', '1.8A_tip3p_2',
-                '1.8A_tip3p_3', '1.8A_tip3p_4', '1.8A_tip3p_5', '2.4A_tip3p_1', '2.4A_tip3p_2',
-                '2.4A_tip3p_3', '2.4A_tip3p_4', '2.4A_tip3p_5', '3A_tip3p_1', '3A_tip3p_2', '3A_tip3p_3', '3A_tip3p_4',
-                '3A_tip3p_5',
-
-                '1A_tip4pew_1', '1A_tip4pew_2', '1A_tip4pew_3', '1A_tip4pew_4', '1A_tip4pew_5',
-                '1.4A_tip4pew_1', '1.4A_tip4pew_2', '1.4A_tip4pew_3', '1.4A_tip4pew_4', '1.4A_tip4pew_5',
-                '1.8A_tip4pew_1', '1.8A_tip4pew_2', '1.8A_tip4pew_3', '1.8A_tip4pew_4', '1.8A_tip4pew_5',
-                '2.4A_tip4pew_1', '2.4A_tip4pew_2', '2.4A_tip4pew_3', '2.4A_tip4pew_4', '2.4A_tip4pew_5',
-                '3A_tip4pew_1', '3A_tip4pew_2', '3A_tip4pew_3', '3A_tip4pew_4', '3A_tip4pew_5']
-
-    comparative_analysis_results = os.path.join(tt_results, "statistics", "comparative_analysis")
-    consolidated_df = pd.DataFrame()
-    rows, cols = (5, 4)
-    # tunnel_id = ["P1", "P2", "P3"]
-    tunnel_id = list(groups_definitions.keys()) + ["others"]
-    group = [1, 2, 3, 4, 5]
-
+    [optional] saving of consolidated df to consolidated_results.csv, unassigned events to unassigned_events_sep.csv
+    and consolidated_unassigned.csv
+    """
     # CONSOLIDATE ENTRY + RELEASE PER SIMULATION
-    # get corresponding SC per group which are water transporters
-    groups_scs = get_scids_of_groups(comparative_analysis_results,
-                                     groups_definitions,show_info=True)
-
-    opc_folders = list(groups_scs.keys())[0:5]  # Assuming folder 1-5 is OPC and so on
-    tip3p_folders = list(groups_scs.keys())[5:10]
-    tip4pew_folders = list(groups_scs.keys())[10:15]
-    for model in ['opc', 'tip3p', 'tip4pew']:
-        i, j = (0, 5)  # parse data from 5 simulations
-        for row in range(rows):
-            for col in range(cols):
-                if model == "opc":
-                    group_name = opc_folders[row]
-                    print(f"For group {group_name} {tunnel_id[col]}")
-                    sc_ids = groups_scs[group_name][0][tunnel_id[col]]
-                if model == "tip3p":
-                    group_name = tip3p_folders[row]
-                    print(f"For group {group_name}")
-                    sc_ids = groups_scs[group_name][0][tunnel_id[col]]
-                if model == "tip4pew":
-                    group_name = tip4pew_folders[row]
-                    print(f"For group {group_name}")
-                    sc_ids = groups_scs[group_name][0][tunnel_id[col]]
-                # print("TUNNEL ID =", tunnel_id[col])
-                entry_df, release_df = get_entry_release_events(sc_ids, tt_results, model=model)
-                entry_data = entry_df[i:j]  # To plot entry per tunnel
-                release_data = release_df[i:j]
-                try:
-                    _combined_df = pd.concat([entry_data, release_data], axis=1)
-                except ValueError:
-                    pass
-                # _combined_df.reset_index(inplace=True)
-                # print(_combined_df)
-                # print(_combined_df.sum())
-                sum_list = list(_combined_df.sum(axis=1))
-                # print(sum_list)
-                col_name = tunnel_id[col] + "_" + model + "_" + str(group[row])
-                _tmp_df = pd.DataFrame({col_name: sum_list})
-                consolidated_df = pd.concat([consolidated_df, _tmp_df], axis=1)
-            i += 5
-            j += 5
-
-    # Process Unassigned TT events
-
-    unassigned_df = pd.DataFrame()
-    unassigned = _get_unassigned_events(tt_results=tt_results)
-    # '1.4A_opc_1': {'entry': 1, 'release': 0}
-    # Fix missing values - use entry,release as 0,0 if there are no unassigned events in that simulation
-    for sim in sim_list:
-        if sim in unassigned:
-            num_entry = unassigned[sim]['entry']
-            num_release = unassigned[sim]['release']
-            _tmp_unas_df = pd.DataFrame({sim: [num_entry, num_release]}, index=['Entry', 'Release'])
-            unassigned_df = pd.concat([unassigned_df, _tmp_unas_df], axis=1)
-        else:
-            _tmp_unas_df = pd.DataFrame({sim: [0, 0]}, index=['Entry', 'Release'])
-            unassigned_df = pd.concat([unassigned_df, _tmp_unas_df], axis=1)
-    unassigned_df.to_csv(save_location + 'unassigned_events_sep.csv')
-
-    # Consolidate unassigned and group by group and model
-    _consolidated_unassigned = pd.DataFrame()
-    sum_unassigned_df = unassigned_df.sum(axis=0)
-    unassigned_grouped_by_group = pd.DataFrame()
-    models = ['opc', 'tip3p', 'tip4pew']
-    current_model = 0
-    group_number = 0
-    # iterate through 75 folders
-    for k in range(0, len(sum_unassigned_df), 5):
-        chunk = sum_unassigned_df[k:k + 5]
-        chunk = chunk.reset_index(drop=True)
-        chunk = chunk.to_frame()
-        chunk.columns = [f'{models[current_model]}_{group_number + 1}']
-        unassigned_grouped_by_group = pd.concat([unassigned_grouped_by_group, chunk], axis=1)
-        # index 0-20 is OPC 20-45 is TIP3P, 45-75 is TIP4P-Ew
-        if k == 20:
-            current_model += 1
-        elif k == 45:
-            current_model += 1
-        group_number += 1
-        if group_number == 5:
-            group_number -= 5
-    unassigned_grouped_by_group.to_csv(save_location + 'consolidated_unassigned.csv', index=False)
+    event_counts = event_count_matrix(tt_results, groups_definitions)
+    consolidated_df = event_counts.to_frame()
+
+    # Process Unassigned TT events, (simulation, event type) counts, 0 if there are no unassigned events
+    unassigned = _load_event_store(tt_results, unassigned=True)
+    replicas = event_counts.counts.shape[2]
+    if _replicas_of(unassigned.sims) > replicas:
+        raise ValueError(f"Unassigned events of {tt_results} come from more than {replicas} replicas")
+    sim_list = simulation_list(replicas)
+    position = _sim_positions(unassigned, sim_list)
+    flat = position * len(EVENT_TYPES) + unassigned.events["event_type"]
+    unassigned_counts = np.bincount(flat[position >= 0], minlength=len(sim_list) * len(EVENT_TYPES))
+    unassigned_counts = unassigned_counts.reshape(len(sim_list), len(EVENT_TYPES))
+    unassigned_df = pd.DataFrame(unassigned_counts.T, index=['Entry', 'Release'], columns=sim_list)
+
+    # Consolidate unassigned and group by group and model, one row per replica
+    total_unassigned = unassigned_counts.sum(axis=1).reshape(len(MODELS), len(GROUPS), replicas)
+    unassigned_grouped_by_group = pd.DataFrame(total_unassigned.transpose(2, 0, 1).reshape(replicas, -1),
+                                               columns=[f"{model}_{group + 1}" for model in MODELS
+                                                        for group in range(len(GROUPS))])
     if save_location is not None:
+        unassigned_df.to_csv(save_location + 'unassigned_events_sep.csv')
+        unassigned_grouped_by_group.to_csv(save_location + 'consolidated_unassigned.csv', index=False)
         consolidated_df.to_csv(save_location + 'consolidated_results.csv', index=False)
 
     return consolidated_df
@@ -502,39 +783,48 @@ def get_transit_time(tt_results, simulation_results: str, groups_definitions: di
     :param tt_results Folder in which tt results are present
     :param simulation_results folder in which simulation results are present
     :param groups_definitions Tunnels definition, tunnel_name:superclusters
-    :param frame_numbers Return the frame numbers per simulaiton
+    :param frame_numbers Return the frame intervals per simulation instead of the number of frames
     :returns Three dictionaries of combined_events, entry, release which contains list(list) of number of frames the
-    event took place/ if frame_numbers=True, then returns the range of frame numbers which events took place
+    event took place/ if frame_numbers=True, then returns (n_events, 2) arrays of (start_frame, end_frame) intervals
+    in which the events took place, use expand_intervals() or frame_coverage() to get per frame values
 
     """
-    # Read filtered_super_cluster_details_2.txt
-    sc_details_file = os.path.join(tt_results, "data", "super_clusters", "details",
-                                   "filtered_super_cluster_details2.txt")
-    if frame_numbers:
-        frames = _get_data_from_tt(sc_details_file, frame_numbers=True)
-    else:
-        parsed_results = _get_data_from_tt(sc_details_file)
-        frames = parsed_results[0]
+    # Events of filtered_super_cluster_details_2.txt
+    name_of_tunnel = list(groups_definitions.keys())[0]
+    scids = groups_definitions[name_of_tunnel]
+    store = _load_event_store(tt_results, sc_ids=scids)
     directories = [d for d in os.listdir(simulation_results) if os.path.isdir(os.path.join(simulation_results, d))]
     directories.sort(key=lambda x: (x.split("_")[0][:-1], x))
+    # simulations per model and group, the directories are blocks of replicas sorted by group and model
+    replicas = simulation_replicas(simulation_results)
     combined_dict = defaultdict(list)
     entry_dict = defaultdict(list)
     release_dict = defaultdict(list)
     comparative_results_loc = os.path.join(tt_results, "statistics/comparative_analysis")
-    name_of_tunnel = list(groups_definitions.keys())[0]
-    scids = groups_definitions[name_of_tunnel]
     scids_in_group = get_scids_of_groups(comparative_analysis_results=comparative_results_loc,
                                          groups_definition=groups_definitions, show_info=True)
+    if frame_numbers:
+        def _join(values: list):
+            return np.concatenate(values) if values else np.empty((0, 2), dtype=np.int32)
+    else:
+        def _join(values: list):
+            return [x for value in values for x in value]
+
+    def update_dict(old_dict: dict, key: str, value):
+        if key in old_dict:
+            old_dict[key] = _join([old_dict[key], value])
+        else:
+            old_dict[key] = value
+
     for scid in scids:
-        current_values = frames[scid]  # current_values[0]=entry [1]=release
-        # combine entry and release to a single value
-        combined_values = defaultdict(list)
-        for d in current_values:
-            for key, value in d.items():
-                if not len(value) == 0:
-                    combined_values[key].extend(value)
-        # include simulations with empty events
-        combined_values_all = {k: combined_values.get(k, 0) for k in directories}
+        if frame_numbers:
+            current_values = [store.intervals(scid, "entry"), store.intervals(scid, "release")]
+        else:
+            current_values = [store.durations(scid, "entry"), store.durations(scid, "release")]
+        # current_values[0]=entry [1]=release
+        # combine entry and release to a single value, include simulations with empty events
+        combined_values_all = {k: _join([current_values[0].get(k, _join([])), current_values[1].get(k, _join([]))])
+                               for k in directories}
         index = 0
 
         # names are the suffixes of the group names, my full group names are -['opc_1', 'opc_1.4', 'opc_1.8', 'opc_2.4',
@@ -542,133 +832,85 @@ def get_transit_time(tt_results, simulation_results: str, groups_definitions: di
         # 'tip4pew_1.8', 'tip4pew_2.4', 'tip4pew_3']
 
         names = ["1", "1.4", "1.8", "2.4", "3"]
-        group_number = 0
         # range is 15 because i have 5 groups with 3 models per tunnel, so 15 total boxes in the plot.
         for i in range(15):
-            group_name = directories[index].split("_")[1] + "_" + str(names[group_number])
+            group_name = directories[index].split("_")[1] + "_" + str(names[i // len(MODELS)])
             # condition to check if the SCID is present in current comparative_analysis group
             if scid in scids_in_group[group_name][0][name_of_tunnel]:
-                keys = directories[index:index + 5]
-                combined = defaultdict(list)
-                entry = defaultdict(list)
-                release = defaultdict(list)
+                keys = directories[index:index + replicas]
                 for key in keys:
-                    if not current_values[0][key]:  # if no value for the simulation, use 0
-                        entry.setdefault(key,[])
-                    else:
-                        entry[key]= current_values[0][key]
-                    if not current_values[1][key]:
-                        release.setdefault(key,[])
-                    else:
-                        release[key]=current_values[1][key]
-                    if combined_values_all[key] != 0:
-                        combined[key] = combined_values_all[key]
-                    else:
-                        combined.setdefault(key,[])
-
-                def update_dict(old_dict:dict, new_dict:dict):
-                    for key,value in new_dict.items():
-                        if key in old_dict:
-                            old_dict[key].extend(new_dict[key])
-                        else:
-                            old_dict[key] = new_dict[key]
-
-                update_dict(combined_dict,combined)
-                update_dict(entry_dict,entry)
-                update_dict(release_dict,release)
+                    # if no value for the simulation, use empty values
+                    update_dict(entry_dict, key, current_values[0].get(key, _join([])))
+                    update_dict(release_dict, key, current_values[1].get(key, _join([])))
+                    update_dict(combined_dict, key, combined_values_all[key])
 
             else:
                 if debug:
                     print(f"SCID - {scid} not present in {group_name}, not processing data from it")
-                    keys = directories[index:index + 5]
+                    keys = directories[index:index + replicas]
                     for key in keys:
                         print(combined_values_all[key])
                 else:
                     pass
-            index += 5  # move to next 5 simulations
-
-            # Move to next group / there are 15 simulations per water model and // 5 groups, which is why range(0,5)
-            if index % 15 in list(range(0, 5)):
-                group_number += 1
+            index += replicas  # move to the replicas of the next model (of the next group after the 3 models)
 
     return combined_dict, entry_dict, release_dict
 
 
-def fraction_events_occurrence(tt_results: str, sim_results: str, tunnels_definition: dict):
+def get_unassigned_transit_time(tt_results: str, frame_numbers: bool = False):
+    """
+    Transit time of the outlier (unassigned) events, same output as get_transit_time. With frame_numbers=True the
+    intervals can be given to event_occupancy() for the occupancy of unassigned waters.
+    :param tt_results Folder in which tt results are present
+    :param frame_numbers Return the (start_frame, end_frame) intervals per simulation instead of the number of frames
+    :returns Three dictionaries of combined_events, entry, release
     """
-    UPdate: this will now return the fraction of frames where events occur.
-    Get the average number of frames per simulation is which there are no events happening. Also manipulate the data
-    into groups and models.
+    store = _load_event_store(tt_results, unassigned=True)
+    if frame_numbers:
+        entry_dict = store.intervals(UNASSIGNED_SC_ID, "entry")
+        release_dict = store.intervals(UNASSIGNED_SC_ID, "release")
+        empty = np.empty((0, 2), dtype=np.int32)
+        combined_dict = defaultdict(list, {sim: np.concatenate([entry_dict.get(sim, empty),
+                                                                release_dict.get(sim, empty)])
+                                           for sim in store.sims})
+    else:
+        entry_dict = store.durations(UNASSIGNED_SC_ID, "entry")
+        release_dict = store.durations(UNASSIGNED_SC_ID, "release")
+        combined_dict = defaultdict(list, {sim: entry_dict.get(sim, []) + release_dict.get(sim, [])
+                                           for sim in store.sims})
+    return combined_dict, entry_dict, release_dict
 
-    :return:
+
+def fraction_events_occurrence(tt_results: str, sim_results: str, tunnels_definition: dict, sim_lengths: dict = None):
+    """
+    Fraction of frames of every simulation in which at least one event (water) is present in the tunnel, split into
+    groups and models.
+    :param tt_results: TransportTools results location
+    :param sim_results: Simulation results location
+    :param tunnels_definition: Tunnels definition, tunnel_name:superclusters
+    :param sim_lengths: Number of frames per simulation, read from the trajectories when not given
+    :return: list of 15 DataFrames (Entry&Release, Entry, Release x 5 groups) with model columns and simulation rows
     """
-    from collections import Counter
-    import numpy as np
     fetched_frames = get_transit_time(tt_results=tt_results, simulation_results=sim_results,
                                       groups_definitions=tunnels_definition,
                                       frame_numbers=True)
     names = ["1", "1.4", "1.8", "2.4", "3"]
     models = ["opc", "tip3p", "tip4pew"]
     events = ['Entry&Release', 'Entry', 'Release']
-    all_data =[]
+    replicas = simulation_replicas(sim_results)
+    sims = [f"{name}A_{model}_{sim}" for model in models for name in names for sim in range(1, replicas + 1)]
+    if sim_lengths is None:
+        sim_lengths = get_simulation_lengths(sim_results, sims, intervals_by_sim=fetched_frames[0])
+    all_data = []
     for event_type in range(3):  # 0= entry&release, 1=entry, 2=release
+        # fraction_evets_occuramnce = number of frames where events occur / total frames in simulation
+        occupancy = event_occupancy({sim: fetched_frames[event_type][sim] for sim in sims}, sim_lengths)
+        fraction = dict(zip(occupancy.sims, occupancy.fraction))
         for group in range(5):  # 5 groups
-            group_df = pd.DataFrame()
             print(f"\n{events[event_type]} Group {group + 1}")
-
-            for model in models:
-                group_name = f"{model}_{names[group]}"
-
-                # Get frame numbers for 5 simulations in the current group
-                data = []
-                for sim in range(1, 6):
-                    sim_name = f"{names[group]}A_{model}_{sim}"
-                    frames_in_current_event_type = fetched_frames[event_type]
-                    _frames = frames_in_current_event_type[sim_name]
-                    data.append(_frames)
-                # Get the average frames per simulation for every group
-                plot_data = []  # This will have average number of frames per simulation
-                for sim in data:
-                    occurrences = Counter(sim)
-                    gap = []
-                    _tmp_gap = 0
-
-                    # Count the number of gaps beween events in frames
-                    for frame_number in range(1,20001):  # 20000 frames in my simulation
-                        current_value = occurrences.get(frame_number)
-                        if current_value is None and frame_number != 20000:
-                            _tmp_gap += 1
-                        elif current_value is not None:
-                            gap.append(_tmp_gap)
-                            _tmp_gap = 0
-                        elif current_value is None and frame_number == 20000:  # append if the frames has reached the end without any events
-                            # gap.append(_tmp_gap+1)
-                            if _tmp_gap == 19999:
-                                gap.append(np.nan)
-                            else:
-                                gap.append(_tmp_gap)
-                    # if the frames have continuous events, then the gap between events is technically 0. But we do not
-                    # need it
-                    gap_without_zeros = [x for x in gap if x != 0]
-                    number_of_frames_with_events=len(gap)-len(gap_without_zeros)
-
-                    # Revision of script upon JB request
-                    # fraction_evets_occuramnce = number of frames where events occur / total frames in simulation
-                    fraction_of_events_occurance_in_current_simulation = number_of_frames_with_events/20000
-                    # median_gap_per_simulation = np.median(gap_without_zeros)
-                    # plot_data.append(median_gap_per_simulation)
-                    plot_data.append(fraction_of_events_occurance_in_current_simulation)
-                # create dataframes to plot
-                if "opc" in group_name:
-                    df = pd.DataFrame(plot_data)
-                    group_df[group_name] = df
-                elif "tip3p" in group_name:
-                    df = pd.DataFrame(plot_data)
-                    group_df[group_name] = df
-                else:
-                    df = pd.DataFrame(plot_data)
-                    group_df[group_name] = df
-
+            group_df = pd.DataFrame({f"{model}_{names[group]}": [fraction[f"{names[group]}A_{model}_{sim}"]
+                                                                 for sim in range(1, replicas + 1)]
+                                  for model in models})
             all_data.append(group_df)
             print(group_df)
-    return all_data
\ No newline at end of file
+    return all_data
@@ -7,6 +7,7 @@ from scikit_posthocs import posthoc_dunn
 from statsmodels.sandbox.stats.multicomp import MultiComparison
 
 from libs import transport_events_analysis as tt_events
+from libs import time_series_stats
 from scipy.stats import kruskal
 import pandas as pd
 import seaborn as sns
@@ -148,7 +149,12 @@ def average_bottleneck_statistics(csv_file:str):
     result = perform_test(bottlenecks)
     print(result)
 
-def full_bottleneck_statistics():
+def full_bottleneck_statistics(decorrelate: bool = False):
+    """
+    Dunn's test between the simulations of every group.
+    :param decorrelate: Test only every g-th frame of every simulation (g = statistical inefficiency), the frames are
+    strongly correlated and the test assumes independent samples
+    """
     # Get the original caver IDs for the given group name (P1,P2,P3) for all simulations
     bottleneck_full = pd.read_csv("/home/aravind/PhD_local/dean/figures/bottlenecks/"
                                   "time_evolution/bottleneck_per_sim.csv")
@@ -164,7 +170,13 @@ def full_bottleneck_statistics():
         col_names = ['opc_1', 'opc_2', 'opc_3', 'opc_4', 'opc_5', 'tip3p_1', 'tip3p_2', 'tip3p_3', 'tip3p_4', 'tip3p_5',
                      'tip4pew_1', 'tip4pew_2', 'tip4pew_3', 'tip4pew_4', 'tip4pew_5']
         dataframe.columns = col_names
-        df_long = pd.melt(dataframe.reset_index(drop=True), var_name='Group', value_name='Value')
+        if decorrelate:
+            subsamples = time_series_stats.decorrelated_frames(dataframe)
+            dataframe = pd.DataFrame({name: pd.Series(values) for name, values in subsamples.items()})
+            # the subsamples have different lengths, the padding NaN are not samples
+            df_long = pd.melt(dataframe.reset_index(drop=True), var_name='Group', value_name='Value').dropna()
+        else:
+            df_long = pd.melt(dataframe.reset_index(drop=True), var_name='Group', value_name='Value')
         dunns_result = posthoc_dunn(df_long,group_col='Group',val_col='Value', p_adjust='bonferroni')
         return dunns_result
     i=0
@@ -227,6 +239,24 @@ def avg_std_for_bottleneck_radii():
                               "time_evolution/avg_std_bottleneck.csv")
 
 
+def convergence_statistics(csv_file: str, save_loc: str, name: str):
+    """
+    Statistical inefficiency, effective sample size and standard errors (from the autocorrelation and from block
+    averaging) of a frames x simulations CSV file (bottleneck_per_sim.csv, helix distances, RMSD, ...), per simulation
+    and per group and model.
+    :param csv_file: CSV file with one column per simulation (group_model_replica) and one row per frame
+    :param save_loc: Folder to save {name}_convergence_per_sim.csv and {name}_convergence_per_group.csv
+    :param name: Prefix of the saved files
+    """
+    per_frame = pd.read_csv(csv_file, index_col=0)
+    per_sim = time_series_stats.convergence_table(per_frame)
+    per_group = time_series_stats.group_convergence(per_sim)
+    print(per_group)
+    per_sim.to_csv(os.path.join(save_loc, f"{name}_convergence_per_sim.csv"))
+    per_group.to_csv(os.path.join(save_loc, f"{name}_convergence_per_group.csv"))
+    return per_sim, per_group
+
+
 if __name__ == '__main__':
     tt_events_csv = "/home/aravind/PhD_local/dean/statistics/tt_events_HST.csv"
     tt_results = "/data/aravindramt/dean/tt/tt_0_9_5"
@@ -246,4 +276,6 @@ if __name__ == '__main__':
     # average_bottleneck_statistics(bottleneck_csv)
     # full_bottleneck_statistics()
     tt_events_statistics("/home/aravind/PhD_local/dean/figures/transport_tools/p1_only.csv")
-    # avg_std_for_bottleneck_radii()
\ No newline at end of file
+    # avg_std_for_bottleneck_radii()
+    # convergence_statistics("/home/aravind/PhD_local/dean/figures/bottlenecks/time_evolution/bottleneck_per_sim.csv",
+    #                        "/home/aravind/PhD_local/dean/statistics/", "bottleneck")
\ No newline at end of file